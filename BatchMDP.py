@@ -0,0 +1,69 @@
+"""
+This BatchMDP class is the MDP for many independent agents at once.
+Instead of one state and one action it takes arrays of states and actions (as indices)
+and returns arrays of rewards and follow-up states, using the transition table of the MDP
+and NumPy for sampling the slipping of all agents in one go.
+
+An agent performing an action in a terminal state ends its episode and is put back
+onto a random starting state right away, so all agents can be stepped in lockstep forever.
+"""
+
+import numpy as np
+
+from MDP import MDP
+
+
+class BatchMDP(MDP):
+    def __init__(self, state_list, field_rewards, obstacle_fields, goal_fields, actions, transition_probabilities,
+                 seed=None):
+        """
+        Initializes the batched MDP with the following parameters.
+        "Field" here refers to the letters or signs with which different states are represented.
+
+        :param state_list: two-dimensional list of possible states represented as specific fields
+        :param field_rewards: dictionary which maps fields in state_list to a reward value
+        :param obstacle_fields: list of fields which are considered obstacles
+        :param goal_fields: list of fields which are considered terminal states
+        :param actions: list of possible movements in tuple notation, i.e. (x_coordinate_offset, y_coordinate_offset)
+        :param transition_probabilities: dictionary of transition probabilities,
+                                         mapping a probability to "straight" and "lateral" movement
+        :param seed: optionally seed or RandomStream for the random numbers of the environment
+        """
+
+        super().__init__(state_list, field_rewards, obstacle_fields, actions, transition_probabilities, seed)
+
+        # entry i is True if the state with index i is a terminal state
+        self.is_goal = self.state_index.field_mask(goal_fields)
+
+
+    def random_states(self, count):
+        """
+        :param count: number of agents
+        :return: array of random (starting) state indices
+        """
+        return self.rng.generator.integers(len(self.states), size=count)
+
+
+    def perform_actions(self, states, actions):
+        """
+        Performs the given actions in the given states, one per agent, and returns the immediate rewards
+        and the follow-up states. Agents acting in a terminal state get a random starting state instead.
+        The indices are not checked, so only pass valid ones.
+        :param states: array of current state indices
+        :param actions: array of action indices to be performed
+        :return: tuple of array of immediate rewards, array of follow-up state indices
+        """
+
+        # 0 means going straight, 1 and 2 slipping to one of the orthogonal actions
+        u = self.rng.generator.random(len(states))
+        straight = self.transition_probabilities["straight"]
+        slip = (u >= straight).astype(np.int64)
+        slip += u >= straight + self.transition_probabilities["lateral"]
+
+        rewards = self.reward_vector[states]
+        next_states = self.transition_table[states, actions, slip]
+        # agents which acted in a terminal state start a new episode
+        finished = self.is_goal[states]
+        if finished.any():
+            next_states[finished] = self.random_states(int(finished.sum()))
+        return rewards, next_states
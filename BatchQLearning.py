@@ -0,0 +1,157 @@
+"""
+This BatchQLearning class performs Q-learning with many independent agents in lockstep.
+Every tick all agents choose an action with the epsilon-soft policy, the batched
+environment (see BatchMDP.py) performs all of them at once and all TD updates
+are applied to the shared array Q-table with NumPy, so there is no Python level
+work per agent and step.
+
+If several agents update the same (state, action) pair in the same tick only one of
+the updates is kept, which keeps the learning rate meaningful no matter how many agents
+there are. Since agents start a new episode as soon as they act in a terminal state,
+an "episode" here is counted whenever one agent finishes one.
+
+Checkpoints (see Checkpoint.py) contain the state of the first agent as current state, so they can be
+loaded into a QLearning object as well. The states of the other agents aren't part of them, so a resumed
+run continues differently.
+
+Example:
+    environment = BatchMDP(state_list, ..., goal_fields=Default.GOAL_FIELDS, ...)
+    q_learning = BatchQLearning(environment.perform_actions, environment.state_index, ..., num_agents=64)
+    q_learning.q_learning_until_convergence()
+"""
+
+import numpy as np
+
+from Checkpoint import save_checkpoint
+from Convergence import PolicyUnchanged
+from QLearning import QLearning
+from Schedules import make_schedule
+
+
+class BatchQLearning(QLearning):
+    def __init__(self, env_perform_actions, state_list, goal_fields, obstacle_fields, actions, discount_factor,
+                 learning_rate, epsilon, convergence_threshold, num_agents, decimal_places=5, seed=None,
+                 learning_rate_schedule=None, epsilon_schedule=None):
+        """
+        Sets up a representation of the gridworld given the following parameters.
+        Apart from the ones listed here the parameters are the same as for QLearning.
+
+        :param env_perform_actions: function of the environment which gives back tuple (rewards, follow-up states)
+                                    given arrays of state and action indices, e.g. BatchMDP.perform_actions
+        :param num_agents: number of agents moving in lockstep
+        :param seed: optionally seed or RandomStream for the random numbers of the learner
+        :param learning_rate_schedule: optionally Schedule for the learning rate, applied whenever episodes finished,
+                                       per visit learning rates are not supported
+        :param epsilon_schedule: optionally Schedule for epsilon, applied whenever episodes finished
+        """
+
+        learning_rate_schedule = make_schedule(learning_rate_schedule)
+        if learning_rate_schedule is not None and learning_rate_schedule.per_visit:
+            raise ValueError("Per visit learning rates are not supported with many agents")
+        self.num_agents = num_agents
+        # episode_count (set up by QLearning) is the number of finished episodes of all agents
+        super().__init__(env_perform_actions, state_list, goal_fields, obstacle_fields, actions, discount_factor,
+                         learning_rate, epsilon, convergence_threshold, decimal_places, q_engine="array", seed=seed,
+                         learning_rate_schedule=learning_rate_schedule, epsilon_schedule=epsilon_schedule)
+
+
+    def reset_current_state(self):
+        """Sets current state of every agent to random (starting) state"""
+        self.current_states = self.rng.generator.integers(len(self.states), size=self.num_agents)
+        # the state of the first agent, for checkpoints
+        self.current_state = self.states[int(self.current_states[0])]
+
+
+    def q_learning_step(self):
+        """
+        Performs one Q-learning step for every agent, i.e. all agents move one step in the Gridworld
+        and the Q-values are updated according to the feedback from the environment.
+        :return: number of episodes finished in this step
+        """
+
+        s = self.current_states  # for readability
+        q = self.q_function.table
+        # epsilon-soft policy: choose random action (including greedy action) with probability epsilon,
+        # with probability 1 - epsilon choose greedy action
+        a = q[s].argmax(axis=1)
+        explore = self.rng.generator.random(self.num_agents) < self.epsilon
+        a[explore] = self.rng.generator.integers(len(self.actions), size=int(explore.sum()))
+        # perform actions and observe rewards and follow-up states from environment
+        r, s_prime = self.env_perform_action(s, a)
+        # perform q_function update, if the current state is a goal state future reward will always be 0
+        finished = self.is_goal[s]
+        greedy_q = np.where(finished, 0, q[s_prime].max(axis=1))
+        old_q = q[s, a]
+        updated_q = np.round(old_q + self.learning_rate * (r + self.discount_factor * greedy_q - old_q),
+                             self.decimal_places)
+        q[s, a] = updated_q
+        self.max_q_delta = max(self.max_q_delta, float(np.abs(updated_q - old_q).max()))
+        self.step_count += self.num_agents
+        # set new current states, the environment already reset the agents which finished their episode
+        self.current_states = s_prime
+        self.current_state = self.states[int(s_prime[0])]
+
+        finished_count = int(finished.sum())
+        self.episode_count += finished_count
+        return finished_count
+
+
+    def q_learning_episode(self):
+        """
+        Performs Q-learning steps until at least one agent finished an episode and then updates the policy.
+        """
+        while not self.q_learning_step():
+            pass
+        self.apply_schedules()
+        self.update_policy()
+
+
+    def q_learning_until_convergence(self, resume=False, checkpoint_file=None, checkpoint_interval=1000,
+                                     criteria=None, episode_callback=None):
+        """
+        Performs Q-learning steps until the policy hasn't changed
+        for a given number of finished episodes (i.e. it has converged) or until any of the given criteria is met.
+        The criteria are updated once per step in which episodes finished, with max_q_delta covering all
+        steps since the last update.
+        :param resume: optionally continue the counts of a previous run, e.g. after loading a checkpoint
+        :param checkpoint_file: optionally save a checkpoint (see Checkpoint.py) to this file
+                                periodically and after convergence
+        :param checkpoint_interval: number of finished episodes between two checkpoints,
+                                    checked at the next step in which episodes finished
+        :param criteria: optionally list of convergence criteria (see Convergence.py),
+                         PolicyUnchanged with the convergence threshold by default
+        :param episode_callback: optionally function called with the QLearning object after every step
+                                 in which episodes finished, e.g. to publish the policy (see PolicyServer.py)
+        """
+
+        if criteria is None:
+            criteria = [PolicyUnchanged()]
+        if not resume:
+            self.last_convergence_episode_count = 0
+            self.policy_unchanged_count = 0
+        self.convergence_criterion = None
+        for criterion in criteria:
+            criterion.start(self)
+        self.max_q_delta = 0
+        next_checkpoint = self.last_convergence_episode_count + checkpoint_interval
+        while not self.converged(criteria):
+            finished_count = self.q_learning_step()
+            if not finished_count:
+                continue
+            self.apply_schedules()
+            self.update_policy()
+            self.last_convergence_episode_count += finished_count
+            if not self.policy_changed:
+                self.policy_unchanged_count += finished_count
+            else:
+                self.policy_unchanged_count = 0
+            for criterion in criteria:
+                criterion.update(self)
+            self.max_q_delta = 0
+            if episode_callback is not None:
+                episode_callback(self)
+            if checkpoint_file is not None and self.last_convergence_episode_count >= next_checkpoint:
+                save_checkpoint(self, checkpoint_file)
+                next_checkpoint = self.last_convergence_episode_count + checkpoint_interval
+        if checkpoint_file is not None:
+            save_checkpoint(self, checkpoint_file)
@@ -0,0 +1,98 @@
+"""
+Tests of Q-learning with many agents in lockstep with BatchMDP.py and BatchQLearning.py.
+"""
+
+import numpy as np
+import pytest
+
+import Checkpoint
+from BatchMDP import BatchMDP
+from BatchQLearning import BatchQLearning
+from Convergence import Budget
+import DefaultConstants as Default
+from Planner import Planner
+from RandomStream import RandomStream
+from Schedules import GLIE, VisitCount
+import Sweep
+
+from conftest import GRIDWORLD
+
+
+def make_batch_learner(seed=1, num_agents=16, **kwargs):
+    environment_stream, learner_stream = RandomStream(seed).spawn(2)
+    environment = BatchMDP(state_list=GRIDWORLD,
+                           field_rewards=Default.FIELD_REWARDS,
+                           obstacle_fields=Default.OBSTACLE_FIELDS,
+                           goal_fields=Default.GOAL_FIELDS,
+                           actions=Default.ACTIONS,
+                           transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                           seed=environment_stream)
+    return BatchQLearning(env_perform_actions=environment.perform_actions,
+                          state_list=environment.state_index,
+                          goal_fields=Default.GOAL_FIELDS,
+                          obstacle_fields=Default.OBSTACLE_FIELDS,
+                          actions=Default.ACTIONS,
+                          discount_factor=Default.DISCOUNT_FACTOR,
+                          learning_rate=0.1,
+                          epsilon=0.5,
+                          convergence_threshold=200,
+                          num_agents=num_agents,
+                          seed=learner_stream,
+                          **kwargs)
+
+
+def test_converges_to_a_good_policy():
+    # a decaying learning rate, so the policy settles near ties
+    q_learning = make_batch_learner(seed=2, learning_rate_schedule=GLIE(0.5, 200))
+    callbacks = []
+    q_learning.q_learning_until_convergence(episode_callback=callbacks.append)
+    assert q_learning.convergence_criterion == "policy_unchanged"
+    assert q_learning.step_count % q_learning.num_agents == 0
+    assert q_learning.episode_count == q_learning.last_convergence_episode_count
+    assert callbacks and all(callback is q_learning for callback in callbacks)
+
+    # the learned policy is about as good as the optimal one
+    planner = Planner(q_learning.env_perform_action.__self__, Default.GOAL_FIELDS, q_learning.discount_factor)
+    optimal_values = planner.value_iteration().max(axis=1)
+    values = planner.evaluate_policy(q_learning.greedy_actions(), sweeps=200)
+    assert np.abs(values - optimal_values).max() < 0.05
+
+
+def test_same_seed_same_run():
+    runs = [make_batch_learner(seed=3) for _ in range(2)]
+    for q_learning in runs:
+        q_learning.q_learning_until_convergence(criteria=[Budget(episodes=100)])
+    assert np.array_equal(runs[0].q_function.table, runs[1].q_function.table)
+    assert runs[0].step_count == runs[1].step_count
+
+
+def test_checkpoint_and_resume(make_learner, tmp_path):
+    file = str(tmp_path / "run.ckpt")
+    q_learning = make_batch_learner()
+    q_learning.q_learning_until_convergence(checkpoint_file=file, checkpoint_interval=50,
+                                            criteria=[Budget(episodes=120)])
+    assert q_learning.current_state == q_learning.states[int(q_learning.current_states[0])]
+
+    # the checkpoint can be loaded into a single agent as well as into many
+    for loaded in [make_learner(q_engine="array"), make_batch_learner(seed=2)]:
+        Checkpoint.load_checkpoint(loaded, file)
+        assert np.array_equal(loaded.q_function.table, q_learning.q_function.table)
+        assert loaded.episode_count == q_learning.episode_count
+
+    episode_count = loaded.last_convergence_episode_count
+    loaded.q_learning_until_convergence(resume=True, criteria=[Budget(episodes=episode_count + 30)])
+    assert loaded.last_convergence_episode_count >= episode_count + 30
+
+
+def test_rejects_per_visit_learning_rates():
+    with pytest.raises(ValueError):
+        make_batch_learner(learning_rate_schedule=VisitCount(0.8))
+
+
+def test_sweep_with_agents(tmp_path):
+    gridworld_file = str(tmp_path / "small.grid")
+    with open(gridworld_file, "w") as f:
+        f.write("\n".join(" ".join(row) for row in GRIDWORLD) + "\n")
+    result = Sweep.run_configuration(gridworld_file, {"seed": 0, "convergence_threshold": 100}, agents=8)
+    assert result["episodes"] >= 100
+    assert result["policy"][0].startswith("→→→")
@@ -0,0 +1,217 @@
+"""
+Benchmarks the hot paths of the MDP and Q-learning on generated Gridworlds of different sizes
+and obstacle densities, always using the same seeds so runs of two revisions are comparable.
+
+For every Gridworld and Q engine it measures
+* throughput and latency percentiles of MDP.perform_action, QLearning.q_learning_step,
+  QLearning.q_learning_episode and QLearning.update_policy
+* peak memory needed to set up the MDP and QLearning objects
+* episodes and wall time until convergence (only for small Gridworlds, this takes long otherwise)
+
+Examples:
+    python Benchmark.py --output new.json
+    python Benchmark.py --compare old.json new.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from MDP import MDP
+from QLearning import QLearning
+from RandomStream import RandomStream
+import GridFile
+import DefaultConstants as Default
+
+SIZES = [(4, 3), (10, 10), (30, 30), (100, 100)]
+OBSTACLE_DENSITIES = [0.0, 0.2]
+Q_ENGINES = ["dict", "array", "sparse"]
+SEED = 0
+
+
+def make_objects(gridworld, q_engine):
+    """
+    :return: tuple of MDP and QLearning object with the default parameters for the given Gridworld,
+             both seeded with streams derived from SEED
+    """
+    environment_stream, learner_stream = RandomStream(SEED).spawn(2)
+    environment = MDP(state_list=gridworld,
+                      field_rewards=Default.FIELD_REWARDS,
+                      obstacle_fields=Default.OBSTACLE_FIELDS,
+                      actions=Default.ACTIONS,
+                      transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                      seed=environment_stream)
+    q_learning = QLearning(env_perform_action=environment.perform_action,
+                           state_list=environment.state_index,
+                           goal_fields=Default.GOAL_FIELDS,
+                           obstacle_fields=Default.OBSTACLE_FIELDS,
+                           actions=Default.ACTIONS,
+                           discount_factor=Default.DISCOUNT_FACTOR,
+                           learning_rate=Default.LEARNING_RATE,
+                           epsilon=Default.EPSILON,
+                           convergence_threshold=Default.CONVERGENCE_THRESHOLD,
+                           q_engine=q_engine,
+                           seed=learner_stream)
+    return environment, q_learning
+
+
+def measure(function, repetitions, arguments=None, prepare=None):
+    """
+    Calls the function repeatedly and times every call, nothing but the call itself.
+    :param function: function to measure
+    :param repetitions: number of calls
+    :param arguments: optionally list of tuples of arguments, one per call, prepared before timing starts
+    :param prepare: optionally function called before every call without being timed
+    :return: dictionary of calls per second and latency percentiles in microseconds
+    """
+    latencies = np.empty(repetitions)
+    clock = time.perf_counter
+    for k in range(repetitions):
+        if prepare is not None:
+            prepare()
+        args = arguments[k] if arguments is not None else ()
+        start = clock()
+        function(*args)
+        latencies[k] = clock() - start
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1e6
+    return {"per_second": repetitions / latencies.sum(), "p50_us": p50, "p90_us": p90, "p99_us": p99}
+
+
+def benchmark_gridworld(gridworld, q_engine, repetitions, episodes, convergence_max_cells):
+    """
+    Runs all benchmarks on one Gridworld.
+    :return: dictionary of results
+    """
+    result = {}
+
+    # memory is measured separately since tracemalloc slows everything else down
+    tracemalloc.start()
+    make_objects(gridworld, q_engine)
+    result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    environment, q_learning = make_objects(gridworld, q_engine)
+    states = list(environment.states)
+    # random (state, action) pairs, drawn before timing starts
+    rng = RandomStream(SEED)
+    state_indices = rng.generator.integers(len(states), size=repetitions).tolist()
+    action_indices = rng.generator.integers(len(environment.actions), size=repetitions).tolist()
+    arguments = [(states[i], environment.actions[j]) for i, j in zip(state_indices, action_indices)]
+    result["perform_action"] = measure(environment.perform_action, repetitions, arguments)
+
+    def start_new_episode():
+        if q_learning.current_state in q_learning.goal_states:
+            q_learning.reset_current_state()
+    result["q_learning_step"] = measure(q_learning.q_learning_step, repetitions, prepare=start_new_episode)
+
+    # the learner counts the steps of its episodes itself
+    step_count = q_learning.step_count
+    result["q_learning_episode"] = measure(q_learning.q_learning_episode, episodes)
+    result["q_learning_episode"]["steps_per_second"] = \
+        (q_learning.step_count - step_count) * result["q_learning_episode"]["per_second"] / episodes
+
+    result["update_policy"] = measure(q_learning.update_policy, max(1, repetitions // 100))
+
+    if len(states) <= convergence_max_cells:
+        environment, q_learning = make_objects(gridworld, q_engine)
+        start = time.perf_counter()
+        q_learning.q_learning_until_convergence()
+        result["until_convergence"] = {"episodes": q_learning.last_convergence_episode_count,
+                                       "wall_time_s": time.perf_counter() - start}
+    return result
+
+
+def run(sizes, densities, q_engines, repetitions, episodes, convergence_max_cells):
+    """
+    :return: dictionary with information about the machine and a list of benchmark results
+    """
+    results = []
+    for width, height in sizes:
+        for density in densities:
+            # about one goal field per 50 cells, so episodes stay short enough on large Gridworlds
+            goals = max(1, width * height // 100)
+            gridworld = GridFile.generate_random_gridworld(width, height, density, goals, goals, seed=SEED)
+            for q_engine in q_engines:
+                result = {"width": width, "height": height, "obstacle_density": density, "q_engine": q_engine}
+                result.update(benchmark_gridworld(gridworld, q_engine, repetitions, episodes, convergence_max_cells))
+                results.append(result)
+                print_result(result)
+    return {"python": sys.version.split()[0], "platform": platform.platform(), "numpy": np.__version__,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}
+
+
+def flatten(result):
+    """
+    :return: dictionary mapping names like "q_learning_step.p50_us" to the measured values
+    """
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            for inner_key, inner_value in value.items():
+                flat["{}.{}".format(key, inner_key)] = inner_value
+        elif isinstance(value, (int, float)) and key not in ("width", "height", "obstacle_density"):
+            flat[key] = value
+    return flat
+
+
+def name(result):
+    return "{}x{} obstacles={} {}".format(result["width"], result["height"], result["obstacle_density"],
+                                          result["q_engine"])
+
+
+def print_result(result):
+    print(name(result))
+    for key, value in flatten(result).items():
+        print("    {:<40} {:>16.2f}".format(key, value))
+
+
+def compare(old_file, new_file):
+    """
+    Prints the ratio new / old of every measurement found in both result files.
+    """
+    with open(old_file) as f:
+        old = {name(result): flatten(result) for result in json.load(f)["results"]}
+    with open(new_file) as f:
+        new = {name(result): flatten(result) for result in json.load(f)["results"]}
+    for key in new:
+        if key not in old:
+            continue
+        print(key)
+        for measurement, value in new[key].items():
+            if measurement in old[key] and old[key][measurement]:
+                print("    {:<40} {:>16.2f} {:>16.2f} {:>8.2f}x".format(
+                      measurement, old[key][measurement], value, value / old[key][measurement]))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmarks MDP and Q-learning on generated Gridworlds.")
+    parser.add_argument("--sizes", nargs="+", default=["{}x{}".format(*size) for size in SIZES],
+                        help="Gridworld sizes as WIDTHxHEIGHT")
+    parser.add_argument("--obstacle-densities", type=float, nargs="+", default=OBSTACLE_DENSITIES)
+    parser.add_argument("--q-engines", nargs="+", choices=Q_ENGINES, default=Q_ENGINES)
+    parser.add_argument("--repetitions", type=int, default=20000, help="calls per step benchmark")
+    parser.add_argument("--episodes", type=int, default=50, help="episodes for the episode benchmark")
+    parser.add_argument("--convergence-max-cells", type=int, default=200,
+                        help="largest number of states for which learning until convergence is benchmarked")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    return parser.parse_args()
+
+
+# only run if not imported from other file
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    if arguments.compare:
+        compare(*arguments.compare)
+    else:
+        benchmark_results = run([tuple(int(n) for n in size.split("x")) for size in arguments.sizes],
+                                arguments.obstacle_densities, arguments.q_engines, arguments.repetitions,
+                                arguments.episodes, arguments.convergence_max_cells)
+        if arguments.output:
+            with open(arguments.output, "w") as f:
+                json.dump(benchmark_results, f, indent=2)
@@ -0,0 +1,34 @@
+"""
+Tests of the timing of Benchmark.py.
+"""
+
+import time
+
+import Benchmark
+
+from conftest import GRIDWORLD
+
+
+def test_measure_times_only_the_call():
+    calls = []
+    prepared = []
+
+    def prepare():
+        prepared.append(len(calls))
+        time.sleep(0.01)
+
+    result = Benchmark.measure(lambda *args: calls.append(args), 20, [(k, -k) for k in range(20)], prepare)
+    assert calls == [(k, -k) for k in range(20)]
+    assert prepared == list(range(20))
+    # the 10 ms of every preparation aren't part of the latencies
+    assert result["p99_us"] < 5000
+    assert result["per_second"] > 200
+
+
+def test_benchmark_gridworld():
+    result = Benchmark.benchmark_gridworld(GRIDWORLD, "array", repetitions=200, episodes=5, convergence_max_cells=0)
+    for name in ["perform_action", "q_learning_step", "q_learning_episode", "update_policy"]:
+        assert result[name]["per_second"] > 0
+        assert result[name]["p50_us"] <= result[name]["p90_us"] <= result[name]["p99_us"]
+    assert result["peak_memory_bytes"] > 0
+    assert "until_convergence" not in result
@@ -0,0 +1,253 @@
+"""
+Saving and loading the learned state of a QLearning object, so long runs can be resumed
+and trained policies can be used without training again.
+
+A checkpoint file consists of the magic bytes b"QCKP", the length of a JSON header as
+little-endian unsigned 32 bit integer, the JSON header itself and then the raw arrays,
+each starting at a multiple of 64 bytes. The header contains the hyperparameters, the
+counters of the run, the current state, the states of the random number streams and
+the data type, shape and offset of every array. The arrays are
+* "q_values": Q with one row per state (in the order of QLearning.states) and one column per action
+* "greedy": index of the action chosen by the policy in every state
+* "visit_counts": only with visit count learning rates (see Schedules.py), number of updates of
+  every (state, action) pair with the same rows as "q_values"
+Checkpoints of the sparse Q engine only contain the rows of the states that have one, so they have
+* "states": indices of the states the rows of "q_values" and "greedy" belong to
+and every other state has Q-values of 0 and chooses the first action.
+Checkpoints can be loaded into a QLearning object using any Q engine, except that those saved with
+eligibility traces (see EligibilityTraces.py) need the array Q engine. Lambda is restored, the traces
+themselves aren't saved as they are cleared at the start of every episode anyway.
+
+Since the arrays are stored raw, they are memory mapped when loading into the array Q engine,
+which makes loading almost instant no matter how large the Gridworld is. The mapping is
+copy-on-write, so training can continue without changing the file.
+
+The state of the random number stream of the QLearning object (see RandomStream.py) is saved as well,
+and that of the environment if it has one, which makes a resumed run continue exactly like
+the original one would have. Checkpoints of version 1, which saved the state of Python's global
+random number generator instead, and of version 2, whose random number streams handed out blocks of
+NumPy random numbers, can still be loaded, but without their random state.
+
+Only plain Q-learning (with or without schedules and eligibility traces) resumes exactly. The experience
+replay buffer, the learned model of Dyna-Q planning and prioritized sweeping and the random number streams
+of both are not saved, so a resumed run using any of them starts them empty and continues differently.
+"""
+
+import inspect
+import json
+import os
+import struct
+
+import numpy as np
+
+from RandomStream import RandomStream
+from Schedules import make_schedule
+
+MAGIC = b"QCKP"
+VERSION = 3
+ALIGNMENT = 64
+
+
+def environment_stream(q_learning, environment=None):
+    """
+    :param q_learning: QLearning object
+    :param environment: optionally environment object, by default the one env_perform_action is a method of,
+                        looking through wrappers like those of Instrumentation.py
+    :return: RandomStream of the environment or None if it has none
+    """
+    if environment is None:
+        environment = getattr(inspect.unwrap(q_learning.env_perform_action), "__self__", None)
+    rng = getattr(environment, "rng", None)
+    return rng if isinstance(rng, RandomStream) else None
+
+
+def save_checkpoint(q_learning, file, environment=None):
+    """
+    Writes the learned state of the QLearning object to a file.
+    The file is written next to the target first and then renamed, so an existing checkpoint
+    is never left half written.
+    :param q_learning: QLearning object
+    :param file: name of the checkpoint file
+    :param environment: optionally environment whose random number stream is saved,
+                        by default the one env_perform_action is a method of
+    """
+    environment_rng = environment_stream(q_learning, environment)
+
+    if q_learning.q_engine == "array":
+        q_values = q_learning.q_function.table
+        greedy = q_learning.policy.greedy
+        changed_states = sorted(q_learning.changed_states)
+    elif q_learning.q_engine == "sparse":
+        states, q_values = q_learning.q_function.rows()
+        greedy = q_learning.policy.greedy()
+        changed_states = sorted(q_learning.changed_states)
+    else:
+        q_values = np.array([[q_learning.q_function[s, a] for a in q_learning.actions] for s in q_learning.states],
+                            dtype=np.float64).reshape(len(q_learning.states), len(q_learning.actions))
+        greedy = q_learning.greedy_actions()
+        changed_states = sorted(q_learning.state_index.index(s) for s in q_learning.changed_states)
+    arrays = {"q_values": np.ascontiguousarray(q_values), "greedy": np.ascontiguousarray(greedy)}
+    if q_learning.q_engine == "sparse":
+        arrays["states"] = states
+    if q_learning.visit_counts is not None:
+        arrays["visit_counts"] = q_learning.visit_counts.take(
+            states if q_learning.q_engine == "sparse" else np.arange(len(q_learning.states)))
+    learning_rate_schedule = q_learning.learning_rate_schedule
+    epsilon_schedule = q_learning.epsilon_schedule
+
+    header = {
+        "version": VERSION,
+        "dim": list(q_learning.dim),
+        "state_count": len(q_learning.states),
+        "actions": [list(a) for a in q_learning.actions],
+        "q_engine": q_learning.q_engine,
+        "discount_factor": q_learning.discount_factor,
+        "learning_rate": q_learning.learning_rate,
+        "epsilon": q_learning.epsilon,
+        "learning_rate_schedule": learning_rate_schedule.spec() if learning_rate_schedule is not None else None,
+        "epsilon_schedule": epsilon_schedule.spec() if epsilon_schedule is not None else None,
+        "episode_count": q_learning.episode_count,
+        "step_count": q_learning.step_count,
+        "trace_decay": q_learning.trace_decay,
+        "trace_cutoff": q_learning.trace_cutoff,
+        "convergence_threshold": q_learning.convergence_threshold,
+        "decimal_places": q_learning.decimal_places,
+        "current_state": list(q_learning.current_state),
+        "last_convergence_episode_count": q_learning.last_convergence_episode_count,
+        "policy_unchanged_count": q_learning.policy_unchanged_count,
+        "policy_changed": q_learning.policy_changed,
+        "changed_states": changed_states,
+        "rng_state": q_learning.rng.getstate(),
+        "environment_rng_state": environment_rng.getstate() if environment_rng is not None else None,
+        "arrays": {}
+    }
+    # offsets are relative to the end of the header, so they don't depend on the header length
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header_bytes = json.dumps(header).encode()
+    # pad the header so the arrays start aligned
+    header_bytes += b" " * (-(len(MAGIC) + 4 + len(header_bytes)) % ALIGNMENT)
+
+    temporary_file = file + ".tmp"
+    with open(temporary_file, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.write(array.tobytes())
+            f.write(b"\0" * (-array.nbytes % ALIGNMENT))
+    os.replace(temporary_file, file)
+
+
+def read_checkpoint(file, mmap=True):
+    """
+    Reads a checkpoint file.
+    :param file: name of the checkpoint file
+    :param mmap: optionally load the arrays into memory instead of memory mapping them
+    :return: tuple of header dictionary, dictionary of arrays
+    """
+    with open(file, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a checkpoint file".format(file))
+        header_length, = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_length).decode())
+    if header["version"] not in (1, 2, VERSION):
+        raise ValueError("Unsupported checkpoint version {}".format(header["version"]))
+
+    start = len(MAGIC) + 4 + header_length
+    arrays = {}
+    for name, info in header["arrays"].items():
+        if mmap:
+            arrays[name] = np.memmap(file, dtype=np.dtype(info["dtype"]), mode="c",
+                                     offset=start + info["offset"], shape=tuple(info["shape"]))
+        else:
+            arrays[name] = np.fromfile(file, dtype=np.dtype(info["dtype"]), offset=start + info["offset"],
+                                       count=int(np.prod(info["shape"]))).reshape(info["shape"])
+    return header, arrays
+
+
+def load_checkpoint(q_learning, file, mmap=True, restore_random_state=True, environment=None):
+    """
+    Restores the learned state of a QLearning object set up with the same Gridworld and actions.
+    :param q_learning: QLearning object
+    :param file: name of the checkpoint file
+    :param mmap: optionally load the arrays into memory instead of memory mapping them
+    :param restore_random_state: optionally leave the random number streams untouched,
+                                 e.g. when only serving the loaded policy
+    :param environment: optionally environment whose random number stream is restored,
+                        by default the one env_perform_action is a method of
+    """
+    header, arrays = read_checkpoint(file, mmap)
+    if tuple(header["dim"]) != tuple(q_learning.dim) or header["state_count"] != len(q_learning.states):
+        raise ValueError("Checkpoint was saved for a different Gridworld")
+    if [tuple(a) for a in header["actions"]] != list(q_learning.actions):
+        raise ValueError("Checkpoint was saved with different actions")
+    # not in checkpoints saved before the eligibility traces were, which keep the current lambda
+    trace_decay = header.get("trace_decay", q_learning.trace_decay)
+    if trace_decay and q_learning.q_engine != "array":
+        raise ValueError("Checkpoint was saved with eligibility traces, which need the array Q engine")
+
+    q_values, greedy = arrays["q_values"], arrays["greedy"]
+    # only in checkpoints of the sparse Q engine, None means there is a row for every state
+    states = arrays.get("states")
+    if q_learning.q_engine == "array":
+        if states is None:
+            # use the (memory mapped) arrays directly instead of copying them
+            q_learning.q_function.table = q_values
+            q_learning.policy.greedy = greedy
+        else:
+            q_learning.q_function.reset()
+            q_learning.q_function.table[states] = q_values
+            q_learning.policy.greedy = np.zeros(len(q_learning.states), dtype=np.int64)
+            q_learning.policy.greedy[states] = greedy
+        q_learning.changed_states = set(header["changed_states"])
+    elif q_learning.q_engine == "sparse":
+        if states is None:
+            # only states with a Q-value different from the default need a row
+            states = np.flatnonzero((q_values != 0).any(axis=1))
+            q_values, greedy = q_values[states], greedy[states]
+        q_learning.q_function.reset()
+        q_learning.q_function.assign(states, q_values)
+        q_learning.policy.assign(q_learning.q_function, greedy)
+        q_learning.changed_states = set(header["changed_states"])
+    else:
+        if states is None:
+            states = range(len(q_learning.states))
+        else:
+            q_learning.reset_q_function()
+            q_learning.policy = {s: q_learning.actions[0] for s in q_learning.states}
+        for k, i in enumerate(states):
+            s = q_learning.states[i]
+            for j, a in enumerate(q_learning.actions):
+                q_learning.q_function[s, a] = q_values.item(k, j)
+            q_learning.policy[s] = q_learning.actions[greedy.item(k)]
+        q_learning.changed_states = {q_learning.states[i] for i in header["changed_states"]}
+
+    for name in ["discount_factor", "learning_rate", "epsilon", "convergence_threshold", "decimal_places",
+                 "last_convergence_episode_count", "policy_unchanged_count", "policy_changed"]:
+        setattr(q_learning, name, header[name])
+    q_learning.current_state = tuple(header["current_state"])
+    # not in checkpoints saved before the steps were counted
+    q_learning.step_count = header.get("step_count", 0)
+    # the traces of the episode the checkpoint was saved in are cleared at the start of the next one anyway
+    q_learning.set_trace_decay(trace_decay, header.get("trace_cutoff", q_learning.trace_cutoff))
+    # not in checkpoints saved before schedules existed
+    if "episode_count" in header:
+        q_learning.episode_count = header["episode_count"]
+        q_learning.learning_rate_schedule = make_schedule(header["learning_rate_schedule"])
+        q_learning.epsilon_schedule = make_schedule(header["epsilon_schedule"])
+    q_learning.visit_counts = None
+    q_learning.apply_schedules()
+    if q_learning.visit_counts is not None and "visit_counts" in arrays:
+        counts = arrays["visit_counts"]
+        counted_states = arrays["states"] if "states" in arrays else np.arange(len(q_learning.states))
+        # only pairs which were updated, so no rows are allocated for unvisited states
+        visited = np.flatnonzero(counts.any(axis=1))
+        q_learning.visit_counts.assign(counted_states[visited], counts[visited])
+    if restore_random_state and header["version"] == VERSION:
+        q_learning.rng.setstate(header["rng_state"])
+        environment_rng = environment_stream(q_learning, environment)
+        if environment_rng is not None and header["environment_rng_state"] is not None:
+            environment_rng.setstate(header["environment_rng_state"])
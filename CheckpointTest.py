@@ -0,0 +1,88 @@
+"""
+Tests of saving and loading the learned state of QLearning objects with Checkpoint.py.
+"""
+
+import numpy as np
+import pytest
+
+import Checkpoint
+from Convergence import Budget
+from Schedules import GLIE, VisitCount
+
+
+def train(q_learning, episodes):
+    q_learning.q_learning_until_convergence(resume=True, criteria=[Budget(episodes=episodes)])
+
+
+def state_of(q_learning):
+    indices = np.arange(len(q_learning.states))
+    return q_learning.q_values(indices), q_learning.greedy_actions().copy()
+
+
+@pytest.mark.parametrize("q_engine", ["dict", "array", "sparse"])
+def test_round_trip(make_learner, tmp_path, q_engine):
+    file = str(tmp_path / "run.ckpt")
+    q_learning = make_learner(q_engine=q_engine, epsilon_schedule=GLIE(0.5, 100))
+    train(q_learning, 30)
+    Checkpoint.save_checkpoint(q_learning, file)
+
+    loaded = make_learner(q_engine=q_engine, seed=2, learning_rate=0.5)
+    Checkpoint.load_checkpoint(loaded, file)
+    q_values, greedy = state_of(q_learning)
+    loaded_q_values, loaded_greedy = state_of(loaded)
+    assert np.array_equal(loaded_q_values, q_values)
+    assert np.array_equal(loaded_greedy, greedy)
+    # epsilon follows the schedule, which is restored instead
+    for name in ["learning_rate", "episode_count", "step_count", "last_convergence_episode_count",
+                 "policy_unchanged_count", "current_state"]:
+        assert getattr(loaded, name) == getattr(q_learning, name)
+    assert loaded.epsilon_schedule.spec() == q_learning.epsilon_schedule.spec()
+
+
+@pytest.mark.parametrize("q_engine", ["dict", "sparse"])
+def test_load_into_other_engine(make_learner, tmp_path, q_engine):
+    file = str(tmp_path / "run.ckpt")
+    q_learning = make_learner(q_engine="array")
+    train(q_learning, 30)
+    Checkpoint.save_checkpoint(q_learning, file)
+
+    loaded = make_learner(q_engine=q_engine)
+    Checkpoint.load_checkpoint(loaded, file)
+    q_values, greedy = state_of(q_learning)
+    loaded_q_values, loaded_greedy = state_of(loaded)
+    assert np.array_equal(loaded_q_values, q_values)
+    assert np.array_equal(loaded_greedy, greedy)
+
+
+@pytest.mark.parametrize("q_engine", ["dict", "array", "sparse"])
+def test_resumed_run_continues_exactly(make_learner, tmp_path, q_engine):
+    file = str(tmp_path / "run.ckpt")
+    q_learning = make_learner(q_engine=q_engine, learning_rate_schedule=VisitCount(0.8))
+    train(q_learning, 30)
+    Checkpoint.save_checkpoint(q_learning, file)
+    train(q_learning, 30)
+
+    # other seed, the random number streams of learner and environment come from the checkpoint
+    resumed = make_learner(q_engine=q_engine, seed=2, learning_rate_schedule=VisitCount(0.8))
+    Checkpoint.load_checkpoint(resumed, file)
+    train(resumed, 30)
+    assert resumed.step_count == q_learning.step_count
+    q_values, greedy = state_of(q_learning)
+    resumed_q_values, resumed_greedy = state_of(resumed)
+    assert np.array_equal(resumed_q_values, q_values)
+    assert np.array_equal(resumed_greedy, greedy)
+
+
+def test_checkpoint_of_other_gridworld_is_rejected(make_learner, tmp_path):
+    file = str(tmp_path / "run.ckpt")
+    Checkpoint.save_checkpoint(make_learner(), file)
+    other = make_learner(gridworld=[["F", "F", "E"], ["F", "F", "P"]])
+    with pytest.raises(ValueError):
+        Checkpoint.load_checkpoint(other, file)
+
+
+def test_file_without_magic_is_rejected(tmp_path):
+    file = tmp_path / "broken.ckpt"
+    file.write_bytes(b"no checkpoint")
+    with pytest.raises(ValueError):
+        Checkpoint.read_checkpoint(str(file))
@@ -0,0 +1,210 @@
+"""
+This CoarseToFineQLearning class trains on large Gridworlds by solving coarser versions of them first.
+
+From uniformly random starting states the reward of the goal states needs a very large number
+of episodes to spread through Q of a large Gridworld. Here the Gridworld is first downsampled into
+coarse Gridworlds in which every field stands for a square block of 2, 4, 8, ... fields:
+* a block without any state is an obstacle
+* a block containing goal fields becomes the goal field occurring most often in it
+* any other block becomes the field occurring most often in it
+Since a single step in a coarse Gridworld stands for about as many steps as the block is wide,
+the rewards of non-terminal fields are multiplied with the block width and the discount factor
+is raised to its power, so the Q-values of all levels are on the same scale.
+
+Starting with the coarsest one, every level is trained until convergence and its Q-values are
+projected onto the next finer level as starting point, i.e. every field gets the Q-values of the block
+it lies in (goal states get their reward). Only the policy at the edges of the blocks has to be
+corrected at the finer level, so the full resolution is reached after far fewer episodes.
+
+Example:
+    q_learning = CoarseToFineQLearning(environment.perform_action, environment.state_index, ...,
+                                       field_rewards=Default.FIELD_REWARDS,
+                                       transition_probabilities=Default.TRANSITION_PROBABILITIES)
+    q_learning.q_learning_until_convergence()
+"""
+
+import numpy as np
+
+import DefaultConstants as Default
+from Convergence import Budget, PolicyUnchanged
+from MDP import MDP
+from QLearning import QLearning
+
+
+def level_factors(dim, coarsest_size=Default.COARSEST_SIZE):
+    """
+    :param dim: dimensions of the Gridworld as (width, height)
+    :param coarsest_size: number of fields the longer side of the coarsest level has at least
+    :return: list of the block widths of the coarse levels, coarsest first, empty if the Gridworld is too small
+    """
+    factors = []
+    factor = 2
+    while -(-max(dim) // factor) >= coarsest_size:
+        factors.insert(0, factor)
+        factor *= 2
+    return factors
+
+
+def downsample(state_index, factor, goal_fields, obstacle_fields):
+    """
+    :param state_index: StateIndex of the Gridworld
+    :param factor: width of the square blocks of fields which become one field
+    :param goal_fields: list of fields which are considered terminal states
+    :param obstacle_fields: list of fields which are considered obstacles
+    :return: two-dimensional array of the field byte values of the coarse Gridworld
+    """
+    width, height = state_index.dim
+    columns, rows = -(-width // factor), -(-height // factor)
+    padded = np.full((rows * factor, columns * factor), -1, dtype=np.int32)
+    padded[:height, :width] = state_index.index_grid
+    # one line of factor * factor state indices per block
+    blocks = padded.reshape(rows, factor, columns, factor).transpose(0, 2, 1, 3).reshape(rows, columns, -1)
+    is_state = blocks >= 0
+    fields = state_index.state_fields[blocks]
+
+    codes = np.unique(state_index.state_fields)
+    counts = np.stack([np.count_nonzero(is_state & (fields == code), axis=2) for code in codes], axis=2)
+    # any goal field in a block outweighs all other fields
+    is_goal_code = np.isin(codes, [ord(field) for field in goal_fields])
+    priorities = counts + np.where(is_goal_code & (counts > 0), factor * factor, 0)
+    coarse = codes[priorities.argmax(axis=2)]
+    coarse[~is_state.any(axis=2)] = ord(obstacle_fields[0])
+    return coarse.astype(np.uint8)
+
+
+def project_q_values(coarse_q_learning, fine_q_learning, ratio, field_rewards):
+    """
+    :param coarse_q_learning: QLearning object of the coarser level
+    :param fine_q_learning: QLearning object of the finer level
+    :param ratio: number of fields of the finer level in the width of a field of the coarser level
+    :param field_rewards: dictionary which maps fields to a reward value, only used for goal fields
+    :return: array of Q-values for the finer level, one row per state and one column per action
+    """
+    coarse_q_values = coarse_q_learning.q_values(np.arange(len(coarse_q_learning.states)))
+    x, y = (fine_q_learning.state_index.coordinates // ratio).T
+    # every block of the finer level with a state lies inside a block of the coarser level with a state
+    q_values = coarse_q_values[coarse_q_learning.state_index.index_grid[y, x]]
+    # nothing follows a goal state, so its Q-values are its reward
+    is_goal = fine_q_learning.is_goal
+    q_values[is_goal] = fine_q_learning.state_index.field_values(field_rewards)[is_goal, None]
+    return q_values
+
+
+class CoarseToFineQLearning(QLearning):
+    def __init__(self, env_perform_action, state_list, goal_fields, obstacle_fields, actions, discount_factor,
+                 learning_rate, epsilon, convergence_threshold, field_rewards, transition_probabilities,
+                 decimal_places=5, q_engine="dict", seed=None, learning_rate_schedule=None, epsilon_schedule=None,
+                 coarsest_size=Default.COARSEST_SIZE, level_episodes_per_state=Default.LEVEL_EPISODES_PER_STATE):
+        """
+        Sets up a representation of the gridworld given the following parameters.
+        Apart from the ones listed here the parameters are the same as for QLearning.
+
+        :param field_rewards: dictionary which maps fields to a reward value, the same as of the environment
+        :param transition_probabilities: dictionary of transition probabilities, the same as of the environment
+        :param coarsest_size: optionally change the number of fields the longer side of the coarsest level has
+                              at least, Gridworlds smaller than twice that are trained at full resolution only
+        :param level_episodes_per_state: optionally change the maximum number of episodes of a coarse level
+                                         per state of it, as the policy of a coarse level rarely stays unchanged
+                                         for the convergence threshold when learning rate and epsilon are constant
+        """
+
+        super().__init__(env_perform_action, state_list, goal_fields, obstacle_fields, actions, discount_factor,
+                         learning_rate, epsilon, convergence_threshold, decimal_places, q_engine=q_engine, seed=seed,
+                         learning_rate_schedule=learning_rate_schedule, epsilon_schedule=epsilon_schedule)
+        # for setting up the coarse levels
+        self.goal_fields = goal_fields
+        self.obstacle_fields = obstacle_fields
+        self.field_rewards = field_rewards
+        self.transition_probabilities = transition_probabilities
+        self.coarsest_size = coarsest_size
+        self.level_episodes_per_state = level_episodes_per_state
+        # dictionary of factor, dimensions, episodes and steps of every coarse level of the last run, coarsest first
+        self.levels = []
+        # False once Q was set from outside, e.g. by a warm start from the cache, which training the levels would undo
+        self.train_levels = True
+
+
+    def reset_q_function(self):
+        """(Re)sets action-value function Q to 0, so the next run trains the coarse levels again"""
+        super().reset_q_function()
+        self.train_levels = True
+
+
+    def set_q_function(self, q_values):
+        """
+        Sets action-value function Q to the given values and updates the policy. The next run keeps them
+        instead of training the coarse levels.
+        :param q_values: array with one row per state, in the order of states, and one column per action
+        """
+        super().set_q_function(q_values)
+        self.train_levels = False
+
+
+    def make_level(self, factor):
+        """
+        :param factor: width of the square blocks of fields which become one field
+        :return: QLearning object for the Gridworld downsampled by the factor, with an MDP of its own
+        """
+        gridworld = downsample(self.state_index, factor, self.goal_fields, self.obstacle_fields)
+        field_rewards = {field: reward if field in self.goal_fields else reward * factor
+                         for field, reward in self.field_rewards.items()}
+        environment_stream, learner_stream = self.rng.spawn(2)
+        environment = MDP(state_list=gridworld,
+                          field_rewards=field_rewards,
+                          obstacle_fields=self.obstacle_fields,
+                          actions=self.actions,
+                          transition_probabilities=self.transition_probabilities,
+                          seed=environment_stream)
+        return QLearning(env_perform_action=environment.perform_action,
+                         state_list=environment.state_index,
+                         goal_fields=self.goal_fields,
+                         obstacle_fields=self.obstacle_fields,
+                         actions=self.actions,
+                         discount_factor=self.discount_factor ** factor,
+                         learning_rate=self.learning_rate,
+                         epsilon=self.epsilon,
+                         convergence_threshold=self.convergence_threshold,
+                         decimal_places=self.decimal_places,
+                         q_engine=self.q_engine,
+                         seed=learner_stream,
+                         learning_rate_schedule=self.learning_rate_schedule,
+                         epsilon_schedule=self.epsilon_schedule)
+
+
+    def train_coarse_levels(self):
+        """
+        Trains every coarse level until convergence, starting from the projected Q-values of the coarser one,
+        and sets Q to the projection of the finest of them.
+        """
+        self.levels = []
+        coarse_q_learning = None
+        coarse_factor = None
+        for factor in level_factors(self.dim, self.coarsest_size):
+            q_learning = self.make_level(factor)
+            if coarse_q_learning is not None:
+                q_learning.set_q_function(project_q_values(coarse_q_learning, q_learning, coarse_factor // factor,
+                                                           self.field_rewards))
+            q_learning.q_learning_until_convergence(criteria=[
+                PolicyUnchanged(), Budget(episodes=int(self.level_episodes_per_state * len(q_learning.states)))])
+            self.levels.append({"factor": factor, "dim": list(q_learning.dim),
+                                "episodes": q_learning.last_convergence_episode_count,
+                                "steps": q_learning.step_count})
+            coarse_q_learning, coarse_factor = q_learning, factor
+        if coarse_q_learning is not None:
+            self.set_q_function(project_q_values(coarse_q_learning, self, coarse_factor, self.field_rewards))
+
+
+    def q_learning_until_convergence(self, resume=False, checkpoint_file=None, checkpoint_interval=1000,
+                                     criteria=None, episode_callback=None):
+        """
+        Trains the coarse levels first and then performs Q-learning episodes at full resolution until the policy
+        hasn't changed for a given number of episodes (i.e. it has converged) or until any of the given criteria
+        is met. The coarse levels always stop once their policy converged. They are only trained if Q was (re)set
+        to 0 and no episode was performed since, so Q-values set from outside (e.g. a warm start), a loaded
+        checkpoint or the result of an earlier run are kept.
+        :param resume: optionally continue a previous run without training the coarse levels again
+        """
+
+        if not resume and self.train_levels and self.episode_count == 0:
+            self.train_coarse_levels()
+        super().q_learning_until_convergence(resume, checkpoint_file, checkpoint_interval, criteria, episode_callback)
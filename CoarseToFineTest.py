@@ -0,0 +1,96 @@
+"""
+Tests of downsampling, projecting Q-values and coarse-to-fine training with CoarseToFine.py.
+"""
+
+import numpy as np
+import pytest
+
+from CoarseToFine import CoarseToFineQLearning, downsample, level_factors, project_q_values
+import DefaultConstants as Default
+import GridFile
+
+
+def coarse_fields(make_learner, gridworld, factor):
+    state_index = make_learner(gridworld=gridworld).state_index
+    coarse = downsample(state_index, factor, Default.GOAL_FIELDS, Default.OBSTACLE_FIELDS)
+    return [[chr(code) for code in row] for row in coarse.tolist()]
+
+
+def coarse_to_fine_kwargs(gridworld, **kwargs):
+    return dict(gridworld=gridworld, learner=CoarseToFineQLearning, q_engine="array",
+                field_rewards=Default.FIELD_REWARDS, transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                **kwargs)
+
+
+def test_level_factors():
+    assert level_factors((10, 10), coarsest_size=16) == []
+    assert level_factors((32, 20), coarsest_size=16) == [2]
+    assert level_factors((100, 30), coarsest_size=16) == [4, 2]
+
+
+def test_goal_fields_win(make_learner):
+    gridworld = [["F", "F", "F", "F"],
+                 ["F", "E", "P", "F"]]
+    assert coarse_fields(make_learner, gridworld, 2) == [["E", "P"]]
+    # the goal field occurring most often wins over another goal field
+    gridworld = [["P", "E", "F", "F"],
+                 ["P", "F", "F", "F"]]
+    assert coarse_fields(make_learner, gridworld, 2) == [["P", "F"]]
+
+
+def test_blocks_of_obstacles(make_learner):
+    gridworld = [["O", "O", "F", "O"],
+                 ["O", "O", "O", "O"]]
+    # a single state keeps a block from being an obstacle
+    assert coarse_fields(make_learner, gridworld, 2) == [["O", "F"]]
+
+
+def test_odd_sizes_are_padded(make_learner):
+    gridworld = [["F", "F", "F", "F", "E"],
+                 ["F", "F", "F", "F", "F"],
+                 ["P", "O", "F", "F", "F"]]
+    # the padding beyond the right and bottom edge isn't counted, so the blocks there only consist of the
+    # fields inside the Gridworld
+    assert coarse_fields(make_learner, gridworld, 2) == [["F", "F", "E"],
+                                                          ["P", "F", "F"]]
+
+
+def test_project_q_values(make_learner):
+    gridworld = GridFile.generate_random_gridworld(8, 6, seed=2)
+    fine = make_learner(**coarse_to_fine_kwargs(gridworld, coarsest_size=4))
+    coarse = fine.make_level(2)
+    coarse.set_q_function(np.arange(len(coarse.states) * len(coarse.actions), dtype=np.float64)
+                          .reshape(len(coarse.states), len(coarse.actions)))
+    q_values = project_q_values(coarse, fine, 2, Default.FIELD_REWARDS)
+    assert q_values.shape == (len(fine.states), len(fine.actions))
+
+    rewards = fine.state_index.field_values(Default.FIELD_REWARDS)
+    for i, (x, y) in enumerate(fine.states):
+        if fine.is_goal[i]:
+            # all actions of a goal state are worth its reward
+            assert (q_values[i] == rewards[i]).all()
+        else:
+            block = coarse.state_index.index((x // 2, y // 2))
+            assert np.array_equal(q_values[i], coarse.q_values(np.array([block]))[0])
+
+
+def test_converges_with_a_coarse_level(make_learner):
+    gridworld = [["F"] * 8 for _ in range(8)]
+    gridworld[0][7] = "E"
+    gridworld[3][5] = "P"
+    gridworld[4][2] = gridworld[4][3] = "O"
+    q_learning = make_learner(**coarse_to_fine_kwargs(gridworld, coarsest_size=4, convergence_threshold=50))
+    q_learning.q_learning_until_convergence()
+    assert q_learning.convergence_criterion == "policy_unchanged"
+    assert [level["factor"] for level in q_learning.levels] == [2]
+    assert q_learning.levels[0]["dim"] == [4, 4]
+    assert q_learning.levels[0]["episodes"] > 0
+
+    # next to the goal field the policy leads straight to it
+    right, up = Default.ACTIONS.index((1, 0)), Default.ACTIONS.index((0, -1))
+    assert q_learning.greedy_actions()[q_learning.state_index.index((6, 0))] == right
+    assert q_learning.greedy_actions()[q_learning.state_index.index((7, 1))] == up
+    # the coarse levels aren't trained again when continuing
+    levels = q_learning.levels
+    q_learning.q_learning_until_convergence(resume=True)
+    assert q_learning.levels is levels
@@ -0,0 +1,187 @@
+"""
+Convergence criteria for QLearning.q_learning_until_convergence.
+
+By default Q-learning stops when the policy hasn't changed for convergence_threshold episodes,
+which always costs at least that many episodes after the policy has settled. Other criteria can
+be given instead or in addition, the run stops as soon as any of them is met and the name of that
+criterion is saved in QLearning.convergence_criterion:
+* PolicyUnchanged: the default, policy unchanged for a number of episodes
+* QDeltaWindow: no Q-value changed by more than a tolerance in a number of episodes in a row
+* PolicyEvaluation: the expected return of the greedy policy, evaluated periodically with the
+  transition model of the MDP (see Planner.py), stopped improving
+* Budget: a maximum wall-clock time, number of steps or number of episodes was reached
+* Stop: stop was called, e.g. from another thread
+
+Example:
+    q_learning.q_learning_until_convergence(criteria=[PolicyUnchanged(), Budget(seconds=60)])
+"""
+
+import threading
+import time
+
+
+class ConvergenceCriterion:
+    """
+    Base class of the convergence criteria.
+    start is called when a run starts, update after every episode and converged before every episode.
+    """
+
+    name = None
+
+
+    def start(self, q_learning):
+        """
+        :param q_learning: QLearning object about to be trained
+        """
+        pass
+
+
+    def update(self, q_learning):
+        """
+        :param q_learning: QLearning object which just finished an episode
+        """
+        pass
+
+
+    def converged(self, q_learning):
+        """
+        :param q_learning: QLearning object being trained
+        :return: True if training should stop
+        """
+        raise NotImplementedError
+
+
+class PolicyUnchanged(ConvergenceCriterion):
+    name = "policy_unchanged"
+
+
+    def __init__(self, threshold=None):
+        """
+        :param threshold: optionally number of episodes without change of the policy,
+                          the convergence threshold of the QLearning object by default
+        """
+        self.threshold = threshold
+
+
+    def converged(self, q_learning):
+        threshold = self.threshold if self.threshold is not None else q_learning.convergence_threshold
+        return q_learning.policy_unchanged_count >= threshold
+
+
+class QDeltaWindow(ConvergenceCriterion):
+    name = "q_delta"
+
+
+    def __init__(self, tolerance, window):
+        """
+        :param tolerance: largest change of a Q-value within an episode for which Q is considered unchanged
+        :param window: number of episodes in a row in which Q has to be unchanged
+        """
+        self.tolerance = tolerance
+        self.window = window
+        self.count = 0
+
+
+    def start(self, q_learning):
+        self.count = 0
+
+
+    def update(self, q_learning):
+        if q_learning.max_q_delta <= self.tolerance:
+            self.count += 1
+        else:
+            self.count = 0
+
+
+    def converged(self, q_learning):
+        return self.count >= self.window
+
+
+class PolicyEvaluation(ConvergenceCriterion):
+    name = "policy_evaluation"
+
+
+    def __init__(self, planner, interval=100, tolerance=1e-3, patience=3, sweeps=50):
+        """
+        :param planner: Planner object of the MDP the QLearning object learns
+        :param interval: number of episodes between two evaluations
+        :param tolerance: largest change of the expected return for which it is considered unchanged
+        :param patience: number of evaluations in a row in which the expected return has to be unchanged
+        :param sweeps: number of backups per evaluation, starting from the values of the last evaluation
+        """
+        self.planner = planner
+        self.interval = interval
+        self.tolerance = tolerance
+        self.patience = patience
+        self.sweeps = sweeps
+
+
+    def start(self, q_learning):
+        self.values = None
+        # expected return of the policy at the last evaluation, i.e. mean value of all (starting) states
+        self.expected_return = None
+        self.count = 0
+        self.next_evaluation = q_learning.last_convergence_episode_count + self.interval
+
+
+    def update(self, q_learning):
+        if q_learning.last_convergence_episode_count < self.next_evaluation:
+            return
+        self.next_evaluation = q_learning.last_convergence_episode_count + self.interval
+        self.values = self.planner.evaluate_policy(q_learning.greedy_actions(), self.sweeps, self.values)
+        expected_return = float(self.values.mean())
+        if self.expected_return is not None and abs(expected_return - self.expected_return) <= self.tolerance:
+            self.count += 1
+        else:
+            self.count = 0
+        self.expected_return = expected_return
+
+
+    def converged(self, q_learning):
+        return self.count >= self.patience
+
+
+class Budget(ConvergenceCriterion):
+    name = "budget"
+
+
+    def __init__(self, seconds=None, steps=None, episodes=None):
+        """
+        Stops after the first of the given limits is reached. Limits are checked between episodes.
+        :param seconds: optionally maximum wall-clock time of the run
+        :param steps: optionally maximum number of Q-learning steps of the run
+        :param episodes: optionally maximum number of episodes of the run
+        """
+        self.seconds = seconds
+        self.steps = steps
+        self.episodes = episodes
+
+
+    def start(self, q_learning):
+        self.start_time = time.perf_counter()
+        self.start_step_count = q_learning.step_count
+        self.start_episode_count = q_learning.last_convergence_episode_count
+
+
+    def converged(self, q_learning):
+        return (self.seconds is not None and time.perf_counter() - self.start_time >= self.seconds
+                or self.steps is not None and q_learning.step_count - self.start_step_count >= self.steps
+                or self.episodes is not None
+                and q_learning.last_convergence_episode_count - self.start_episode_count >= self.episodes)
+
+
+class Stop(ConvergenceCriterion):
+    name = "stopped"
+
+
+    def __init__(self):
+        """Lets another thread end a run at the next episode boundary by calling stop."""
+        self.event = threading.Event()
+
+
+    def stop(self):
+        self.event.set()
+
+
+    def converged(self, q_learning):
+        return self.event.is_set()
@@ -0,0 +1,75 @@
+"""
+Tests of the convergence criteria of Convergence.py and of the Q changes they depend on.
+"""
+
+import pytest
+
+from Convergence import Budget, PolicyEvaluation, PolicyUnchanged, QDeltaWindow, Stop
+import DefaultConstants as Default
+from Planner import Planner
+
+
+def test_policy_unchanged_is_the_default(make_learner):
+    q_learning = make_learner()
+    q_learning.q_learning_until_convergence()
+    assert q_learning.convergence_criterion == PolicyUnchanged.name
+    assert q_learning.policy_unchanged_count == q_learning.convergence_threshold
+
+
+def test_first_criterion_met_ends_the_run(make_learner):
+    q_learning = make_learner()
+    q_learning.q_learning_until_convergence(criteria=[PolicyUnchanged(), Budget(episodes=10)])
+    assert q_learning.convergence_criterion == Budget.name
+    assert q_learning.last_convergence_episode_count == 10
+
+
+def test_step_budget_counts_from_the_start_of_the_run(make_learner):
+    q_learning = make_learner()
+    q_learning.q_learning_until_convergence(criteria=[Budget(episodes=10)])
+    steps = q_learning.step_count
+    q_learning.q_learning_until_convergence(resume=True, criteria=[Budget(steps=100)])
+    assert q_learning.convergence_criterion == Budget.name
+    # limits are checked between episodes
+    assert q_learning.step_count - steps >= 100
+
+
+def test_q_delta_window(make_learner):
+    q_learning = make_learner(q_engine="array")
+    criterion = QDeltaWindow(tolerance=0.5, window=3)
+    criterion.start(q_learning)
+    for max_q_delta, converged in [(0.1, False), (0.6, False), (0.1, False), (0.2, False), (0.0, True)]:
+        q_learning.max_q_delta = max_q_delta
+        criterion.update(q_learning)
+        assert criterion.converged(q_learning) == converged
+
+    q_learning.q_learning_until_convergence(criteria=[QDeltaWindow(tolerance=0.01, window=5)])
+    assert q_learning.convergence_criterion == QDeltaWindow.name
+
+
+def test_policy_evaluation(make_learner):
+    q_learning = make_learner(q_engine="array")
+    environment = q_learning.env_perform_action.__self__
+    planner = Planner(environment, Default.GOAL_FIELDS, q_learning.discount_factor)
+    q_learning.q_learning_until_convergence(criteria=[PolicyEvaluation(planner, interval=20),
+                                                      Budget(episodes=10000)])
+    assert q_learning.convergence_criterion == PolicyEvaluation.name
+
+
+def test_stop(make_learner):
+    q_learning = make_learner()
+    stop = Stop()
+    stop.stop()
+    q_learning.q_learning_until_convergence(criteria=[stop])
+    assert q_learning.convergence_criterion == Stop.name
+    assert q_learning.last_convergence_episode_count == 0
+
+
+@pytest.mark.parametrize("planning", [{"planning_steps": 5}, {"sweeping_budget": 5}])
+def test_planned_updates_count_as_q_changes(make_learner, planning):
+    q_learning = make_learner(q_engine="array", convergence_threshold=100, **planning)
+    q_learning.q_learning_episode()
+    assert q_learning.max_q_delta > 0
+    # the model backs up expected targets, so Q settles and the policy converges,
+    # in far fewer episodes than the about 2400 of plain Q-learning
+    q_learning.q_learning_until_convergence(resume=True, criteria=[PolicyUnchanged(), Budget(episodes=1000)])
+    assert q_learning.convergence_criterion == PolicyUnchanged.name
@@ -14,13 +14,37 @@ TRANSITION_PROBABILITIES = {"straight": 0.8, "lateral": 0.1}
 DISCOUNT_FACTOR = 1.0
 LEARNING_RATE = 0.1
 EPSILON = 0.5
+# None keeps LEARNING_RATE and EPSILON constant, otherwise a schedule in list notation (see Schedules.py),
+# e.g. ["visit_count", 0.8, 0.01] or ["exponential", 0.5, 0.999, 0.05]
+LEARNING_RATE_SCHEDULE = None
+EPSILON_SCHEDULE = None
 CONVERGENCE_THRESHOLD = 100
+COARSE_TO_FINE = False  # True trains coarse versions of the Gridworld first, see CoarseToFine.py
+# the longer side of the coarsest level of coarse-to-fine training (see CoarseToFine.py) has at least this many fields
+COARSEST_SIZE = 16
+LEVEL_EPISODES_PER_STATE = 5  # maximum number of episodes of a coarse level per state of it
+WORKERS = 1  # number of processes for Q-learning until convergence, more than 1 uses ParallelQLearning.py
+# directory of the cache of converged solutions (see SolutionCache.py), None disables the cache
+CACHE_DIR = None
+CACHE_SIZE = 1 << 30  # maximum size of all cache entries together in bytes
+CACHE_WARM_START = False  # True starts training from a cached solution of the same Gridworld with other parameters
+LOG_BUFFER_SIZE = 4096  # number of transitions written to a trajectory log at once (see TrajectoryLog.py)
+LOG_CHUNK_SIZE = 1 << 16  # number of transitions read from a trajectory log at once for offline Q-learning
+# a pair replayed n times is updated with at most the learning rate 1 / n^REPLAY_EXPONENT (see QLearning.replay)
+REPLAY_EXPONENT = 0.8
+TRACE_DECAY = 0.0  # lambda of Q(lambda) (see EligibilityTraces.py), 0 for one-step Q-learning
+TRACE_CUTOFF = 0.01  # eligibility traces below this are dropped
+Q_ENGINE = "dict"  # "dict" or "array", the latter being faster and smaller for large Gridworlds,
+#                    or "sparse" for huge Gridworlds of which only a small part is visited
 
 # default values for pretty printing
 FIELD_MAPPING = {"F": " ", "O": "■", "E": "+", "P": "-"}
 BOUNDARY_CHAR = "█"
 ACTION_MAPPING = {(0, -1): "↑", (1, 0): "→", (0, 1): "↓", (-1, 0): "←", (0, 0): " "}
 OUTPUT_WIDTH = 90
+VIEWPORT_SIZE = (10, 10)  # (width, height) of the largest part of a Gridworld printed field by field
+SUMMARY_SIZE = (40, 20)  # maximum (width, height) of the downsampled summary of larger Gridworlds
+VALUE_SHADES = ".:-=+*#%@"  # characters for increasing state values in the summary
 
 # other
 SLEEP_TIME = 1.5
@@ -0,0 +1,96 @@
+"""
+This DynaModel class is the learned model of the environment used for Dyna-Q planning.
+
+For every (state, action) pair it remembers the follow-up states observed so far and how often
+each of them occurred (the empirical slip distribution), as well as the mean reward.
+Since an action only has a handful of possible outcomes in a Gridworld, every pair has a fixed number
+of outcome slots in preallocated NumPy arrays. If more distinct outcomes are observed, the least
+frequent one is replaced.
+
+Planning samples previously observed (state, action) pairs uniformly and backs them up with the
+expected Q-learning target over all outcomes observed so far (full backups, see expected_targets),
+all vectorized. Sampling a single follow-up state per pair and updating with a learning rate instead
+would keep adding noise to Q, so the greedy action of states whose best actions are almost equally good
+would never stop changing.
+"""
+
+import numpy as np
+
+from RandomStream import as_stream
+
+
+class DynaModel:
+    def __init__(self, state_count, action_count, outcome_slots=4, seed=None):
+        """
+        :param state_count: number of states
+        :param action_count: number of actions
+        :param outcome_slots: optionally maximum number of distinct follow-up states remembered per pair
+        :param seed: optionally seed or RandomStream for the random numbers
+        """
+        self.action_count = action_count
+        self.rng = as_stream(seed)
+        # follow-up state indices per (state, action) pair, -1 marks empty slots
+        self.next_states = np.full((state_count, action_count, outcome_slots), -1, dtype=np.int32)
+        # how often each of the follow-up states was observed
+        self.counts = np.zeros((state_count, action_count, outcome_slots), dtype=np.uint32)
+        # mean immediate reward per (state, action) pair
+        self.rewards = np.zeros((state_count, action_count), dtype=np.float64)
+        # flat indices s * action_count + a of all pairs observed at least once
+        self.observed = np.empty(1024, dtype=np.int64)
+        self.observed_count = 0
+
+
+    def observe(self, s, a, r, s_prime):
+        """
+        Adds a real transition to the model.
+        :param s: index of the state
+        :param a: index of the action
+        :param r: immediate reward
+        :param s_prime: index of the follow-up state
+        """
+        next_states = self.next_states[s, a]
+        counts = self.counts[s, a]
+        total = int(counts.sum())
+        if total == 0:
+            if self.observed_count == len(self.observed):
+                self.observed = np.concatenate([self.observed, np.empty_like(self.observed)])
+            self.observed[self.observed_count] = s * self.action_count + a
+            self.observed_count += 1
+
+        slots = np.flatnonzero(next_states == s_prime)
+        if len(slots):
+            slot = slots[0]
+        else:
+            # use an empty slot, or replace the least frequent outcome if there is none
+            slot = int(counts.argmin())
+            next_states[slot] = s_prime
+            counts[slot] = 0
+        counts[slot] += 1
+        self.rewards[s, a] += (r - self.rewards[s, a]) / (total + 1)
+
+
+    def sample_pairs(self, count):
+        """
+        :param count: number of pairs
+        :return: tuple of arrays of state indices and action indices of randomly chosen previously observed pairs
+        """
+        pairs = self.observed[self.rng.generator.integers(self.observed_count, size=count)]
+        return np.divmod(pairs, self.action_count)
+
+
+    def expected_targets(self, q, s, a, is_goal, discount_factor):
+        """
+        :param q: array Q-table
+        :param s: array of state indices
+        :param a: array of action indices
+        :param is_goal: array which is True for the indices of terminal states
+        :param discount_factor: float being the discount factor gamma
+        :return: array of the expected Q-learning targets of the pairs, averaged over their observed outcomes
+        """
+        counts = self.counts[s, a].astype(np.float64)
+        next_states = self.next_states[s, a]
+        # empty slots have count 0, so their (arbitrary) value doesn't matter
+        next_values = q[np.maximum(next_states, 0)].max(axis=2)
+        future = (counts * next_values).sum(axis=1) / np.maximum(counts.sum(axis=1), 1)
+        future[is_goal[s]] = 0  # if a state is a goal state future reward will always be 0
+        return self.rewards[s, a] + discount_factor * future
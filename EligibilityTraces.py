@@ -0,0 +1,120 @@
+"""
+This EligibilityTraces class holds the eligibility traces of Watkins's Q(lambda).
+
+With one-step Q-learning the reward of a goal moves only one step back per visit of a state,
+so on long paths it takes many episodes to reach the start. Q(lambda) updates every recently performed
+(state, action) pair with the TD error of the current step as well, weighted by its trace, which starts at 1
+when the pair is performed and is multiplied with gamma * lambda after every step. A single episode
+reaching a goal therefore updates the whole path leading there. The traces are cut whenever an exploratory
+(non-greedy) action is performed, since the pairs before it didn't lead to the current state greedily.
+
+Only the pairs with a trace of at least a cutoff are kept, as arrays of state indices, action indices and traces
+(the active set), so a step costs time proportional to the number of active pairs instead of the size of Q.
+Since all traces decay by the same factor, the arrays hold them divided by a common scale, which is all
+that changes after a step. Pairs whose trace fell below the cutoff are removed together once the active set
+has grown to twice the number of steps it takes a trace to fall below the cutoff.
+
+Usage: QLearning(..., q_engine="array", trace_decay=0.9)
+"""
+
+import math
+
+import numpy as np
+
+import DefaultConstants as Default
+
+
+class EligibilityTraces:
+    def __init__(self, trace_decay, cutoff=Default.TRACE_CUTOFF):
+        """
+        :param trace_decay: lambda, the traces are multiplied with it and the discount factor after every step
+        :param cutoff: optionally change the smallest trace kept in the active set
+        """
+        self.trace_decay = trace_decay
+        self.cutoff = cutoff
+        # number of steps after which a trace is below the cutoff (if its pair wasn't performed again),
+        # at most as many as without discounting, since the discount factor can change between episodes
+        lifetime = math.ceil(math.log(cutoff) / math.log(trace_decay)) if 0 < trace_decay < 1 else 64
+        # the active set is pruned when it gets this large
+        self.capacity = 2 * max(lifetime, 1)
+        self.states = np.zeros(self.capacity, dtype=np.int64)
+        self.actions = np.zeros(self.capacity, dtype=np.int64)
+        # trace of every active pair divided by scale
+        self.traces = np.zeros(self.capacity)
+        self.scale = 1.0
+        # number of active pairs, stored at the beginning of the arrays
+        self.size = 0
+        # (state index, action index) -> position of the active pair in the arrays
+        self.positions = {}
+
+
+    def clear(self):
+        """Removes all traces, e.g. after an exploratory action or at the start of an episode"""
+        self.size = 0
+        self.scale = 1.0
+        self.positions.clear()
+
+
+    def visit(self, i, j):
+        """
+        Sets the trace of the performed (state, action) pair to 1 (replacing traces).
+        :param i: index of the state
+        :param j: index of the action
+        """
+        position = self.positions.get((i, j))
+        if position is None:
+            if self.size == self.capacity:
+                self.prune()
+            position = self.size
+            self.size += 1
+            self.states[position] = i
+            self.actions[position] = j
+            self.positions[i, j] = position
+        self.traces[position] = 1 / self.scale
+
+
+    def update(self, q, step, decimal_places):
+        """
+        Adds the step times the trace to the Q-value of every active pair.
+        :param q: array Q-table
+        :param step: learning rate times TD error of the current step
+        :param decimal_places: number of decimal places the Q-values are rounded to
+        :return: array of the state indices of the active pairs
+        """
+        states, actions = self.states[:self.size], self.actions[:self.size]
+        q[states, actions] = np.round(q[states, actions] + step * self.scale * self.traces[:self.size],
+                                      decimal_places)
+        return states
+
+
+    def decay_traces(self, discount_factor):
+        """
+        Multiplies all traces with gamma * lambda.
+        :param discount_factor: current discount factor gamma of Q-learning
+        """
+        self.scale *= discount_factor * self.trace_decay
+        # long episodes revisiting the same pairs never fill the active set, so the scale is kept from vanishing
+        if self.scale < 1e-100:
+            self.traces[:self.size] *= self.scale
+            self.scale = 1.0
+
+
+    def prune(self):
+        """Removes the pairs whose trace fell below the cutoff, making more space if that doesn't free enough"""
+        traces = self.traces[:self.size] * self.scale
+        keep = traces >= self.cutoff
+        count = int(np.count_nonzero(keep))
+        self.states[:count] = self.states[:self.size][keep]
+        self.actions[:count] = self.actions[:self.size][keep]
+        self.traces[:count] = traces[keep]
+        self.traces[count:] = 0
+        self.scale = 1.0
+        self.size = count
+        self.positions = {(i, j): position for position, (i, j)
+                          in enumerate(zip(self.states[:count].tolist(), self.actions[:count].tolist()))}
+        # e.g. without any decay (gamma * lambda = 1), so pruning stays rare
+        if count > self.capacity // 2:
+            self.capacity *= 2
+            self.states = np.concatenate([self.states, np.zeros_like(self.states)])
+            self.actions = np.concatenate([self.actions, np.zeros_like(self.actions)])
+            self.traces = np.concatenate([self.traces, np.zeros_like(self.traces)])
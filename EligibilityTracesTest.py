@@ -0,0 +1,84 @@
+"""
+Tests of Watkins's Q(lambda) with the eligibility traces of EligibilityTraces.py.
+"""
+
+import numpy as np
+import pytest
+
+import Checkpoint
+from Convergence import Budget
+import DefaultConstants as Default
+from EligibilityTraces import EligibilityTraces
+from Planner import Planner
+
+CORRIDOR = [["F"] * 19 + ["E"]]
+
+
+def test_traces_decay_with_gamma_and_lambda():
+    traces = EligibilityTraces(0.5, cutoff=0.1)
+    q = np.zeros((3, 2))
+    traces.visit(0, 1)
+    traces.decay_traces(0.8)
+    traces.visit(1, 0)
+    traces.update(q, 1.0, 5)
+    assert q.tolist() == [[0.0, 0.4], [1.0, 0.0], [0.0, 0.0]]
+    # visiting a pair again replaces its trace
+    traces.visit(0, 1)
+    traces.update(q, 1.0, 5)
+    assert q.tolist() == [[0.0, 1.4], [2.0, 0.0], [0.0, 0.0]]
+    traces.clear()
+    traces.update(q, 1.0, 5)
+    assert q.tolist() == [[0.0, 1.4], [2.0, 0.0], [0.0, 0.0]]
+
+
+def test_traces_below_cutoff_are_pruned():
+    traces = EligibilityTraces(0.5, cutoff=0.1)
+    for i in range(100):
+        traces.visit(i, 0)
+        traces.decay_traces(1.0)
+    # 0.5^4 is below the cutoff, so only the most recent pairs are left after pruning
+    assert traces.size <= traces.capacity
+    q = np.zeros((100, 1))
+    states = traces.update(q, 1.0, 5)
+    assert 99 in states.tolist()
+    assert q[:90].max() == 0
+    assert q[99, 0] == 0.5
+
+
+def test_q_lambda_credits_the_whole_path(make_learner):
+    policies = []
+    for trace_decay in [0, 0.9]:
+        q_learning = make_learner(gridworld=CORRIDOR, q_engine="array", epsilon=0.1, trace_decay=trace_decay)
+        q_learning.q_learning_until_convergence(criteria=[Budget(episodes=50)])
+        planner = Planner(q_learning.env_perform_action.__self__, Default.GOAL_FIELDS, q_learning.discount_factor)
+        planner.value_iteration()
+        policies.append(int(np.count_nonzero(q_learning.greedy_actions() == planner.greedy)))
+    # one-step Q-learning has only learned the end of the corridor after 50 episodes
+    assert policies[1] > policies[0] + 3
+
+
+def test_traces_use_the_current_discount_factor(make_learner):
+    q_learning = make_learner(q_engine="array", trace_decay=0.8)
+    q_learning.discount_factor = 0.5
+    q_learning.reset_current_state()
+    q_learning.q_learning_step()
+    assert q_learning.traces.scale == pytest.approx(0.4)
+
+
+def test_checkpoint_keeps_lambda(make_learner, tmp_path):
+    file = str(tmp_path / "run.ckpt")
+    q_learning = make_learner(q_engine="array", trace_decay=0.8, trace_cutoff=0.05)
+    q_learning.q_learning_until_convergence(criteria=[Budget(episodes=10)])
+    Checkpoint.save_checkpoint(q_learning, file)
+
+    resumed = make_learner(q_engine="array")
+    Checkpoint.load_checkpoint(resumed, file)
+    assert (resumed.trace_decay, resumed.trace_cutoff) == (0.8, 0.05)
+    assert resumed.traces is not None
+    q_learning.q_learning_until_convergence(resume=True, criteria=[Budget(episodes=10)])
+    resumed.q_learning_until_convergence(resume=True, criteria=[Budget(episodes=10)])
+    indices = np.arange(len(q_learning.states))
+    assert np.array_equal(resumed.q_values(indices), q_learning.q_values(indices))
+
+    with pytest.raises(ValueError):
+        Checkpoint.load_checkpoint(make_learner(q_engine="dict"), file)
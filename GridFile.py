@@ -0,0 +1,261 @@
+"""
+Generating large Gridworlds and storing them compactly.
+
+Gridworlds are handled as two-dimensional NumPy arrays of the byte values of the fields,
+i.e. ord("F"), ord("O"), ord("E") and ord("P"), which the MDP and QLearning classes accept
+in place of nested lists of characters.
+
+The binary format consists of a 16 byte header (the magic bytes b"GRID", a format version byte,
+three padding bytes and width and height as little-endian unsigned 32 bit integers)
+followed by one byte per cell, row by row. Binary files are loaded as read-only memory map,
+so even Gridworlds with millions of cells are available immediately without creating
+Python objects for single cells.
+
+Examples:
+    python GridFile.py generate big.bgrid 2000 2000 --obstacle-density 0.25 --seed 1
+    python GridFile.py generate maze.grid 51 31 --maze --loop-probability 0.05
+    python GridFile.py convert big.bgrid big.grid
+"""
+
+import argparse
+import random
+import struct
+from collections import deque
+
+import numpy as np
+
+import DefaultConstants as Default
+
+MAGIC = b"GRID"
+VERSION = 1
+HEADER = struct.Struct("<4sB3xII")
+
+
+def to_array(gridworld):
+    """
+    :param gridworld: nested list of characters or array of field byte values
+    :return: two-dimensional array of field byte values
+    """
+    if isinstance(gridworld, np.ndarray):
+        return gridworld
+    return np.array([[ord(field) for field in line] for line in gridworld], dtype=np.uint8)
+
+
+def to_list(gridworld):
+    """
+    :param gridworld: nested list of characters or array of field byte values
+    :return: nested list of characters, e.g. for printing with Gridworld.print_gridworld
+    """
+    if not isinstance(gridworld, np.ndarray):
+        return gridworld
+    return [list(line.tobytes().decode("ascii")) for line in gridworld]
+
+
+def write_binary_grid(gridworld, file):
+    """
+    Writes the Gridworld to a file in the binary format.
+    :param gridworld: nested list of characters or array of field byte values
+    :param file: name of the file
+    """
+    array = to_array(gridworld)
+    with open(file, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, array.shape[1], array.shape[0]))
+        f.write(np.ascontiguousarray(array, dtype=np.uint8).tobytes())
+
+
+def read_binary_grid(file):
+    """
+    Memory maps a Gridworld file in the binary format.
+    :param file: name of the file
+    :return: read-only two-dimensional array of field byte values
+    """
+    with open(file, "rb") as f:
+        magic, version, width, height = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a binary Gridworld file".format(file))
+    return np.memmap(file, dtype=np.uint8, mode="r", offset=HEADER.size, shape=(height, width))
+
+
+def write_text_grid(gridworld, file):
+    """
+    Writes the Gridworld to a file in the text format read by Gridworld.make_list_from_file.
+    :param gridworld: nested list of characters or array of field byte values
+    :param file: name of the file
+    """
+    with open(file, "w") as f:
+        for line in to_list(gridworld):
+            f.write(" ".join(line) + "\n")
+
+
+def read_text_grid(file):
+    """
+    Reads a Gridworld file in the text format without creating Python objects for single cells.
+    :param file: name of the file
+    :return: two-dimensional array of field byte values
+    """
+    with open(file, "rb") as f:
+        lines = [line.replace(b" ", b"").rstrip(b"\r\n") for line in f]
+    lines = [line for line in lines if line]
+    return np.frombuffer(b"".join(lines), dtype=np.uint8).reshape(len(lines), -1)
+
+
+def load_gridworld(file):
+    """
+    Loads a Gridworld file in either format, depending on whether it starts with the magic bytes.
+    :param file: name of the file
+    :return: two-dimensional array of field byte values
+    """
+    with open(file, "rb") as f:
+        is_binary = f.read(len(MAGIC)) == MAGIC
+    return read_binary_grid(file) if is_binary else read_text_grid(file)
+
+
+def place_goals(array, rng, positive_goals, negative_goals, goal_positions=None):
+    """
+    Puts goal fields onto the Gridworld, either at the given or at random free positions.
+    :param array: two-dimensional array of field byte values, changed in place
+    :param rng: NumPy random number generator
+    :param positive_goals: number of "E" fields to place at random
+    :param negative_goals: number of "P" fields to place at random
+    :param goal_positions: optionally list of (x, y, field) tuples used instead of random positions
+    """
+    if goal_positions is not None:
+        for x, y, field in goal_positions:
+            array[y, x] = ord(field)
+        return
+    free = np.flatnonzero(array == ord("F"))
+    chosen = rng.choice(free, size=min(len(free), positive_goals + negative_goals), replace=False)
+    array.flat[chosen[:positive_goals]] = ord("E")
+    array.flat[chosen[positive_goals:]] = ord("P")
+
+
+def remove_unreachable(array):
+    """
+    Turns every free field from which no goal field can be reached into an obstacle,
+    so every episode started anywhere terminates.
+    :param array: two-dimensional array of field byte values, changed in place
+    """
+    height, width = array.shape
+    flat = array.reshape(-1)
+    goals = np.flatnonzero(np.isin(flat, [ord(field) for field in Default.GOAL_FIELDS]))
+    reachable = np.zeros(flat.size, dtype=bool)
+    reachable[goals] = True
+    obstacle = np.isin(flat, [ord(field) for field in Default.OBSTACLE_FIELDS])
+    # breadth-first search from all goal fields at once
+    queue = deque(goals.tolist())
+    while queue:
+        k = queue.popleft()
+        x, y = k % width, k // width
+        for neighbour, inside in ((k - width, y > 0), (k + width, y < height - 1),
+                                  (k - 1, x > 0), (k + 1, x < width - 1)):
+            if inside and not reachable[neighbour] and not obstacle[neighbour]:
+                reachable[neighbour] = True
+                queue.append(neighbour)
+    flat[~reachable & ~obstacle] = ord("O")
+
+
+def generate_random_gridworld(width, height, obstacle_density=0.2, positive_goals=1, negative_goals=1,
+                              goal_positions=None, seed=None):
+    """
+    Generates a Gridworld with obstacles placed independently at random.
+    :param width: number of columns
+    :param height: number of rows
+    :param obstacle_density: probability of every cell to be an obstacle
+    :param positive_goals: number of "E" fields to place at random
+    :param negative_goals: number of "P" fields to place at random
+    :param goal_positions: optionally list of (x, y, field) tuples used instead of random goal positions
+    :param seed: optionally seed for the random number generator
+    :return: two-dimensional array of field byte values
+    """
+    rng = np.random.default_rng(seed)
+    array = np.where(rng.random((height, width)) < obstacle_density, ord("O"), ord("F")).astype(np.uint8)
+    place_goals(array, rng, positive_goals, negative_goals, goal_positions)
+    remove_unreachable(array)
+    return array
+
+
+def generate_maze_gridworld(width, height, loop_probability=0.0, positive_goals=1, negative_goals=1,
+                            goal_positions=None, seed=None):
+    """
+    Generates a maze-like Gridworld with corridors of width one (randomized depth-first search),
+    optionally with some inner walls removed again, which creates loops.
+    :param width: number of columns
+    :param height: number of rows
+    :param loop_probability: probability of every inner wall to be removed again
+    :param positive_goals: number of "E" fields to place at random
+    :param negative_goals: number of "P" fields to place at random
+    :param goal_positions: optionally list of (x, y, field) tuples used instead of random goal positions
+    :param seed: optionally seed for the random number generator
+    :return: two-dimensional array of field byte values
+    """
+    rng = np.random.default_rng(seed)
+    py_rng = random.Random(seed)
+    array = np.full((height, width), ord("O"), dtype=np.uint8)
+    # cells are the fields with even coordinates, walls lie in between
+    array[0:height:2, 0:width:2] = ord("F")
+    visited = np.zeros(((height + 1) // 2, (width + 1) // 2), dtype=bool)
+    visited[0, 0] = True
+    stack = [(0, 0)]
+    while stack:
+        cx, cy = stack[-1]
+        neighbours = [(cx + dx, cy + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                      if 0 <= cx + dx < visited.shape[1] and 0 <= cy + dy < visited.shape[0]
+                      and not visited[cy + dy, cx + dx]]
+        if not neighbours:
+            stack.pop()
+            continue
+        nx, ny = py_rng.choice(neighbours)
+        visited[ny, nx] = True
+        # remove the wall between the two cells
+        array[cy + ny, cx + nx] = ord("F")
+        stack.append((nx, ny))
+    if loop_probability:
+        walls = np.zeros(array.shape, dtype=bool)
+        walls[1:-1, 1:-1] = array[1:-1, 1:-1] == ord("O")
+        array[walls & (rng.random(array.shape) < loop_probability)] = ord("F")
+    place_goals(array, rng, positive_goals, negative_goals, goal_positions)
+    remove_unreachable(array)
+    return array
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Generates and converts Gridworld files.")
+    subparsers = parser.add_subparsers(dest="command")
+    generate = subparsers.add_parser("generate", help="generate a Gridworld, binary unless the name ends with .grid")
+    generate.add_argument("file")
+    generate.add_argument("width", type=int)
+    generate.add_argument("height", type=int)
+    generate.add_argument("--obstacle-density", type=float, default=0.2, help="only for random obstacles")
+    generate.add_argument("--positive-goals", type=int, default=1)
+    generate.add_argument("--negative-goals", type=int, default=1)
+    generate.add_argument("--maze", action="store_true", help="generate a maze instead of random obstacles")
+    generate.add_argument("--loop-probability", type=float, default=0.0,
+                          help="only for mazes, probability of every inner wall to be removed again")
+    generate.add_argument("--seed", type=int)
+    convert = subparsers.add_parser("convert", help="convert between text and binary format")
+    convert.add_argument("input")
+    convert.add_argument("output", help="written as text if the name ends with .grid, binary otherwise")
+    return parser.parse_args()
+
+
+def write_gridworld(gridworld, file):
+    """Writes the Gridworld as text if the filename ends with .grid, in the binary format otherwise."""
+    if file.endswith(".grid"):
+        write_text_grid(gridworld, file)
+    else:
+        write_binary_grid(gridworld, file)
+
+
+# only run if not imported from other file
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    if arguments.command == "generate":
+        if arguments.maze:
+            generate_gridworld, density = generate_maze_gridworld, arguments.loop_probability
+        else:
+            generate_gridworld, density = generate_random_gridworld, arguments.obstacle_density
+        write_gridworld(generate_gridworld(arguments.width, arguments.height, density,
+                                           arguments.positive_goals, arguments.negative_goals,
+                                           seed=arguments.seed), arguments.file)
+    elif arguments.command == "convert":
+        write_gridworld(load_gridworld(arguments.input), arguments.output)
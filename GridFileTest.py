@@ -0,0 +1,60 @@
+"""
+Tests of the Gridworld file formats and generators of GridFile.py.
+"""
+
+import numpy as np
+import pytest
+
+from conftest import GRIDWORLD
+import GridFile
+
+
+def test_binary_round_trip(tmp_path):
+    file = str(tmp_path / "small.bgrid")
+    GridFile.write_binary_grid(GRIDWORLD, file)
+    array = GridFile.load_gridworld(file)
+    # loaded as read-only memory map
+    assert isinstance(array, np.memmap)
+    assert not array.flags.writeable
+    assert np.array_equal(array, GridFile.to_array(GRIDWORLD))
+    assert GridFile.to_list(array) == GRIDWORLD
+
+
+def test_text_round_trip(tmp_path):
+    gridworld = GridFile.generate_random_gridworld(30, 20, seed=1)
+    file = str(tmp_path / "random.grid")
+    GridFile.write_text_grid(gridworld, file)
+    assert np.array_equal(GridFile.load_gridworld(file), gridworld)
+
+
+def test_convert_between_formats(tmp_path):
+    gridworld = GridFile.generate_maze_gridworld(21, 11, seed=1)
+    binary_file, text_file = str(tmp_path / "maze.bgrid"), str(tmp_path / "maze.grid")
+    GridFile.write_gridworld(gridworld, binary_file)
+    GridFile.write_gridworld(GridFile.load_gridworld(binary_file), text_file)
+    assert np.array_equal(GridFile.read_text_grid(text_file), gridworld)
+
+
+def test_binary_file_with_wrong_magic_is_rejected(tmp_path):
+    file = tmp_path / "broken.bgrid"
+    file.write_bytes(b"NOPE" + bytes(12))
+    with pytest.raises(ValueError):
+        GridFile.read_binary_grid(str(file))
+
+
+@pytest.mark.parametrize("generate", [GridFile.generate_random_gridworld, GridFile.generate_maze_gridworld])
+def test_generated_gridworlds_are_reproducible_and_solvable(generate):
+    gridworld = generate(41, 21, seed=3)
+    assert np.array_equal(gridworld, generate(41, 21, seed=3))
+    assert np.count_nonzero(gridworld == ord("E")) == 1
+    assert np.count_nonzero(gridworld == ord("P")) == 1
+    # every free field can reach a goal, so removing unreachable fields changes nothing
+    solvable = gridworld.copy()
+    GridFile.remove_unreachable(solvable)
+    assert np.array_equal(solvable, gridworld)
+
+
+def test_maze_loops_remove_walls():
+    maze = GridFile.generate_maze_gridworld(41, 21, seed=3)
+    with_loops = GridFile.generate_maze_gridworld(41, 21, loop_probability=0.5, seed=3)
+    assert np.count_nonzero(with_loops == ord("O")) < np.count_nonzero(maze == ord("O"))
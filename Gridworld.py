@@ -1,48 +1,128 @@
+import argparse
+import json
 import os
-import sys
 import time
 import threading
+from Convergence import Budget, PolicyEvaluation, PolicyUnchanged, QDeltaWindow
+from CoarseToFine import CoarseToFineQLearning
 from MDP import MDP
+from ParallelQLearning import ParallelQLearning
 from QLearning import QLearning
+from RandomStream import RandomStream
+from Schedules import ExponentialDecay, GLIE, LinearDecay, VisitCount, describe, make_schedule
+from SolutionCache import SolutionCache, environment_key, learner_parameters, solution_key
+import Checkpoint
+import Planner
+import GridFile
+import Render
 import DefaultConstants as Default
 
 
-def init():
+def init(arguments):
     """
-    Ask for a Gridworld file and initializes an MDP as environment and Q-learning object with it, then calls the menu.
+    Reads the Gridworld file given on the command line or asks for one and initializes an MDP as environment
+    and Q-learning object with it, then calls the menu.
+    :param arguments: parsed command line arguments (see parse_arguments) with the parameters to start with
     """
     print_headline("Gridworld Selection")
-    gridworld = read_gridworld_file()
+    gridworld = read_gridworld_file(arguments.gridworld_files[0] if arguments.gridworld_files else None)
 
+    environment_stream, learner_stream = RandomStream(arguments.seed).spawn(2)
     environment = MDP(state_list=gridworld,
                       field_rewards=Default.FIELD_REWARDS,
                       obstacle_fields=Default.OBSTACLE_FIELDS,
                       actions=Default.ACTIONS,
-                      transition_probabilities=Default.TRANSITION_PROBABILITIES)
-
-    q_learning = QLearning(env_perform_action=environment.perform_action,
-                           state_list=gridworld,
-                           goal_fields=Default.GOAL_FIELDS,
-                           obstacle_fields=Default.OBSTACLE_FIELDS,
-                           actions=Default.ACTIONS,
-                           discount_factor=Default.DISCOUNT_FACTOR,
-                           learning_rate=Default.LEARNING_RATE,
-                           epsilon=Default.EPSILON,
-                           convergence_threshold=Default.CONVERGENCE_THRESHOLD)
+                      transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                      seed=environment_stream)
+
+    q_learning = make_q_learning(environment, arguments.workers, arguments.coarse_to_fine, arguments.trace_decay,
+                                 discount_factor=arguments.discount_factor,
+                                 learning_rate=arguments.learning_rate,
+                                 epsilon=arguments.epsilon,
+                                 convergence_threshold=arguments.convergence_threshold,
+                                 q_engine=arguments.q_engine,
+                                 seed=learner_stream,
+                                 learning_rate_schedule=make_schedule(arguments.learning_rate_schedule),
+                                 epsilon_schedule=make_schedule(arguments.epsilon_schedule))
+
+    cache = SolutionCache(arguments.cache_dir, arguments.cache_size) if arguments.cache_dir is not None else None
+    criteria = criteria_from_arguments(arguments)(environment)
 
     print("Your input Gridworld:")
     print_gridworld(gridworld)
 
-    while show_menu(q_learning):
+    while show_menu(q_learning, cache, criteria, arguments.seed, arguments.cache_warm_start):
         pass
 
     print_headline("See you later")
 
 
-def show_menu(q_learning):
+def make_q_learning(environment, workers=1, coarse_to_fine=False, trace_decay=0, q_engine=Default.Q_ENGINE,
+                    **parameters):
+    """
+    :param environment: MDP to learn
+    :param workers: optionally number of processes for Q-learning until convergence
+    :param coarse_to_fine: optionally train coarse versions of the Gridworld first (see CoarseToFine.py),
+                           only with a single worker
+    :param trace_decay: optionally lambda of Q(lambda) (see EligibilityTraces.py), only with the array Q engine,
+                        a single worker and without coarse-to-fine training
+    :param q_engine: optionally change how Q is stored, the array Q engine is always used with more than one worker
+    :param parameters: other parameters of QLearning, e.g. learning_rate or seed
+    :return: QLearning object for the MDP, a ParallelQLearning object if there is more than one worker
+             or a CoarseToFineQLearning object for coarse-to-fine training
+    """
+    if workers > 1 and coarse_to_fine:
+        raise ValueError("Coarse-to-fine training can't be combined with several workers")
+    if trace_decay and (workers > 1 or coarse_to_fine):
+        raise ValueError("Eligibility traces can't be combined with several workers or coarse-to-fine training")
+    if coarse_to_fine:
+        return CoarseToFineQLearning(env_perform_action=environment.perform_action,
+                                     state_list=environment.state_index,
+                                     goal_fields=Default.GOAL_FIELDS,
+                                     obstacle_fields=Default.OBSTACLE_FIELDS,
+                                     actions=Default.ACTIONS,
+                                     field_rewards=Default.FIELD_REWARDS,
+                                     transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                                     q_engine=q_engine,
+                                     **parameters)
+    if workers > 1:
+        return ParallelQLearning(env_perform_action=environment.perform_action,
+                                 state_list=environment.state_index,
+                                 goal_fields=Default.GOAL_FIELDS,
+                                 obstacle_fields=Default.OBSTACLE_FIELDS,
+                                 actions=Default.ACTIONS,
+                                 num_workers=workers,
+                                 **parameters)
+    return QLearning(env_perform_action=environment.perform_action,
+                     state_list=environment.state_index,
+                     goal_fields=Default.GOAL_FIELDS,
+                     obstacle_fields=Default.OBSTACLE_FIELDS,
+                     actions=Default.ACTIONS,
+                     q_engine=q_engine,
+                     trace_decay=trace_decay,
+                     **parameters)
+
+
+def cache_key(q_learning, seed=None):
+    """
+    :param q_learning: QLearning object before training, on a Gridworld with the default environment parameters
+    :param seed: optionally seed the random number streams of the run were derived from
+    :return: tuple of hash of the environment, dictionary of hyperparameters and key in the solution cache
+    """
+    environment = environment_key(q_learning.state_index, Default.FIELD_REWARDS, Default.TRANSITION_PROBABILITIES,
+                                  q_learning.actions, Default.GOAL_FIELDS)
+    parameters = learner_parameters(q_learning, seed)
+    return environment, parameters, solution_key(environment, parameters)
+
+
+def show_menu(q_learning, cache=None, criteria=None, seed=None, cache_warm_start=Default.CACHE_WARM_START):
     """
     Shows a menu and calls the appropriate functions based on what is selected.
     :param q_learning: QLearning object to work with
+    :param cache: optionally SolutionCache for Q-learning until convergence
+    :param criteria: optionally list of convergence criteria for Q-learning until convergence (see Convergence.py)
+    :param seed: optionally seed the random number streams were derived from, part of the key in the cache
+    :param cache_warm_start: optionally start training from a cached solution with other parameters
     :return: True if menu needs be shown again, False otherwise
     """
     print_headline("Menu")
@@ -56,13 +136,18 @@ def show_menu(q_learning):
     print("[7] Change the learning rate (alpha). Currently set to {}".format(q_learning.learning_rate))
     print("[8] Change the discount factor of future rewards (gamma). Currently set to {}".format(q_learning.discount_factor))
     print("[9] Change the convergence threshold (episodes with unchanged policy). Currently set to {}".format(q_learning.convergence_threshold))
+    print("[10] Save Q-function, policy and parameters to a checkpoint file")
+    print("[11] Load Q-function, policy and parameters from a checkpoint file")
+    print("[12] Print Q-function values and derived policy of a part of the Gridworld")
+    print("[13] Change the schedule of the exploration rate (epsilon). Currently {}".format(describe(q_learning.epsilon_schedule)))
+    print("[14] Change the schedule of the learning rate (alpha). Currently {}".format(describe(q_learning.learning_rate_schedule)))
     print("[0] Exit the program\n")
-    chosen_item = secure_input(int, text="Choose: ", lower_bound=0, upper_bound=9)
+    chosen_item = secure_input(int, text="Choose: ", lower_bound=0, upper_bound=14)
 
     # automatic Q-learning until convergence
     if chosen_item == 1:
         print_sep()
-        automatic_q_learning_until_convergence(q_learning)
+        automatic_q_learning_until_convergence(q_learning, cache, criteria, seed, cache_warm_start)
         input("Press Enter to return to the main menu...")
         return True
     # automatic Q-learning episode
@@ -89,19 +174,22 @@ def show_menu(q_learning):
         print("\nQ-function successfully reset.")
         time.sleep(Default.SLEEP_TIME)
         return True
-    # change epsilon
+    # change epsilon, which keeps it constant from now on
     elif chosen_item == 6:
         print_sep()
         q_learning.epsilon = secure_input(float, text="Enter a new epsilon value between 0 and 1: ",
                                           lower_bound=0, upper_bound=1)
+        q_learning.epsilon_schedule = None
         print("\nEpsilon value successfully changed.")
         time.sleep(Default.SLEEP_TIME)
         return True
-    # change learning rate
+    # change learning rate, which keeps it constant from now on
     elif chosen_item == 7:
         print_sep()
         q_learning.learning_rate = secure_input(float, text="Enter a new learning rate between 0 and 1: ",
                                                 lower_bound=0, upper_bound=1)
+        q_learning.learning_rate_schedule = None
+        q_learning.apply_schedules()
         print("\nLearning rate successfully changed.")
         time.sleep(Default.SLEEP_TIME)
         return True
@@ -121,30 +209,144 @@ def show_menu(q_learning):
         print("\nConvergence threshold successfully changed.")
         time.sleep(Default.SLEEP_TIME)
         return True
+    # save checkpoint
+    elif chosen_item == 10:
+        print_sep()
+        path_to_file = secure_input(str, text="Enter checkpoint filename: ")
+        Checkpoint.save_checkpoint(q_learning, path_to_file)
+        print("\nCheckpoint successfully saved.")
+        time.sleep(Default.SLEEP_TIME)
+        return True
+    # load checkpoint
+    elif chosen_item == 11:
+        print_sep()
+        path_to_file = secure_input(str, text="Enter checkpoint filename: ")
+        try:
+            Checkpoint.load_checkpoint(q_learning, path_to_file)
+            print("\nCheckpoint successfully loaded.")
+        except (OSError, ValueError) as e:
+            print("\nCould not load checkpoint: {}".format(e))
+        time.sleep(Default.SLEEP_TIME)
+        return True
+    # print Q-function and policy of a part of the Gridworld
+    elif chosen_item == 12:
+        print_sep()
+        width, height = q_learning.dim
+        x = secure_input(int, text="Enter the x coordinate of the upper left field (0 to {}): ".format(width - 1),
+                         lower_bound=0, upper_bound=width - 1)
+        y = secure_input(int, text="Enter the y coordinate of the upper left field (0 to {}): ".format(height - 1),
+                         lower_bound=0, upper_bound=height - 1)
+        print_q_function_and_policy(q_learning, (x, y) + Default.VIEWPORT_SIZE)
+        input("\nPress Enter to return to the main menu...")
+        return True
+    # change epsilon schedule
+    elif chosen_item == 13:
+        print_sep()
+        q_learning.epsilon_schedule = ask_schedule("epsilon", q_learning.epsilon, per_visit=False)
+        q_learning.apply_schedules()
+        print("\nEpsilon schedule successfully changed.")
+        time.sleep(Default.SLEEP_TIME)
+        return True
+    # change learning rate schedule
+    elif chosen_item == 14:
+        print_sep()
+        q_learning.learning_rate_schedule = ask_schedule("learning rate", q_learning.learning_rate, per_visit=True)
+        q_learning.apply_schedules()
+        print("\nLearning rate schedule successfully changed.")
+        time.sleep(Default.SLEEP_TIME)
+        return True
     # exit program
     else:
         return False
 
 
-def automatic_q_learning_until_convergence(q_learning):
+def ask_schedule(parameter_name, current_value, per_visit):
+    """
+    Asks the user for a schedule of a parameter (see Schedules.py).
+    :param parameter_name: readable name of the parameter, e.g. "epsilon"
+    :param current_value: current value of the parameter, kept by a constant schedule
+    :param per_visit: True if learning rates based on visit counts can be chosen
+    :return: Schedule or None for keeping the parameter constant
     """
-    Performs Q-learning episodes until the policy hasn't changed for a given number of episodes,
-    then prints the results.
+    print("How should {} (currently {}) change over the episodes?\n".format(parameter_name, current_value))
+    print("[1] Not at all, keep it constant")
+    print("[2] Exponential decay: start * rate^n, but at least a minimum")
+    print("[3] Linear decay: from start to end within a number of episodes")
+    print("[4] 1/n decay (GLIE): start * scale / (scale + n)")
+    if per_visit:
+        print("[5] Per (state, action) pair: 1 / (number of updates of the pair)^exponent")
+    chosen_item = secure_input(int, text="Choose: ", lower_bound=1, upper_bound=5 if per_visit else 4)
+    if chosen_item == 1:
+        return None
+    if chosen_item == 5:
+        return VisitCount(secure_input(float, text="Enter the exponent between 0.5 and 1: ",
+                                       lower_bound=0.5, upper_bound=1),
+                          secure_input(float, text="Enter the minimum between 0 and 1: ", lower_bound=0, upper_bound=1))
+    start = secure_input(float, text="Enter the start value between 0 and 1: ", lower_bound=0, upper_bound=1)
+    if chosen_item == 2:
+        return ExponentialDecay(start,
+                                secure_input(float, text="Enter the rate between 0 and 1: ",
+                                             lower_bound=0, upper_bound=1),
+                                secure_input(float, text="Enter the minimum between 0 and 1: ",
+                                             lower_bound=0, upper_bound=1))
+    if chosen_item == 3:
+        return LinearDecay(start,
+                           secure_input(float, text="Enter the end value between 0 and 1: ",
+                                        lower_bound=0, upper_bound=1),
+                           secure_input(int, text="Enter the number of episodes until the end value: ",
+                                        lower_bound=1))
+    return GLIE(start, secure_input(float, text="Enter the scale (episodes until halved): ", lower_bound=1))
+
+
+def automatic_q_learning_until_convergence(q_learning, cache=None, criteria=None, seed=None,
+                                           cache_warm_start=Default.CACHE_WARM_START):
+    """
+    Performs Q-learning episodes until the policy hasn't changed for a given number of episodes
+    (or until any of the given criteria is met), then prints the results.
     A new thread is used to perform Q-learning in order to stay responsive during calculation.
     :param q_learning: QLearning object to work with
+    :param cache: optionally SolutionCache, if Q wasn't trained yet a cached solution is loaded instead of training
+                  and otherwise the solution is added to the cache
+    :param criteria: optionally list of convergence criteria (see Convergence.py)
+    :param seed: optionally seed the random number streams were derived from, part of the key in the cache
+    :param cache_warm_start: optionally start training from a cached solution with other parameters
     """
 
+    # only a run from scratch can be replaced by or stored as a cached solution
+    if cache is not None and q_learning.episode_count == 0:
+        environment, parameters, key = cache_key(q_learning, seed)
+        if cache.load(q_learning, key) is not None:
+            print("\nLoaded the solution of an earlier run with the same Gridworld and parameters from the cache.")
+            print_headline("Results")
+            print_q_function_and_policy(q_learning)
+            return
+        if cache_warm_start and cache.warm_start(q_learning, environment) is not None:
+            print("\nStarting from the solution of an earlier run with other parameters.")
+            # its episodes and steps aren't the ones of a run from scratch with these parameters
+            cache = None
+    else:
+        cache = None
+
     # fancy threading stuff to give feedback during the calculation so the user knows it hasn't crashed yet
-    q_learning_thread = threading.Thread(target=q_learning.q_learning_until_convergence, daemon=True)
+    q_learning_thread = threading.Thread(target=q_learning.q_learning_until_convergence,
+                                         kwargs={"criteria": criteria}, daemon=True)
     q_learning_thread.start()
     print("\nCalculating", end="", flush=True)
-    # check every second if Q-learning thread has finished, if not print a dot
+    # wait up to a second for the Q-learning thread to finish, if it didn't print a dot
+    # (join returns immediately once the thread has finished, so no time is lost)
+    q_learning_thread.join(timeout=1)
     while q_learning_thread.is_alive():
-        time.sleep(1)
         print(".", end="", flush=True)
-    print("\n\nCalculated {} episodes, policy converged after {} episodes.".format(
-          q_learning.last_convergence_episode_count,
-          q_learning.last_convergence_episode_count - q_learning.convergence_threshold))
+        q_learning_thread.join(timeout=1)
+    print("\n\nCalculated {} episodes, stopped by criterion {}.".format(q_learning.last_convergence_episode_count,
+                                                                     q_learning.convergence_criterion))
+    # only known if the policy had to stay unchanged for the convergence threshold
+    if q_learning.convergence_criterion == PolicyUnchanged.name:
+        print("Policy converged after {} episodes.".format(
+              q_learning.last_convergence_episode_count - q_learning.convergence_threshold))
+    if cache is not None and q_learning.convergence_criterion == PolicyUnchanged.name:
+        cache.store(q_learning, key, environment, parameters,
+                    {"episodes": q_learning.last_convergence_episode_count, "steps": q_learning.step_count})
     time.sleep(Default.SLEEP_TIME)
     print_headline("Results")
     print_q_function_and_policy(q_learning)
@@ -166,6 +368,7 @@ def manual_q_learning_episode(q_learning):
     :param q_learning: QLearning object to work with
     """
     q_learning.reset_current_state()
+    q_learning.apply_schedules()
     while True:
         last_state = q_learning.current_state
         print_sep()
@@ -173,7 +376,8 @@ def manual_q_learning_episode(q_learning):
         q_learning.q_learning_step()
         print("Agent moved to field: {}".format(q_learning.current_state))
         print("\n\nCalculated Q-function values:")
-        print_q_function(q_learning.format_q_function())
+        # on large Gridworlds only the part around the agent
+        print_q_function(q_learning, Render.window_around(q_learning.dim, q_learning.current_state))
         if last_state in q_learning.goal_states:
             print("Agent moved from a terminal state and therefore the episode ended.\n")
             input("Press Enter to return to the main menu...")
@@ -183,43 +387,56 @@ def manual_q_learning_episode(q_learning):
     q_learning.update_policy()
 
 
-def print_q_function_and_policy(q_learning):
+def print_q_function_and_policy(q_learning, window=None):
     """
-    Prints current Q-function values and derived policy.
+    Prints current Q-function values and derived policy,
+    for Gridworlds too large to be printed field by field a summary instead.
     :param q_learning: a QLearning object
+    :param window: optionally (x, y, width, height) of the part of the Gridworld to print
     """
+    if window is None and not Render.fits(q_learning.dim):
+        print("Summary of the Q-function values and derived policy:\n")
+        print_summary(q_learning)
+        print("Choose [12] in the menu to see the values of a part of the Gridworld.")
+        return
     print("Calculated Q-function values:")
-    print_q_function(q_learning.format_q_function())
+    print_q_function(q_learning, window)
     print("Derived policy:")
-    print_policy(q_learning.format_policy())
+    print_policy(q_learning, window)
 
 
-def read_gridworld_file():
+def read_gridworld_file(path_to_file=None):
     """
     Gets Gridworld filename from starting parameters or the user,
     the returns nested list of it's content.
+    :param path_to_file: optionally Gridworld filename given when starting the program
     :return: nested list of characters
     """
     # check if Gridworld filename was given when starting program
-    try:
-        return make_list_from_file(sys.argv[1])
+    if path_to_file is not None and os.path.isfile(path_to_file):
+        return make_list_from_file(path_to_file)
+    if path_to_file is not None:
+        print("Invalid filename {}, try again!\n".format(path_to_file))
     # if not ask user instead
-    except IndexError:
-        while True:
-            path_to_file = secure_input(str, text="Enter Gridworld filename (e.g. 3by4.grid): ")
-            if not os.path.isfile(path_to_file):
-                print("Invalid filename, try again!\n")
-                continue
-            print()
-            return make_list_from_file(path_to_file)
+    while True:
+        path_to_file = secure_input(str, text="Enter Gridworld filename (e.g. 3by4.grid): ")
+        if not os.path.isfile(path_to_file):
+            print("Invalid filename, try again!\n")
+            continue
+        print()
+        return make_list_from_file(path_to_file)
 
 
 def make_list_from_file(file):
     """
     Opens the given file and returns the characters, stripped from whitespace, in nested list form.
+    Files in the binary format of GridFile.py are read as well.
     :param file: name of the file to be opened
     :return: nested list of characters
     """
+    with open(file, "rb") as f:
+        if f.read(len(GridFile.MAGIC)) == GridFile.MAGIC:
+            return GridFile.to_list(GridFile.read_binary_grid(file))
     with open(file) as f:
         lines = [[char for char in line if char != "\n" and char != " "] for line in f]
     return lines
@@ -291,71 +508,230 @@ def print_sep(width=Default.OUTPUT_WIDTH, spacing_top=True, spacing_bottom=True)
 
 def print_gridworld(gridworld, field_mapping=Default.FIELD_MAPPING, boundary_char=Default.BOUNDARY_CHAR):
     """
-    Prints the Gridworld in a readable way with more distinct characters
-    :param gridworld: nested list being the Gridworld
+    Prints the Gridworld in a readable way with more distinct characters,
+    only the upper left part of Gridworlds larger than the summary size
+    :param gridworld: nested list or array being the Gridworld
     :param field_mapping: dictionary mapping field characters to more distinct characters
     :param boundary_char: character for the boundary of the Gridworld
     """
-    print()
-    # prints boundary chars for the full length of the gridworld
-    # 2 * because of the spaces in between, + 2 because of the side boundaries
-    print(boundary_char * (2 * len(gridworld[0]) + 2))
-    for line in gridworld:
-        print(boundary_char, end="")
-        for char in line:
-            print(field_mapping[char], end=" ")
-        print(boundary_char)
-    print(boundary_char * (2 * len(gridworld[0]) + 2))
-    print()
+    dim = (len(gridworld[0]), len(gridworld))
+    window = None
+    if not Render.fits(dim, Default.SUMMARY_SIZE):
+        window = (0, 0) + Default.SUMMARY_SIZE
+        print("(upper left part of the {}x{} Gridworld)".format(*dim))
+    print("\n" + Render.render_gridworld(gridworld, window, field_mapping, boundary_char) + "\n")
 
 
-def print_policy(policy_list, action_mapping=Default.ACTION_MAPPING):
+def print_policy(q_learning, window=None, action_mapping=Default.ACTION_MAPPING):
     """
     Prints the actions according to the policy in a visual way
-    :param policy_list: nested list of actions according to policy
+    :param q_learning: a QLearning object
+    :param window: optionally (x, y, width, height) of the part of the Gridworld to print
     :param action_mapping: dictionary mapping actions to readable characters like arrows
     """
-    print()
-    for line in policy_list:
-        print(" ", end="")
-        for char in line:
-            print(action_mapping[char], end=" ")
-        print()
-    print()
+    print("\n" + Render.render_policy(q_learning, window, action_mapping) + "\n")
 
 
-def print_q_function(q_value_tuple_list, number_padding=5):
+def print_q_function(q_learning, window=None, number_padding=5):
     """
     Prints the Q-function values with appropriate spaces and alignment
-    :param q_value_tuple_list: nested list of Q-function value tuples
+    :param q_learning: a QLearning object
+    :param window: optionally (x, y, width, height) of the part of the Gridworld to print
     :param number_padding: optionally specify different padding between numbers
     """
-    if number_padding < 5:
-        number_padding = 5
-    # add maximal number of places before the decimal point to total number padding
-    number_padding += len(str(round(max(max(max(q_value_tuple_list))))))
-    # width of the whole gridworld
-    total_width = len(q_value_tuple_list[0]) * (2 * number_padding + 4) + 1
-
-    print("\n{:-<{w}}".format("", w=total_width))
-    for line in q_value_tuple_list:
-        # up values line
-        print("|", end="")
-        for tuple_ in line:
-            print("  {:^{p}.3f} |".format(tuple_[0], p=2 * number_padding), end="")
-        # left and right values line
-        print("\n|", end="")
-        for tuple_ in line:
-            print("{:{p}.3f} | {:<{p}.3f}|".format(tuple_[3], tuple_[1], p=number_padding), end="")
-        # down values line
-        print("\n|", end="")
-        for tuple_ in line:
-            print("  {:^{p}.3f} |".format(tuple_[2], p=2 * number_padding), end="")
-        # separation line
-        print("\n{:-<{w}}".format("", w=total_width))
-    print()
+    print("\n" + Render.render_q_function(q_learning, window, number_padding) + "\n")
+
+
+def print_summary(q_learning):
+    """
+    Prints the state values and the policy downsampled to fit the screen
+    :param q_learning: a QLearning object
+    """
+    print(Render.render_summary(q_learning) + "\n")
+
+
+def run_batch(gridworld_files, output_dir, output_format="json", q_engine=Default.Q_ENGINE,
+              learning_rate=Default.LEARNING_RATE, epsilon=Default.EPSILON, discount_factor=Default.DISCOUNT_FACTOR,
+              convergence_threshold=Default.CONVERGENCE_THRESHOLD, seed=None, make_criteria=None,
+              learning_rate_schedule=Default.LEARNING_RATE_SCHEDULE, epsilon_schedule=Default.EPSILON_SCHEDULE,
+              workers=Default.WORKERS, coarse_to_fine=Default.COARSE_TO_FINE, cache_dir=Default.CACHE_DIR,
+              cache_size=Default.CACHE_SIZE, cache_warm_start=Default.CACHE_WARM_START,
+              trace_decay=Default.TRACE_DECAY):
+    """
+    Performs Q-learning until convergence on every given Gridworld file without any interaction
+    and writes the results to the output directory, one file per Gridworld named like it.
+    With output format "json" the file contains statistics, Q-values (one row per state, in the order
+    of the "states" list) and policy. With "binary" the Q-values and policy are written as checkpoint
+    (see Checkpoint.py, ending .ckpt) and only the statistics as JSON.
+    Prints one line of JSON with the statistics per Gridworld as soon as it is done.
+    :param gridworld_files: list of Gridworld files in text or binary format
+    :param output_dir: directory to write the results to
+    :param output_format: "json" or "binary"
+    :param seed: optionally seed for the random numbers, every Gridworld starts with the same
+                 (independent) streams for the environment and the learner derived from it
+    :param make_criteria: optionally function returning the list of convergence criteria (see Convergence.py)
+                          given the MDP of a Gridworld, the policy has to stay unchanged for the
+                          convergence threshold by default
+    :param learning_rate_schedule: optionally schedule of the learning rate in list notation (see Schedules.py)
+    :param epsilon_schedule: optionally schedule of epsilon in list notation
+    :param workers: optionally number of processes training each Gridworld (see ParallelQLearning.py)
+    :param coarse_to_fine: optionally train coarse versions of every Gridworld first (see CoarseToFine.py),
+                           the statistics then contain the episodes and steps of every coarse level
+    :param cache_dir: optionally directory of a SolutionCache, Gridworlds already solved with the same parameters
+                      are loaded from it instead of trained again, their statistics being those of the first run
+    :param cache_size: optionally maximum size of the cache in bytes
+    :param cache_warm_start: optionally start training from a cached solution of the same Gridworld
+                             with other parameters, such runs aren't added to the cache
+    :param trace_decay: optionally lambda of Q(lambda) (see EligibilityTraces.py), needs the array Q engine
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache = SolutionCache(cache_dir, cache_size) if cache_dir is not None else None
+    for gridworld_file in gridworld_files:
+        environment_stream, learner_stream = RandomStream(seed).spawn(2)
+        gridworld = GridFile.load_gridworld(gridworld_file)
+
+        environment = MDP(state_list=gridworld,
+                          field_rewards=Default.FIELD_REWARDS,
+                          obstacle_fields=Default.OBSTACLE_FIELDS,
+                          actions=Default.ACTIONS,
+                          transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                          seed=environment_stream)
+
+        q_learning = make_q_learning(environment, workers, coarse_to_fine, trace_decay,
+                                     discount_factor=discount_factor,
+                                     learning_rate=learning_rate,
+                                     epsilon=epsilon,
+                                     convergence_threshold=convergence_threshold,
+                                     q_engine=q_engine,
+                                     seed=learner_stream,
+                                     learning_rate_schedule=make_schedule(learning_rate_schedule),
+                                     epsilon_schedule=make_schedule(epsilon_schedule))
+
+        start = time.perf_counter()
+        statistics = None
+        if cache is not None:
+            environment_hash, parameters, key = cache_key(q_learning, seed)
+            statistics = cache.load(q_learning, key)
+        if statistics is not None:
+            # the solution of an earlier run with the same Gridworld and parameters
+            statistics.update(gridworld=gridworld_file, wall_time=time.perf_counter() - start, cached=True)
+        else:
+            warm_start = cache is not None and cache_warm_start \
+                and cache.warm_start(q_learning, environment_hash) is not None
+            q_learning.q_learning_until_convergence(criteria=make_criteria(environment) if make_criteria else None)
+            # only known if the policy had to stay unchanged for the convergence threshold
+            converged_after = q_learning.last_convergence_episode_count - convergence_threshold \
+                if q_learning.convergence_criterion == PolicyUnchanged.name else None
+            statistics = {"gridworld": gridworld_file,
+                          "episodes": q_learning.last_convergence_episode_count,
+                          "steps": q_learning.step_count,
+                          "criterion": q_learning.convergence_criterion,
+                          "converged_after": converged_after,
+                          "wall_time": time.perf_counter() - start,
+                          "learning_rate": learning_rate,
+                          "epsilon": epsilon,
+                          "learning_rate_schedule": q_learning.learning_rate_schedule.spec()
+                          if q_learning.learning_rate_schedule is not None else None,
+                          "epsilon_schedule": q_learning.epsilon_schedule.spec()
+                          if q_learning.epsilon_schedule is not None else None,
+                          "discount_factor": discount_factor,
+                          "trace_decay": trace_decay,
+                          "convergence_threshold": convergence_threshold,
+                          "seed": seed}
+            if coarse_to_fine:
+                statistics["levels"] = q_learning.levels
+            if cache is not None:
+                statistics.update(cached=False, warm_start=warm_start)
+                # runs stopped by a budget or another criterion aren't solutions to reuse, and the statistics of
+                # warm started runs aren't the ones of a run from scratch with these parameters
+                if q_learning.convergence_criterion == PolicyUnchanged.name and not warm_start:
+                    cache.store(q_learning, key, environment_hash, parameters, statistics)
+
+        name = os.path.join(output_dir, os.path.splitext(os.path.basename(gridworld_file))[0])
+        result = dict(statistics)
+        if output_format == "binary":
+            Checkpoint.save_checkpoint(q_learning, name + ".ckpt")
+            result["checkpoint"] = name + ".ckpt"
+        else:
+            result["actions"] = [list(a) for a in q_learning.actions]
+            result["states"] = [list(s) for s in q_learning.states]
+            result["q_values"] = [[q_learning.q_function[s, a] for a in q_learning.actions]
+                                  for s in q_learning.states]
+            result["policy"] = Render.policy_lines(q_learning, separator="")
+        with open(name + ".json", "w") as f:
+            json.dump(result, f, ensure_ascii=False)
+        print(json.dumps(statistics), flush=True)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Q-learning on Gridworlds, interactive unless --batch is given.")
+    parser.add_argument("gridworld_files", nargs="*", help="Gridworld file(s), only one in interactive mode")
+    parser.add_argument("--batch", action="store_true",
+                        help="train on all given Gridworlds until convergence without interaction")
+    parser.add_argument("--output-dir", default="results", help="directory for the results in batch mode")
+    parser.add_argument("--format", choices=["json", "binary"], default="json", help="output format in batch mode")
+    parser.add_argument("--q-engine", choices=["dict", "array", "sparse"], default=Default.Q_ENGINE)
+    parser.add_argument("--learning-rate", type=float, default=Default.LEARNING_RATE)
+    parser.add_argument("--epsilon", type=float, default=Default.EPSILON)
+    parser.add_argument("--discount-factor", type=float, default=Default.DISCOUNT_FACTOR)
+    parser.add_argument("--convergence-threshold", type=int, default=Default.CONVERGENCE_THRESHOLD)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int, default=Default.WORKERS,
+                        help="number of processes training each Gridworld together (array Q engine only)")
+    parser.add_argument("--coarse-to-fine", action="store_true", default=Default.COARSE_TO_FINE,
+                        help="train downsampled versions of every Gridworld first, coarsest first")
+    parser.add_argument("--trace-decay", type=float, default=Default.TRACE_DECAY,
+                        help="lambda of Watkins's Q(lambda) with eligibility traces (array Q engine only)")
+    parser.add_argument("--cache-dir", default=Default.CACHE_DIR,
+                        help="directory of a cache of solved Gridworlds (see SolutionCache.py)")
+    parser.add_argument("--cache-size", type=int, default=Default.CACHE_SIZE, help="maximum size of the cache in bytes")
+    parser.add_argument("--cache-warm-start", action="store_true", default=Default.CACHE_WARM_START,
+                        help="start from a cached solution of the same Gridworld with other parameters")
+    parser.add_argument("--learning-rate-schedule", nargs="+", metavar=("NAME", "PARAMETER"),
+                        default=Default.LEARNING_RATE_SCHEDULE,
+                        help="schedule of the learning rate, e.g. visit_count 0.8 0.01 (see Schedules.py)")
+    parser.add_argument("--epsilon-schedule", nargs="+", metavar=("NAME", "PARAMETER"),
+                        default=Default.EPSILON_SCHEDULE, help="schedule of epsilon, e.g. glie 0.5 100")
+    parser.add_argument("--q-delta", type=float, nargs=2, metavar=("TOLERANCE", "WINDOW"),
+                        help="also stop when no Q-value changed by more than TOLERANCE in WINDOW episodes in a row")
+    parser.add_argument("--evaluation-interval", type=int,
+                        help="also stop when the expected return of the greedy policy, evaluated with the MDP "
+                             "every this many episodes, stopped improving")
+    parser.add_argument("--max-seconds", type=float, help="also stop after this wall-clock time per Gridworld")
+    parser.add_argument("--max-steps", type=int, help="also stop after this many steps per Gridworld")
+    arguments = parser.parse_args()
+    if not arguments.batch and len(arguments.gridworld_files) > 1:
+        parser.error("only one Gridworld file can be given in interactive mode")
+    return arguments
+
+
+def criteria_from_arguments(arguments):
+    """
+    :param arguments: parsed command line arguments
+    :return: function returning the list of convergence criteria chosen on the command line given an MDP
+    """
+    def make_criteria(environment):
+        criteria = [PolicyUnchanged()]
+        if arguments.q_delta is not None:
+            criteria.append(QDeltaWindow(arguments.q_delta[0], int(arguments.q_delta[1])))
+        if arguments.evaluation_interval is not None:
+            planner = Planner.Planner(environment, Default.GOAL_FIELDS, arguments.discount_factor)
+            criteria.append(PolicyEvaluation(planner, arguments.evaluation_interval))
+        if arguments.max_seconds is not None or arguments.max_steps is not None:
+            criteria.append(Budget(seconds=arguments.max_seconds, steps=arguments.max_steps))
+        return criteria
+    return make_criteria
 
 
 # only run if not imported from other file
 if __name__ == "__main__":
-    init()
+    arguments = parse_arguments()
+    if arguments.batch:
+        run_batch(arguments.gridworld_files, arguments.output_dir, arguments.format, arguments.q_engine,
+                  arguments.learning_rate, arguments.epsilon, arguments.discount_factor,
+                  arguments.convergence_threshold, arguments.seed, criteria_from_arguments(arguments),
+                  arguments.learning_rate_schedule, arguments.epsilon_schedule, arguments.workers,
+                  arguments.coarse_to_fine, arguments.cache_dir, arguments.cache_size, arguments.cache_warm_start,
+                  arguments.trace_decay)
+    else:
+        init(arguments)
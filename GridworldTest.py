@@ -0,0 +1,71 @@
+"""
+Tests of the command line of Gridworld.py in interactive and batch mode.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+
+from conftest import GRIDWORLD
+import GridFile
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Gridworld.py")
+
+
+def run(arguments, menu_input="", cwd=None):
+    """
+    :param arguments: list of command line arguments
+    :param menu_input: text entered in the interactive mode
+    :return: output of the script, which has to exit successfully
+    """
+    result = subprocess.run([sys.executable, SCRIPT] + arguments, input=menu_input, capture_output=True,
+                            text=True, timeout=120, cwd=cwd)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def write_gridworld(tmp_path):
+    gridworld_file = str(tmp_path / "small.grid")
+    GridFile.write_text_grid(GRIDWORLD, gridworld_file)
+    return gridworld_file
+
+
+def episodes(output):
+    return int(re.search(r"Calculated (\d+) episodes, stopped by criterion (\w+)", output).group(1))
+
+
+def test_interactive_mode_uses_the_options(tmp_path):
+    gridworld_file = write_gridworld(tmp_path)
+    # Q-learning until convergence, back to the menu, exit
+    menu_input = "1\n\n0\n"
+    output = run(["--seed", "1", "--convergence-threshold", "20", gridworld_file], menu_input)
+    assert "stopped by criterion policy_unchanged" in output
+    assert "Currently set to 20" in output
+    # the same seed gives the same run
+    assert episodes(run(["--convergence-threshold", "20", gridworld_file, "--seed", "1"], menu_input)) \
+        == episodes(output)
+
+    output = run(["--seed", "1", "--max-steps", "50", gridworld_file], menu_input)
+    assert "stopped by criterion budget" in output
+
+
+def test_interactive_mode_asks_for_missing_file(tmp_path):
+    gridworld_file = write_gridworld(tmp_path)
+    output = run(["--seed", "1", str(tmp_path / "missing.grid")], gridworld_file + "\n0\n")
+    assert "Invalid filename" in output
+    assert "Your input Gridworld" in output
+
+
+def test_batch_mode(tmp_path):
+    gridworld_file = write_gridworld(tmp_path)
+    output_dir = str(tmp_path / "results")
+    output = run(["--batch", gridworld_file, "--output-dir", output_dir, "--seed", "1",
+                  "--convergence-threshold", "20", "--q-engine", "array"])
+    statistics = json.loads(output.splitlines()[-1])
+    assert statistics["criterion"] == "policy_unchanged"
+    with open(os.path.join(output_dir, "small.json")) as f:
+        result = json.load(f)
+    assert result["episodes"] == statistics["episodes"]
+    assert len(result["q_values"]) == len(result["states"]) == 11
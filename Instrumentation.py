@@ -0,0 +1,236 @@
+"""
+Opt-in instrumentation of a QLearning object.
+
+Attaching an Instrumentation object wraps the methods of this one QLearning object
+(q_learning_episode, q_learning_step, update_policy and the env_perform_action callback)
+with versions that record metrics. Nothing in the QLearning class itself checks whether
+instrumentation is enabled, so a QLearning object without it runs exactly the same code as before
+and detaching restores the original methods.
+
+Per episode the metrics sink, any function accepting a dictionary (e.g. list.append or a
+JSONLinesSink), receives
+* "episode": number of the episode since attaching
+* "steps": number of Q-learning steps
+* "cumulative_reward": sum of the rewards observed from the environment
+* "mean_abs_td_error": mean absolute TD error of the Q-value updates
+* "policy_changes": number of states whose greedy action changed
+* "wall_time": duration of the episode in seconds
+
+Optionally every n-th call of q_learning_step, env_perform_action and update_policy is timed
+(sampling profiler), see profile_report for the results.
+
+The wrappers keep the wrapped function as __wrapped__ (see functools.wraps), so the environment
+of the wrapped env_perform_action stays reachable, e.g. for saving its random state in checkpoints.
+
+Example:
+    python Instrumentation.py 3by4.grid --metrics metrics.jsonl --profile-sample-rate 100
+"""
+
+import argparse
+import functools
+import json
+import time
+
+from MDP import MDP
+from QLearning import QLearning
+from RandomStream import RandomStream
+import Gridworld
+import DefaultConstants as Default
+
+
+class JSONLinesSink:
+    def __init__(self, file):
+        """
+        Metrics sink writing one JSON object per line to the given file, flushed after every episode,
+        so the file can be followed while training runs.
+        :param file: name of the file
+        """
+        self.file = open(file, "w")
+
+
+    def __call__(self, metrics):
+        self.file.write(json.dumps(metrics) + "\n")
+        self.file.flush()
+
+
+    def close(self):
+        self.file.close()
+
+
+class Instrumentation:
+    def __init__(self, metrics_sink=None, profile_sample_rate=0):
+        """
+        :param metrics_sink: optionally function called with a dictionary of metrics after every episode
+        :param profile_sample_rate: optionally time every n-th call of the profiled methods, 0 disables profiling
+        """
+        self.metrics_sink = metrics_sink
+        self.profile_sample_rate = profile_sample_rate
+        self.q_learning = None
+        # per profiled method a list of number of calls, number of timed calls and total time of the timed calls
+        self.profile = {}
+        self._reset_episode()
+        self.episode_count = 0
+
+
+    def attach(self, q_learning):
+        """
+        Starts recording metrics of the given QLearning object.
+        :param q_learning: QLearning object
+        """
+        if self.q_learning is not None:
+            raise Exception("Instrumentation is already attached")
+        self.q_learning = q_learning
+        self.originals = {name: q_learning.__dict__.get(name) for name in
+                          ("env_perform_action", "q_learning_step", "update_policy", "q_learning_episode")}
+
+        env_perform_action = q_learning.env_perform_action
+        q_learning_step = q_learning.q_learning_step
+        update_policy = q_learning.update_policy
+        q_learning_episode = q_learning.q_learning_episode
+        if self.metrics_sink is not None:
+            env_perform_action = self._recording_env_perform_action(env_perform_action)
+            q_learning_episode = self._recording_q_learning_episode(q_learning_episode)
+        if self.profile_sample_rate:
+            env_perform_action = self._sampled("env_perform_action", env_perform_action)
+            q_learning_step = self._sampled("q_learning_step", q_learning_step)
+            update_policy = self._sampled("update_policy", update_policy)
+
+        q_learning.env_perform_action = env_perform_action
+        q_learning.q_learning_step = q_learning_step
+        q_learning.update_policy = update_policy
+        q_learning.q_learning_episode = q_learning_episode
+
+
+    def detach(self):
+        """Stops recording and restores the original methods of the QLearning object."""
+        for name, original in self.originals.items():
+            if original is None:
+                # was a normal method, removing the wrapper makes the class attribute visible again
+                self.q_learning.__dict__.pop(name, None)
+            else:
+                setattr(self.q_learning, name, original)
+        self.q_learning = None
+
+
+    def _reset_episode(self):
+        self.steps = 0
+        self.cumulative_reward = 0
+        self.abs_td_error_sum = 0
+
+
+    def _recording_env_perform_action(self, env_perform_action):
+        """
+        Wraps the environment callback to record the reward and the TD error of the coming update,
+        which only depends on values known before the update.
+        """
+        q_learning = self.q_learning
+
+        @functools.wraps(env_perform_action)
+        def wrapper(s, a):
+            r, s_prime = env_perform_action(s, a)
+            if s in q_learning.goal_states:
+                greedy_q = 0
+            else:
+                greedy_q = max(q_learning.q_function[s_prime, a_prime] for a_prime in q_learning.actions)
+            self.steps += 1
+            self.cumulative_reward += r
+            self.abs_td_error_sum += abs(r + q_learning.discount_factor * greedy_q - q_learning.q_function[s, a])
+            return r, s_prime
+        return wrapper
+
+
+    def _recording_q_learning_episode(self, q_learning_episode):
+        q_learning = self.q_learning
+
+        @functools.wraps(q_learning_episode)
+        def wrapper():
+            self._reset_episode()
+            start = time.perf_counter()
+            q_learning_episode()
+            wall_time = time.perf_counter() - start
+            self.episode_count += 1
+            self.metrics_sink({"episode": self.episode_count,
+                               "steps": self.steps,
+                               "cumulative_reward": self.cumulative_reward,
+                               "mean_abs_td_error": self.abs_td_error_sum / max(self.steps, 1),
+                               "policy_changes": q_learning.policy_change_count,
+                               "wall_time": wall_time})
+        return wrapper
+
+
+    def _sampled(self, name, function):
+        """Wraps the function so every n-th call is timed."""
+        stats = self.profile[name] = [0, 0, 0.0]
+        rate = self.profile_sample_rate
+        clock = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            stats[0] += 1
+            if stats[0] % rate:
+                return function(*args, **kwargs)
+            start = clock()
+            result = function(*args, **kwargs)
+            stats[2] += clock() - start
+            stats[1] += 1
+            return result
+        return wrapper
+
+
+    def profile_report(self):
+        """
+        :return: dictionary mapping every profiled method to its number of calls, mean duration of the
+                 timed calls in microseconds and the estimated total time spent in it in seconds
+        """
+        report = {}
+        for name, (calls, sampled, total) in self.profile.items():
+            mean = total / sampled if sampled else 0
+            report[name] = {"calls": calls, "mean_us": mean * 1e6, "estimated_total_s": mean * calls}
+        return report
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Q-learning until convergence with metrics and profiling.")
+    parser.add_argument("gridworld_file", help="Gridworld file to learn on")
+    parser.add_argument("--metrics", help="write the metrics of every episode to this JSON lines file")
+    parser.add_argument("--profile-sample-rate", type=int, default=0,
+                        help="time every n-th call of the profiled methods and print the results")
+    parser.add_argument("--q-engine", choices=["dict", "array", "sparse"], default=Default.Q_ENGINE)
+    parser.add_argument("--seed", type=int)
+    return parser.parse_args()
+
+
+# only run if not imported from other file
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    environment_stream, learner_stream = RandomStream(arguments.seed).spawn(2)
+    environment = MDP(state_list=Gridworld.make_list_from_file(arguments.gridworld_file),
+                      field_rewards=Default.FIELD_REWARDS,
+                      obstacle_fields=Default.OBSTACLE_FIELDS,
+                      actions=Default.ACTIONS,
+                      transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                      seed=environment_stream)
+    q_learning = QLearning(env_perform_action=environment.perform_action,
+                           state_list=environment.state_index,
+                           goal_fields=Default.GOAL_FIELDS,
+                           obstacle_fields=Default.OBSTACLE_FIELDS,
+                           actions=Default.ACTIONS,
+                           discount_factor=Default.DISCOUNT_FACTOR,
+                           learning_rate=Default.LEARNING_RATE,
+                           epsilon=Default.EPSILON,
+                           convergence_threshold=Default.CONVERGENCE_THRESHOLD,
+                           q_engine=arguments.q_engine,
+                           seed=learner_stream)
+    sink = JSONLinesSink(arguments.metrics) if arguments.metrics else None
+    instrumentation = Instrumentation(sink, arguments.profile_sample_rate)
+    instrumentation.attach(q_learning)
+    try:
+        q_learning.q_learning_until_convergence()
+    finally:
+        instrumentation.detach()
+        if sink is not None:
+            sink.close()
+    print("Converged after {} episodes.".format(q_learning.last_convergence_episode_count))
+    for name, stats in instrumentation.profile_report().items():
+        print("{:<20} {:>10} calls {:>10.2f} us {:>8.3f} s".format(
+            name, stats["calls"], stats["mean_us"], stats["estimated_total_s"]))
@@ -0,0 +1,68 @@
+"""
+Tests of the metrics and the sampling profiler of Instrumentation.py.
+"""
+
+import json
+
+import Checkpoint
+from Convergence import Budget
+from Instrumentation import Instrumentation, JSONLinesSink
+
+
+def test_metrics_of_every_episode(make_learner):
+    q_learning = make_learner()
+    environment = q_learning.env_perform_action.__self__
+    metrics = []
+    instrumentation = Instrumentation(metrics.append, profile_sample_rate=5)
+    instrumentation.attach(q_learning)
+    q_learning.q_learning_until_convergence(criteria=[Budget(episodes=50)])
+
+    assert [episode["episode"] for episode in metrics] == list(range(1, 51))
+    assert sum(episode["steps"] for episode in metrics) == q_learning.step_count
+    for episode in metrics:
+        assert episode["steps"] >= 1
+        # every step but the last one in a goal state gets the reward of a free field
+        assert -0.04 * episode["steps"] - 1 - 1e-9 <= episode["cumulative_reward"] <= 1
+        assert episode["mean_abs_td_error"] >= 0
+        assert 0 <= episode["policy_changes"] <= len(q_learning.states)
+    report = instrumentation.profile_report()
+    assert report["q_learning_step"]["calls"] == q_learning.step_count
+    assert report["update_policy"]["calls"] == 50
+    assert report["env_perform_action"]["mean_us"] > 0
+
+    instrumentation.detach()
+    assert q_learning.env_perform_action == environment.perform_action
+    for name in ["q_learning_step", "update_policy", "q_learning_episode"]:
+        assert name not in q_learning.__dict__
+
+
+def test_instrumented_run_is_unchanged(make_learner):
+    runs = [make_learner(q_engine="array") for _ in range(2)]
+    instrumentation = Instrumentation(lambda metrics: None, profile_sample_rate=3)
+    instrumentation.attach(runs[0])
+    for q_learning in runs:
+        q_learning.q_learning_until_convergence(criteria=[Budget(episodes=30)])
+    assert (runs[0].q_function.table == runs[1].q_function.table).all()
+
+
+def test_checkpoint_keeps_environment_state(make_learner, tmp_path):
+    file = str(tmp_path / "run.ckpt")
+    q_learning = make_learner()
+    environment = q_learning.env_perform_action.__self__
+    # recording and profiling wrap env_perform_action twice
+    Instrumentation(lambda metrics: None, profile_sample_rate=2).attach(q_learning)
+    q_learning.q_learning_until_convergence(criteria=[Budget(episodes=10)])
+    Checkpoint.save_checkpoint(q_learning, file)
+    header, arrays = Checkpoint.read_checkpoint(file)
+    assert header["environment_rng_state"] == environment.rng.getstate()
+
+
+def test_json_lines_sink(make_learner, tmp_path):
+    file = str(tmp_path / "metrics.jsonl")
+    sink = JSONLinesSink(file)
+    q_learning = make_learner()
+    Instrumentation(sink).attach(q_learning)
+    q_learning.q_learning_until_convergence(criteria=[Budget(episodes=5)])
+    sink.close()
+    with open(file) as f:
+        assert [json.loads(line)["episode"] for line in f] == [1, 2, 3, 4, 5]
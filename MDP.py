@@ -6,41 +6,63 @@ in a specific state.
 
 The initialization is mostly the same as in the QLearning class, but to keep
 Q-learning and environment independent this is somewhat necessary.
+
+To make a step independent of the size of the Gridworld, the follow-up states of every
+(state, action) pair are computed once during initialization and stored in an index based table,
+so performing an action is only a couple of array lookups. The table takes 12 bytes per (state, action)
+pair for every state of the Gridworld, also with the sparse Q engine of QLearning.
+
+The slipping is decided with the MDP's own random number stream (see RandomStream.py),
+which can be seeded to reproduce a run.
 """
 
-import random
+import numpy as np
+
+from RandomStream import as_stream
+from StateIndex import StateValues, as_state_index
 
 
 class MDP:
-    def __init__(self, state_list, field_rewards, obstacle_fields, actions, transition_probabilities):
+    def __init__(self, state_list, field_rewards, obstacle_fields, actions, transition_probabilities, seed=None):
         """
         Initializes an MDP with the following parameters.
         "Field" here refers to the letters or signs with which different states are represented.
 
         :param state_list: two-dimensional list of possible states represented as specific fields
+                           or two-dimensional NumPy array of the byte values of the fields (see GridFile.py)
+                           or StateIndex of another object to share it, e.g. QLearning.state_index
         :param field_rewards: dictionary which maps fields in state_list to a reward value
         :param obstacle_fields: list of fields which are considered obstacles
         :param actions: list of possible movements in tuple notation, i.e. (x_coordinate_offset, y_coordinate_offset)
         :param transition_probabilities: dictionary of transition probabilities,
                                          mapping a probability to "straight" and "lateral" movement
+        :param seed: optionally seed or RandomStream for the random numbers of the environment
         """
 
-        # list of reachable states in (x, y) coordinate tuple notation
+        # reachable states in (x, y) coordinate tuple notation, mapped to dense indices
         # obstacles are left out as they are not reachable by an agent
-        self.states = []
-        # function implemented as dictionary which returns the immediate reward for the given state
+        # the StateIndex behaves like a list of the states, but checking if a state is contained is O(1)
+        self.state_index = as_state_index(state_list, obstacle_fields)
+        self.states = self.state_index
+        # array of the immediate rewards, entry i being the reward of the state with index i
         # as noted above it is only dependant on the state, not the action and therefore only called with the former
-        self.rewards = {}
-        # filling the three above
-        for y, line in enumerate(state_list):
-            for x, field in enumerate(line):
-                if field not in obstacle_fields:
-                    self.states.append((x, y))
-                    self.rewards[(x, y)] = field_rewards[field]
+        self.reward_vector = self.state_index.field_values(field_rewards)
+        # the same as dictionary-like function which returns the immediate reward for the given state
+        self.rewards = StateValues(self.state_index, self.reward_vector)
 
         # save as instance variables
         self.actions = actions
+        self.action_index = {a: j for j, a in enumerate(actions)}
         self.transition_probabilities = transition_probabilities
+        self.rng = as_stream(seed)
+
+        # table of follow-up states: entry [i, j, 0] is the index of the state reached from state i
+        # when action j goes straight, entries [i, j, 1] and [i, j, 2] those reached when slipping
+        # to one of the two orthogonal directions
+        self.transition_table = np.empty((len(self.states), len(actions), 3), dtype=np.int32)
+        for j, a in enumerate(actions):
+            for k, offset in enumerate([a, (a[1], a[0]), (-a[1], -a[0])]):
+                self.transition_table[:, j, k] = self.state_index.move(offset)
 
 
     def perform_action(self, s, a):
@@ -51,17 +73,36 @@ class MDP:
         :return: tuple of immediate reward, follow-up state
         """
 
-        if s not in self.states:
+        try:
+            i = self.state_index.find(s)
+        except (TypeError, ValueError):
+            i = -1
+        if i < 0:
             raise Exception("Invalid state given.")
-        if a not in self.actions:
+        try:
+            j = self.action_index[a]
+        except (KeyError, TypeError):
             raise Exception("Invalid action given")
 
-        # with probability (1 - probability of going straight) set action to random orthogonal action
-        if random.random() >= self.transition_probabilities["straight"]:
-            a = random.choice([(a[1], a[0]), (-a[1], -a[0])])
-        # calculate follow-up state
-        s_prime = (s[0] + a[0], s[1] + a[1])
-        # if follow-up state not a valid state, i.e. a wall, stay in current state
-        if s_prime not in self.states:
-            s_prime = s
-        return self.rewards[s], s_prime
+        r, i_prime = self.perform_action_index(i, j)
+        return r, self.states[i_prime]
+
+
+    def perform_action_index(self, i, j):
+        """
+        Fast path of perform_action working on indices instead of coordinate tuples.
+        The indices are not checked, so only pass valid ones.
+        :param i: index of the current state
+        :param j: index of the action to be performed
+        :return: tuple of immediate reward, index of the follow-up state
+        """
+
+        # with probability (1 - probability of going straight) slip to one of the orthogonal actions
+        u = self.rng.random()
+        if u < self.transition_probabilities["straight"]:
+            k = 0
+        elif u < self.transition_probabilities["straight"] + self.transition_probabilities["lateral"]:
+            k = 1
+        else:
+            k = 2
+        return self.reward_vector.item(i), self.transition_table.item(i, j, k)
@@ -0,0 +1,237 @@
+"""
+This ParallelQLearning class trains one policy with several worker processes at once.
+
+Every worker process has its own copy of the environment with its own random number stream
+and runs Q-learning episodes like QLearning.q_learning_episode, but all of them read and write
+the same array Q-table, which lives in shared memory (multiprocessing.shared_memory).
+The updates are not synchronized at all (asynchronous or "Hogwild!" Q-learning): a value written
+by one worker is immediately seen by all others, and if two workers update the same (state, action)
+pair at the very same time one of the updates may get lost, which is rare and harmless for learning.
+Every worker counts its episodes and steps in shared counters only it writes to.
+
+The process calling q_learning_until_convergence is the coordinator. It doesn't perform any steps,
+it periodically derives the policy from the shared Q-table, counts the episodes (of all workers)
+without change of the policy and updates the convergence criteria, and once one of them is met
+it tells the workers to stop after their current episode. Afterwards the Q-table is copied back
+into the coordinator, which can then be used like any QLearning object with the array Q engine,
+e.g. for single episodes in the Gridworld menu.
+
+Since the workers run concurrently, runs can't be reproduced exactly even when seeded.
+
+Example:
+    q_learning = ParallelQLearning(environment.perform_action, environment.state_index, ..., num_workers=8)
+    q_learning.q_learning_until_convergence()
+"""
+
+import multiprocessing
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from Checkpoint import save_checkpoint
+from Convergence import PolicyUnchanged
+from QLearning import QLearning
+from RandomStream import RandomStream
+
+# position of the stop flag in the shared counters, followed by the episode and step counts of the workers
+STOP = 0
+
+
+def run_worker(arguments, worker, num_workers, seed_sequence, q_values_name, counters_name, visit_counts_name):
+    """
+    Runs Q-learning episodes in a worker process on the shared Q-table until the coordinator sets the stop flag.
+    :param arguments: dictionary of the constructor arguments of the QLearning object of the worker
+    :param worker: number of the worker
+    :param num_workers: number of worker processes
+    :param seed_sequence: numpy.random.SeedSequence for the random numbers of the worker and its environment
+    :param q_values_name: name of the shared memory block of the Q-table
+    :param counters_name: name of the shared memory block of the stop flag and the counters
+    :param visit_counts_name: name of the shared memory block of the visit counts, None if there are none
+    """
+    environment_stream, learner_stream = RandomStream(seed_sequence).spawn(2)
+    q_learning = QLearning(q_engine="array", seed=learner_stream, **arguments)
+    # the environment was copied into this process, it gets a stream of its own as well
+    environment = getattr(q_learning.env_perform_action, "__self__", None)
+    if isinstance(getattr(environment, "rng", None), RandomStream):
+        environment.rng = environment_stream
+
+    # the workers share the resource tracker of the coordinator, which removes the shared memory in the end
+    shared_memories = [SharedMemory(q_values_name), SharedMemory(counters_name)]
+    try:
+        shape = (len(q_learning.states), len(q_learning.actions))
+        q_learning.q_function.table = np.ndarray(shape, dtype=np.float64, buffer=shared_memories[0].buf)
+        counters = np.ndarray(1 + 3 * num_workers, dtype=np.int64, buffer=shared_memories[1].buf)
+        # counts of the episodes before this run and of the episodes and steps of every worker in this run
+        base_episode_count = int(counters[1])
+        episode_counts = counters[2:2 + num_workers]
+        step_counts = counters[2 + num_workers:]
+        if visit_counts_name is not None:
+            shared_memories.append(SharedMemory(visit_counts_name))
+            q_learning.visit_counts.counts = np.ndarray(shape, dtype=np.uint32, buffer=shared_memories[2].buf)
+
+        while not counters[STOP]:
+            # schedules depend on the episodes of all workers
+            q_learning.episode_count = int(base_episode_count + episode_counts.sum())
+            q_learning.q_learning_episode()
+            episode_counts[worker] += 1
+            step_counts[worker] = q_learning.step_count
+    finally:
+        # views on the shared memory have to be gone before it can be closed
+        q_learning = counters = episode_counts = step_counts = None
+        for shared_memory in shared_memories:
+            shared_memory.close()
+
+
+class ParallelQLearning(QLearning):
+    def __init__(self, env_perform_action, state_list, goal_fields, obstacle_fields, actions, discount_factor,
+                 learning_rate, epsilon, convergence_threshold, num_workers, decimal_places=5, seed=None,
+                 learning_rate_schedule=None, epsilon_schedule=None, check_interval=0.05):
+        """
+        Sets up a representation of the gridworld given the following parameters.
+        Apart from the ones listed here the parameters are the same as for QLearning.
+
+        :param env_perform_action: function of the environment which gives back tuple (reward, follow-up state)
+                                   given a state and an action, it is pickled to be copied into the worker processes,
+                                   e.g. MDP.perform_action, whose MDP gets a new random number stream in every worker
+        :param num_workers: number of worker processes
+        :param seed: optionally seed or RandomStream, the streams of the workers are derived from it
+        :param check_interval: optionally change the number of seconds between two convergence checks
+        """
+
+        super().__init__(env_perform_action, state_list, goal_fields, obstacle_fields, actions, discount_factor,
+                         learning_rate, epsilon, convergence_threshold, decimal_places, q_engine="array", seed=seed,
+                         learning_rate_schedule=learning_rate_schedule, epsilon_schedule=epsilon_schedule)
+        # for setting up the QLearning objects of the workers
+        self.goal_fields = goal_fields
+        self.obstacle_fields = obstacle_fields
+        self.num_workers = num_workers
+        self.check_interval = check_interval
+
+
+    def worker_arguments(self):
+        """:return: dictionary of the constructor arguments of the QLearning objects of the workers"""
+        return {"env_perform_action": self.env_perform_action,
+                "state_list": self.state_index,
+                "goal_fields": self.goal_fields,
+                "obstacle_fields": self.obstacle_fields,
+                "actions": self.actions,
+                "discount_factor": self.discount_factor,
+                "learning_rate": self.learning_rate,
+                "epsilon": self.epsilon,
+                "convergence_threshold": self.convergence_threshold,
+                "decimal_places": self.decimal_places,
+                "learning_rate_schedule": self.learning_rate_schedule,
+                "epsilon_schedule": self.epsilon_schedule}
+
+
+    def q_learning_until_convergence(self, resume=False, checkpoint_file=None, checkpoint_interval=1000,
+                                     criteria=None, episode_callback=None):
+        """
+        Performs Q-learning episodes in the worker processes until the policy hasn't changed
+        for a given number of episodes of all workers (i.e. it has converged) or until any of the given criteria is met.
+        The criteria are updated at every check in which episodes finished, with max_q_delta covering
+        all changes since the last check.
+        :param resume: optionally continue the counts of a previous run, e.g. after loading a checkpoint
+        :param checkpoint_file: optionally save a checkpoint (see Checkpoint.py) to this file
+                                periodically and after convergence, the random number streams of the workers
+                                aren't part of it, so a resumed run continues differently
+        :param checkpoint_interval: number of episodes of all workers between two checkpoints,
+                                    checked at the next check after they finished
+        :param criteria: optionally list of convergence criteria (see Convergence.py),
+                         PolicyUnchanged with the convergence threshold by default
+        :param episode_callback: optionally function called with the QLearning object after every check
+                                 in which episodes finished, e.g. to publish the policy (see PolicyServer.py)
+        """
+
+        if criteria is None:
+            criteria = [PolicyUnchanged()]
+        if not resume:
+            self.last_convergence_episode_count = 0
+            self.policy_unchanged_count = 0
+        self.convergence_criterion = None
+        self.apply_schedules()
+        start_episode_count, start_step_count = self.episode_count, self.step_count
+
+        # the Q-table (and the visit counts) are moved into shared memory for the run
+        shape = self.q_function.table.shape
+        q_values_memory = SharedMemory(create=True, size=self.q_function.table.nbytes)
+        table = np.ndarray(shape, dtype=np.float64, buffer=q_values_memory.buf)
+        table[:] = self.q_function.table
+        self.q_function.table = table
+        # stop flag, number of episodes before this run, then episodes and steps of every worker in this run
+        counters_memory = SharedMemory(create=True, size=8 * (1 + 3 * self.num_workers))
+        counters = np.ndarray(1 + 3 * self.num_workers, dtype=np.int64, buffer=counters_memory.buf)
+        counters[:] = 0
+        counters[1] = start_episode_count
+        episode_counts = counters[2:2 + self.num_workers]
+        step_counts = counters[2 + self.num_workers:]
+        visit_counts_memory = None
+        if self.visit_counts is not None:
+            visit_counts_memory = SharedMemory(create=True, size=self.visit_counts.counts.nbytes)
+            visit_counts = np.ndarray(shape, dtype=np.uint32, buffer=visit_counts_memory.buf)
+            visit_counts[:] = self.visit_counts.counts
+            self.visit_counts.counts = visit_counts
+
+        workers = []
+        try:
+            arguments = self.worker_arguments()
+            # spawn instead of fork, so the workers don't inherit locks held by other threads (e.g. of the menu)
+            context = multiprocessing.get_context("spawn")
+            for worker, seed_sequence in enumerate(self.rng.seed_sequence.spawn(self.num_workers)):
+                process = context.Process(target=run_worker, daemon=True, args=(
+                    arguments, worker, self.num_workers, seed_sequence, q_values_memory.name, counters_memory.name,
+                    visit_counts_memory.name if visit_counts_memory is not None else None))
+                process.start()
+                workers.append(process)
+
+            for criterion in criteria:
+                criterion.start(self)
+            previous_table = table.copy()
+            next_checkpoint = self.last_convergence_episode_count + checkpoint_interval
+            while not self.converged(criteria):
+                time.sleep(self.check_interval)
+                if any(process.exitcode not in (None, 0) for process in workers):
+                    raise RuntimeError("A Q-learning worker process failed")
+                episode_count = start_episode_count + int(episode_counts.sum())
+                finished_count = episode_count - self.episode_count
+                if not finished_count:
+                    continue
+                self.episode_count = episode_count
+                self.step_count = start_step_count + int(step_counts.sum())
+                self.last_convergence_episode_count += finished_count
+                self.update_policy()
+                if not self.policy_changed:
+                    self.policy_unchanged_count += finished_count
+                else:
+                    self.policy_unchanged_count = 0
+                self.max_q_delta = float(np.abs(table - previous_table).max())
+                previous_table[:] = table
+                for criterion in criteria:
+                    criterion.update(self)
+                if episode_callback is not None:
+                    episode_callback(self)
+                if checkpoint_file is not None and self.last_convergence_episode_count >= next_checkpoint:
+                    save_checkpoint(self, checkpoint_file)
+                    next_checkpoint = self.last_convergence_episode_count + checkpoint_interval
+        finally:
+            counters[STOP] = 1
+            for process in workers:
+                process.join()
+            # episodes finished while the workers were stopping count as well
+            self.episode_count = start_episode_count + int(episode_counts.sum())
+            self.step_count = start_step_count + int(step_counts.sum())
+            # private copies, since the shared memory is removed
+            self.q_function.table = table.copy()
+            if visit_counts_memory is not None:
+                self.visit_counts.counts = visit_counts.copy()
+            # views on the shared memory have to be gone before it can be closed
+            table = previous_table = visit_counts = counters = episode_counts = step_counts = None
+            for shared_memory in [q_values_memory, counters_memory, visit_counts_memory]:
+                if shared_memory is not None:
+                    shared_memory.close()
+                    shared_memory.unlink()
+        self.apply_schedules()
+        self.update_policy()
+        if checkpoint_file is not None:
+            save_checkpoint(self, checkpoint_file)
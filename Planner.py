@@ -0,0 +1,160 @@
+"""
+This Planner class computes the optimal action-value function Q* and policy of an MDP exactly,
+using the known transition model instead of sampling episodes like Q-learning does.
+
+The transition model is the transition table of the MDP, which is a sparse matrix in itself:
+every (state, action) pair has only three possible follow-up states (straight and the two lateral ones)
+with the probabilities given in TRANSITION_PROBABILITIES. A Bellman backup of all states at once
+is therefore a few vectorized NumPy operations.
+
+Terminal states are handled the same way as in QLearning: acting in a terminal state yields
+its reward and no future reward.
+
+Example:
+    python Planner.py 3by4.grid
+"""
+
+import sys
+
+import numpy as np
+
+from MDP import MDP
+from QLearning import QLearning
+import Gridworld
+import DefaultConstants as Default
+
+
+class Planner:
+    def __init__(self, mdp, goal_fields, discount_factor):
+        """
+        :param mdp: MDP object providing the transition model
+        :param goal_fields: list of fields which are considered terminal states
+        :param discount_factor: float being the discount factor gamma
+        """
+        self.mdp = mdp
+        self.discount_factor = discount_factor
+        # entry i is True if the state with index i is a terminal state
+        self.is_goal = mdp.state_index.field_mask(goal_fields)
+        # probabilities of reaching the three follow-up states stored in the transition table
+        straight = mdp.transition_probabilities["straight"]
+        lateral = mdp.transition_probabilities["lateral"]
+        self.probabilities = np.array([straight, lateral, 1 - straight - lateral])
+
+        # results, set by value_iteration and policy_iteration
+        self.q_values = np.zeros((len(mdp.states), len(mdp.actions)))
+        self.values = np.zeros(len(mdp.states))
+        self.greedy = np.zeros(len(mdp.states), dtype=np.int64)
+        self.iterations = 0
+
+
+    def backup(self, values):
+        """
+        Computes Q from the given state values with one Bellman backup.
+        :param values: array of state values
+        :return: array of Q-values with one row per state and one column per action
+        """
+        expected = values[self.mdp.transition_table] @ self.probabilities
+        expected[self.is_goal] = 0  # if current state is a goal state future reward will always be 0
+        return self.mdp.reward_vector[:, None] + self.discount_factor * expected
+
+
+    def value_iteration(self, tolerance=1e-8, max_iterations=100000):
+        """
+        Performs Bellman optimality backups of all states until the values change less than the tolerance.
+        :param tolerance: largest change of a state value for which the values are considered converged
+        :param max_iterations: maximum number of backups
+        :return: array of optimal Q-values
+        """
+        values = self.values
+        for self.iterations in range(1, max_iterations + 1):
+            self.q_values = self.backup(values)
+            new_values = self.q_values.max(axis=1)
+            delta = np.abs(new_values - values).max()
+            values = new_values
+            if delta < tolerance:
+                break
+        self.values = values
+        self.greedy = self.q_values.argmax(axis=1)
+        return self.q_values
+
+
+    def policy_iteration(self, evaluation_sweeps=50, tolerance=1e-8, max_iterations=10000):
+        """
+        Alternates evaluating the current greedy policy and improving it (modified policy iteration).
+        The evaluation uses a fixed number of sweeps instead of solving a linear system,
+        which scales to large Gridworlds and stays finite for policies that never reach a terminal state.
+        :param evaluation_sweeps: number of policy evaluation backups per iteration
+        :param tolerance: largest change of a state value for which the values are considered converged
+        :param max_iterations: maximum number of policy improvements
+        :return: array of optimal Q-values
+        """
+        values = self.values
+        self.q_values = self.backup(values)
+        self.greedy = self.q_values.argmax(axis=1)
+        for self.iterations in range(1, max_iterations + 1):
+            old_values = values
+            values = self.evaluate_policy(self.greedy, evaluation_sweeps, values)
+            # policy improvement
+            self.q_values = self.backup(values)
+            greedy = self.q_values.argmax(axis=1)
+            values = self.q_values.max(axis=1)
+            stable = np.array_equal(greedy, self.greedy)
+            self.greedy = greedy
+            if stable and np.abs(values - old_values).max() < tolerance:
+                break
+        self.values = values
+        return self.q_values
+
+
+    def evaluate_policy(self, greedy, sweeps=50, values=None):
+        """
+        Approximates the state values of a policy with a fixed number of backups.
+        Only the follow-up states of the chosen actions are needed, so a backup of all states
+        is a single gather and matrix-vector product.
+        :param greedy: array of the index of the action chosen in every state
+        :param sweeps: number of backups
+        :param values: optionally state values to start from, e.g. those of a similar policy, 0 by default
+        :return: array of state values
+        """
+        if values is None:
+            values = np.zeros(len(self.mdp.states))
+        transitions = self.mdp.transition_table[np.arange(len(self.mdp.states)), greedy]
+        for _ in range(sweeps):
+            expected = values[transitions] @ self.probabilities
+            expected[self.is_goal] = 0  # if current state is a goal state future reward will always be 0
+            values = self.mdp.reward_vector + self.discount_factor * expected
+        return values
+
+
+    def warm_start(self, q_learning):
+        """
+        Sets the Q-function of the QLearning object to the Q-values computed by the planner
+        and updates its policy accordingly.
+        :param q_learning: QLearning object on the same Gridworld
+        """
+        q_learning.set_q_function(self.q_values)
+
+
+# only run if not imported from other file
+if __name__ == "__main__":
+    gridworld = Gridworld.make_list_from_file(sys.argv[1])
+    environment = MDP(state_list=gridworld,
+                      field_rewards=Default.FIELD_REWARDS,
+                      obstacle_fields=Default.OBSTACLE_FIELDS,
+                      actions=Default.ACTIONS,
+                      transition_probabilities=Default.TRANSITION_PROBABILITIES)
+    q_learning = QLearning(env_perform_action=environment.perform_action,
+                           state_list=gridworld,
+                           goal_fields=Default.GOAL_FIELDS,
+                           obstacle_fields=Default.OBSTACLE_FIELDS,
+                           actions=Default.ACTIONS,
+                           discount_factor=Default.DISCOUNT_FACTOR,
+                           learning_rate=Default.LEARNING_RATE,
+                           epsilon=Default.EPSILON,
+                           convergence_threshold=Default.CONVERGENCE_THRESHOLD,
+                           q_engine="array")
+    planner = Planner(environment, Default.GOAL_FIELDS, Default.DISCOUNT_FACTOR)
+    planner.value_iteration()
+    planner.warm_start(q_learning)
+    print("Value iteration converged after {} iterations.".format(planner.iterations))
+    Gridworld.print_q_function_and_policy(q_learning)
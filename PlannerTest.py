@@ -0,0 +1,67 @@
+"""
+Tests of value iteration and policy iteration with Planner.py on the example Gridworld of the README.
+"""
+
+import numpy as np
+import pytest
+
+import DefaultConstants as Default
+from Planner import Planner
+from Schedules import GLIE
+
+
+def make_planner(q_learning):
+    return Planner(q_learning.env_perform_action.__self__, Default.GOAL_FIELDS, q_learning.discount_factor)
+
+
+def value_of(q_learning, planner, field):
+    return planner.values[q_learning.state_index.index(field)]
+
+
+@pytest.mark.parametrize("method", ["value_iteration", "policy_iteration"])
+def test_known_values(make_learner, method):
+    q_learning = make_learner(q_engine="array")
+    planner = make_planner(q_learning)
+    q_values = getattr(planner, method)()
+    assert value_of(q_learning, planner, (0, 0)) == pytest.approx(0.812, abs=1e-3)
+    assert value_of(q_learning, planner, (0, 2)) == pytest.approx(0.705, abs=1e-3)
+    assert value_of(q_learning, planner, (3, 2)) == pytest.approx(0.388, abs=1e-3)
+    # goal states only get their reward
+    assert value_of(q_learning, planner, (3, 0)) == 1
+    assert value_of(q_learning, planner, (3, 1)) == -1
+    assert np.array_equal(planner.values, q_values.max(axis=1))
+    assert np.array_equal(planner.greedy, q_values.argmax(axis=1))
+
+
+def test_both_methods_agree(make_learner):
+    q_learning = make_learner(q_engine="array")
+    value_iteration = make_planner(q_learning)
+    value_iteration.value_iteration()
+    policy_iteration = make_planner(q_learning)
+    policy_iteration.policy_iteration()
+    assert np.abs(value_iteration.values - policy_iteration.values).max() < 1e-6
+    assert np.array_equal(value_iteration.greedy, policy_iteration.greedy)
+    # the values of the optimal policy are the optimal values
+    assert np.abs(value_iteration.evaluate_policy(value_iteration.greedy, sweeps=200)
+                  - value_iteration.values).max() < 1e-6
+
+
+def test_policy_of_converged_q_learning(make_learner):
+    # a decaying learning rate, so Q-learning settles on the optimal action in states with almost equally good ones
+    q_learning = make_learner(q_engine="array", convergence_threshold=200, learning_rate_schedule=GLIE(0.5, 500))
+    q_learning.q_learning_until_convergence()
+    planner = make_planner(q_learning)
+    planner.value_iteration()
+    # any action is optimal in a goal state
+    is_goal = planner.is_goal
+    assert np.array_equal(q_learning.greedy_actions()[~is_goal], planner.greedy[~is_goal])
+
+
+def test_warm_start(make_learner):
+    q_learning = make_learner(q_engine="array")
+    planner = make_planner(q_learning)
+    planner.value_iteration()
+    planner.warm_start(q_learning)
+    # Q is rounded to the decimal places of the learner
+    assert np.array_equal(q_learning.q_function.table, planner.q_values.round(q_learning.decimal_places))
+    assert np.array_equal(q_learning.greedy_actions(), planner.greedy)
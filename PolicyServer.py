@@ -0,0 +1,351 @@
+"""
+Serves the greedy actions and Q-values of a QLearning object over a local socket while it is trained.
+
+Training runs on a background thread. At episode boundaries it copies Q and the policy into a
+snapshot which is then handed to the event loop, so lookups never read the Q-function while it
+changes and never wait for the learner. There are two snapshot buffers (double buffering): the
+event loop reads the front one, the learner fills the back one and the event loop swaps them.
+The learner only fills the back buffer again once the event loop made the swap, otherwise it skips
+publishing in that episode, so it never waits for the event loop either.
+
+Queries of all connections are put into one queue and answered in batches: every batch is looked up
+in the same snapshot with one vectorized array access.
+
+The protocol is one JSON object per line in both directions. Requests are
+    {"id": 1, "type": "actions", "states": [[0, 0], [3, 2]]}
+    {"id": 2, "type": "q_values", "states": [[0, 0]]}
+    {"id": 3, "type": "status"}
+and answered with the "id", the "episode" of the snapshot and "actions" (list of [x, y] offsets),
+"q_values" (list of lists, one value per action) or the status of the training respectively.
+States which don't exist are answered with null. Invalid requests are answered with an "error".
+
+Example:
+    python PolicyServer.py 3by4.grid --port 8765
+    python PolicyServer.py big.bgrid --unix /tmp/policy.sock --q-engine array
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+
+import numpy as np
+
+from Convergence import PolicyUnchanged, Stop
+from MDP import MDP
+from QLearning import QLearning
+from RandomStream import RandomStream
+import GridFile
+import DefaultConstants as Default
+
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_BATCH_SIZE = 1024
+
+
+class PolicySnapshot:
+    def __init__(self, state_count, action_count):
+        """
+        Buffer for a copy of Q and the policy, read-only except while the learner fills it.
+        :param state_count: number of states
+        :param action_count: number of actions
+        """
+        # row i contains the Q-values of state i (in the order of QLearning.states)
+        self.q_values = np.zeros((state_count, action_count))
+        # entry i is the index of the action chosen in state i
+        self.greedy = np.zeros(state_count, dtype=np.int64)
+        # number of episodes the Q-values were learned in, -1 while empty
+        self.episode = -1
+        self.q_values.flags.writeable = False
+        self.greedy.flags.writeable = False
+
+
+    def fill(self, q_learning, episode):
+        """
+        Copies Q and the policy of the QLearning object into this buffer.
+        :param q_learning: QLearning object, not changed during the call
+        :param episode: number of episodes the Q-values were learned in
+        """
+        self.q_values.flags.writeable = True
+        self.greedy.flags.writeable = True
+        if q_learning.q_engine == "array":
+            np.copyto(self.q_values, q_learning.q_function.table)
+        elif q_learning.q_engine == "sparse":
+            states, rows = q_learning.q_function.rows()
+            self.q_values.fill(q_learning.q_function.default)
+            self.q_values[states] = rows
+        else:
+            for i, s in enumerate(q_learning.states):
+                for j, a in enumerate(q_learning.actions):
+                    self.q_values[i, j] = q_learning.q_function[s, a]
+        self.greedy[:] = q_learning.greedy_actions()
+        self.episode = episode
+        self.q_values.flags.writeable = False
+        self.greedy.flags.writeable = False
+
+
+class PolicyServer:
+    def __init__(self, q_learning, max_batch_size=MAX_BATCH_SIZE, criteria=None):
+        """
+        :param q_learning: QLearning object to train and serve, not to be used by anything else while serving
+        :param max_batch_size: optionally maximum number of queries answered at once
+        :param criteria: optionally list of convergence criteria (see Convergence.py),
+                         PolicyUnchanged with the convergence threshold by default
+        """
+        self.q_learning = q_learning
+        self.max_batch_size = max_batch_size
+        self.stop = Stop()
+        self.criteria = (criteria if criteria is not None else [PolicyUnchanged()]) + [self.stop]
+        self.state_index = q_learning.state_index
+        self.actions = [list(a) for a in q_learning.actions]
+
+        shape = (len(q_learning.states), len(q_learning.actions))
+        self.front = PolicySnapshot(*shape)
+        self.back = PolicySnapshot(*shape)
+        # set while the back buffer may be filled, i.e. the event loop doesn't read it anymore
+        self.swapped = threading.Event()
+        self.swapped.set()
+        self.training = False
+        self.loop = None
+        self.queue = None
+
+
+    def publish(self, q_learning):
+        """
+        Called by the learner at episode boundaries: fills the back buffer and lets the event loop swap,
+        unless the event loop hasn't swapped since the last call.
+        :param q_learning: QLearning object being trained
+        """
+        if not self.swapped.is_set():
+            return
+        self.swapped.clear()
+        self.back.fill(q_learning, q_learning.last_convergence_episode_count)
+        self.loop.call_soon_threadsafe(self._swap)
+
+
+    def _swap(self):
+        self.front, self.back = self.back, self.front
+        self.swapped.set()
+
+
+    def train(self):
+        """Trains until convergence on the calling thread, publishing snapshots along the way."""
+        try:
+            self.q_learning.q_learning_until_convergence(criteria=self.criteria, episode_callback=self.publish)
+            # the final policy, waiting for the event loop is fine since training is over
+            self.swapped.wait()
+            self.publish(self.q_learning)
+        finally:
+            self.training = False
+
+
+    def lookup(self, snapshot, request):
+        """
+        Answers one request from the given snapshot.
+        :param snapshot: PolicySnapshot
+        :param request: dictionary of the request
+        :return: dictionary of the response
+        """
+        response = {"id": request.get("id"), "episode": snapshot.episode}
+        request_type = request.get("type")
+        if request_type == "status":
+            response["training"] = self.training
+            response["criterion"] = self.q_learning.convergence_criterion
+            return response
+        if request_type not in ("actions", "q_values"):
+            response["error"] = "Unknown request type: {}".format(request_type)
+            return response
+
+        try:
+            coordinates = np.array(request["states"], dtype=np.int64)
+            if coordinates.size == 0:
+                coordinates = coordinates.reshape(0, 2)
+            if coordinates.ndim != 2 or coordinates.shape[1] != 2:
+                raise ValueError
+        except (KeyError, TypeError, ValueError, OverflowError):
+            response["error"] = "States have to be a list of [x, y] coordinates"
+            return response
+        x, y = coordinates[:, 0], coordinates[:, 1]
+        width, height = self.state_index.dim
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        indices = np.full(len(coordinates), -1, dtype=np.int64)
+        indices[inside] = self.state_index.index_grid[y[inside], x[inside]]
+        found = indices >= 0
+
+        if request_type == "actions":
+            greedy = snapshot.greedy[indices[found]].tolist()
+            values = iter(self.actions[j] for j in greedy)
+            response["actions"] = [next(values) if f else None for f in found.tolist()]
+        else:
+            rows = iter(snapshot.q_values[indices[found]].tolist())
+            response["q_values"] = [next(rows) if f else None for f in found.tolist()]
+        return response
+
+
+    async def batcher(self):
+        """Answers the queued queries in batches, every batch from one snapshot."""
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            snapshot = self.front
+            for request, future in batch:
+                if future.cancelled():
+                    continue
+                # a request nobody thought of must not stop the answers to all the others
+                try:
+                    response = self.lookup(snapshot, request)
+                except Exception as e:
+                    response = {"id": request.get("id"), "error": "Could not answer request: {}".format(e)}
+                future.set_result(response)
+
+
+    async def handle_connection(self, reader, writer):
+        """Reads one request per line and writes the responses in the same order."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError
+                except ValueError:
+                    response = {"error": "Requests have to be JSON objects"}
+                else:
+                    future = self.loop.create_future()
+                    await self.queue.put((request, future))
+                    response = await future
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # the client went away or the server is shutting down
+            pass
+        finally:
+            writer.close()
+
+
+    async def serve(self, host=HOST, port=PORT, unix_path=None, ready=None):
+        """
+        Starts training and serves until cancelled, stopping the training at the next episode boundary then.
+        :param host: optionally host to listen on
+        :param port: optionally port to listen on
+        :param unix_path: optionally path of a Unix domain socket to listen on instead
+        :param ready: optionally function called with the server's socket address once it listens
+        """
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        batcher = self.loop.create_task(self.batcher())
+        self.training = True
+        training = self.loop.run_in_executor(None, self.train)
+        if ready is not None:
+            ready(server.sockets[0].getsockname())
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.stop.stop()
+            server.close()
+            batcher.cancel()
+            await training
+
+
+class PolicyClient:
+    def __init__(self, host=HOST, port=PORT, unix_path=None):
+        """
+        Simple blocking client of a PolicyServer.
+        :param host: optionally host of the server
+        :param port: optionally port of the server
+        :param unix_path: optionally path of the server's Unix domain socket instead
+        """
+        if unix_path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(unix_path)
+        else:
+            self.socket = socket.create_connection((host, port))
+        self.file = self.socket.makefile("rwb")
+        self.request_count = 0
+
+
+    def request(self, request_type, states=None):
+        """
+        :param request_type: "actions", "q_values" or "status"
+        :param states: optionally list of states in (x, y) coordinate tuple notation
+        :return: dictionary of the response
+        """
+        self.request_count += 1
+        request = {"id": self.request_count, "type": request_type}
+        if states is not None:
+            request["states"] = [list(s) for s in states]
+        self.file.write(json.dumps(request).encode() + b"\n")
+        self.file.flush()
+        return json.loads(self.file.readline())
+
+
+    def actions(self, states):
+        """
+        :param states: list of states in (x, y) coordinate tuple notation
+        :return: list of the actions chosen by the served policy, None for states which don't exist
+        """
+        return [tuple(a) if a is not None else None for a in self.request("actions", states)["actions"]]
+
+
+    def q_values(self, states):
+        """
+        :param states: list of states in (x, y) coordinate tuple notation
+        :return: list of tuples of the served Q-values, one per action, None for states which don't exist
+        """
+        return [tuple(q) if q is not None else None for q in self.request("q_values", states)["q_values"]]
+
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Trains Q-learning on a Gridworld and serves the policy meanwhile.")
+    parser.add_argument("gridworld_file", help="Gridworld file in text or binary format")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", help="path of a Unix domain socket to listen on instead of host and port")
+    parser.add_argument("--q-engine", choices=["dict", "array", "sparse"], default="array")
+    parser.add_argument("--seed", type=int)
+    return parser.parse_args()
+
+
+# only run if not imported from other file
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    gridworld = GridFile.load_gridworld(arguments.gridworld_file)
+    environment_stream, learner_stream = RandomStream(arguments.seed).spawn(2)
+    environment = MDP(state_list=gridworld,
+                      field_rewards=Default.FIELD_REWARDS,
+                      obstacle_fields=Default.OBSTACLE_FIELDS,
+                      actions=Default.ACTIONS,
+                      transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                      seed=environment_stream)
+    q_learning = QLearning(env_perform_action=environment.perform_action,
+                           state_list=environment.state_index,
+                           goal_fields=Default.GOAL_FIELDS,
+                           obstacle_fields=Default.OBSTACLE_FIELDS,
+                           actions=Default.ACTIONS,
+                           discount_factor=Default.DISCOUNT_FACTOR,
+                           learning_rate=Default.LEARNING_RATE,
+                           epsilon=Default.EPSILON,
+                           convergence_threshold=Default.CONVERGENCE_THRESHOLD,
+                           q_engine=arguments.q_engine,
+                           seed=learner_stream,
+                           learning_rate_schedule=Default.LEARNING_RATE_SCHEDULE,
+                           epsilon_schedule=Default.EPSILON_SCHEDULE)
+    server = PolicyServer(q_learning)
+    try:
+        asyncio.run(server.serve(arguments.host, arguments.port, arguments.unix,
+                                 ready=lambda address: print("Serving on {}".format(address), flush=True)))
+    except KeyboardInterrupt:
+        pass
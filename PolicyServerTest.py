@@ -0,0 +1,87 @@
+"""
+Tests of serving the policy of a QLearning object with PolicyServer.py.
+"""
+
+import asyncio
+import json
+import queue
+import threading
+
+import pytest
+
+from PolicyServer import PolicyClient, PolicyServer
+
+
+@pytest.fixture
+def server(make_learner):
+    """:return: PolicyServer training on the README example Gridworld, listening on a free port"""
+    server = PolicyServer(make_learner(q_engine="array"))
+    addresses = queue.Queue()
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(server.serve(port=0, ready=addresses.put))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    server.address = addresses.get(timeout=10)
+    yield server
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(timeout=10)
+    loop.close()
+
+
+@pytest.fixture
+def client(server):
+    client = PolicyClient(port=server.address[1])
+    # a lost answer fails the test instead of hanging it
+    client.socket.settimeout(10)
+    yield client
+    client.close()
+
+
+def wait_for_training(client):
+    while client.request("status")["training"]:
+        pass
+
+
+def test_queries(server, client):
+    wait_for_training(client)
+    status = client.request("status")
+    assert status["criterion"] == "policy_unchanged"
+    assert status["episode"] == server.q_learning.last_convergence_episode_count
+
+    states = [(0, 0), (1, 1), (3, 2), (7, 7)]
+    actions = client.actions(states)
+    q_learning = server.q_learning
+    assert actions[:3] == [q_learning.policy[0, 0], None, q_learning.policy[3, 2]]
+    assert actions[3] is None
+    q_values = client.q_values(states)
+    assert q_values[0] == tuple(q_learning.q_function[(0, 0), a] for a in q_learning.actions)
+    assert q_values[1] is None and q_values[3] is None
+
+
+@pytest.mark.parametrize("request_line", [
+    b"no json\n",
+    b"[1, 2]\n",
+    b'{"id": 1, "type": "unknown"}\n',
+    b'{"id": 1, "type": "actions"}\n',
+    b'{"id": 1, "type": "actions", "states": [[0, 0, 0]]}\n',
+    b'{"id": 1, "type": "actions", "states": [["x", 0]]}\n',
+    # doesn't fit into 64 bit integers
+    b'{"id": 1, "type": "actions", "states": [[1180591620717411303424, 0]]}\n',
+    b'{"id": 1, "type": "q_values", "states": {"x": 0}}\n'])
+def test_malformed_queries_are_answered_with_errors(server, client, request_line):
+    client.file.write(request_line)
+    client.file.flush()
+    assert "error" in json.loads(client.file.readline())
+    # neither the connection nor the server stopped answering
+    assert client.actions([(0, 0)])[0] is not None
+    other_client = PolicyClient(port=server.address[1])
+    other_client.socket.settimeout(10)
+    assert other_client.request("status")["id"] == 1
+    other_client.close()
@@ -0,0 +1,118 @@
+"""
+This PrioritizedSweeping class schedules model based Q-value updates by how much they would change Q.
+
+A heap holds (state, action) pairs keyed by the magnitude of their expected TD error, computed
+with the learned model of the environment (see DynaModel.py). After every real step the pair just
+performed and all pairs known to lead into its state (predecessor index built from observed transitions)
+are queued if their priority exceeds a threshold. Then the highest priority pairs are backed up, up to
+a budget per step, and the predecessors of every backed up state are queued in turn.
+A backup sets the Q-value of a pair to its expected target (see QLearning.model_backup) instead of moving
+it there by the learning rate, so the noise of single real transitions doesn't stay in Q and the greedy
+action of states whose best actions are almost equally good settles once the model does.
+The pairs popped in one step are backed up together with vectorized operations, since the overhead
+of doing this one pair at a time would exceed the cost of the updates themselves.
+
+Value changes around the goal fields therefore travel backwards along the observed transitions right away
+instead of waiting for random episodes to retrace them.
+"""
+
+import heapq
+
+import numpy as np
+
+
+class PrioritizedSweeping:
+    def __init__(self, q_learning, model, budget, threshold=1e-4):
+        """
+        :param q_learning: QLearning object using the array Q engine whose Q-values are updated
+        :param model: DynaModel learned from the real transitions
+        :param budget: maximum number of backups per real step
+        :param threshold: minimum priority for a pair to be queued
+        """
+        self.q_learning = q_learning
+        self.model = model
+        self.budget = budget
+        self.threshold = threshold
+        # heap of (-priority, state index, action index), the negation turns Python's min-heap into a max-heap
+        self.queue = []
+        # current priority of every queued pair, entries in the heap with a different priority are outdated
+        self.queued = {}
+        # follow-up state index -> set of (state index, action index) pairs observed to lead into it
+        self.predecessors = {}
+        # the same as arrays of state and action indices, created when needed
+        self.predecessor_arrays = {}
+        # number of backups performed in total
+        self.backup_count = 0
+
+
+    def expected_targets(self, s, a):
+        """
+        :param s: array of state indices
+        :param a: array of action indices
+        :return: array of the expected Q-learning targets of the pairs according to the model
+        """
+        q_learning = self.q_learning
+        return self.model.expected_targets(q_learning.q_function.table, s, a, q_learning.is_goal,
+                                           q_learning.discount_factor)
+
+
+    def push(self, s, a):
+        """
+        Queues the given pairs whose priority exceeds the threshold.
+        :param s: array of state indices
+        :param a: array of action indices
+        """
+        q = self.q_learning.q_function.table
+        priorities = np.abs(self.expected_targets(s, a) - q[s, a])
+        for s_, a_, priority in zip(s.tolist(), a.tolist(), priorities.tolist()):
+            if priority > self.threshold and priority > self.queued.get((s_, a_), 0):
+                self.queued[(s_, a_)] = priority
+                heapq.heappush(self.queue, (-priority, s_, a_))
+
+
+    def push_predecessors(self, states):
+        """Queues the pairs observed to lead into the states with the given indices."""
+        s, a = [], []
+        for s_prime in states:
+            if s_prime not in self.predecessor_arrays:
+                if s_prime not in self.predecessors:
+                    continue
+                self.predecessor_arrays[s_prime] = np.array(list(self.predecessors[s_prime]), dtype=np.int64).T
+            s.append(self.predecessor_arrays[s_prime][0])
+            a.append(self.predecessor_arrays[s_prime][1])
+        if s:
+            self.push(np.concatenate(s), np.concatenate(a))
+
+
+    def observe(self, s, a, s_prime):
+        """
+        Records a real transition (the model has to be updated already) and queues the affected pairs.
+        :param s: index of the state
+        :param a: index of the action
+        :param s_prime: index of the follow-up state
+        """
+        pairs = self.predecessors.setdefault(s_prime, set())
+        if (s, a) not in pairs:
+            pairs.add((s, a))
+            self.predecessor_arrays.pop(s_prime, None)
+        self.push(np.array([s]), np.array([a]))
+        # the Q-values of s may have changed, which changes the targets of its predecessors
+        self.push_predecessors([s])
+
+
+    def sweep(self):
+        """Backs up the highest priority pairs, at most budget many."""
+        pairs = []
+        while self.queue and len(pairs) < self.budget:
+            priority, s, a = heapq.heappop(self.queue)
+            # skip outdated heap entries
+            if self.queued.get((s, a)) == -priority:
+                del self.queued[(s, a)]
+                pairs.append((s, a))
+        if not pairs:
+            return
+
+        s, a = np.array(pairs, dtype=np.int64).T
+        self.q_learning.model_backup(s, a)
+        self.backup_count += len(pairs)
+        self.push_predecessors(set(s.tolist()))
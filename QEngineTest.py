@@ -0,0 +1,49 @@
+"""
+Tests of the Q engines of QLearning, which have to learn exactly the same with the same seed.
+"""
+
+import numpy as np
+import pytest
+
+
+def train(make_learner, q_engine):
+    q_learning = make_learner(q_engine=q_engine)
+    q_learning.q_learning_until_convergence()
+    return q_learning
+
+
+def test_array_engine_learns_like_dict_engine(make_learner):
+    dict_learning = train(make_learner, "dict")
+    array_learning = train(make_learner, "array")
+    assert array_learning.last_convergence_episode_count == dict_learning.last_convergence_episode_count
+    assert array_learning.step_count == dict_learning.step_count
+    indices = np.arange(len(dict_learning.states))
+    assert np.array_equal(array_learning.q_values(indices), dict_learning.q_values(indices))
+    assert np.array_equal(array_learning.greedy_actions(), dict_learning.greedy_actions())
+    assert array_learning.format_policy() == dict_learning.format_policy()
+
+
+def test_array_only_features_need_array_engine(make_learner):
+    with pytest.raises(ValueError):
+        make_learner(q_engine="dict", planning_steps=5)
+    with pytest.raises(ValueError):
+        make_learner(q_engine="dict", trace_decay=0.9)
+
+
+def test_sparse_engine_learns_like_dict_engine(make_learner):
+    dict_learning = train(make_learner, "dict")
+    sparse_learning = train(make_learner, "sparse")
+    assert sparse_learning.last_convergence_episode_count == dict_learning.last_convergence_episode_count
+    assert sparse_learning.step_count == dict_learning.step_count
+    indices = np.arange(len(dict_learning.states))
+    assert np.array_equal(sparse_learning.q_values(indices), dict_learning.q_values(indices))
+    assert np.array_equal(sparse_learning.greedy_actions(), dict_learning.greedy_actions())
+    assert sparse_learning.format_policy() == dict_learning.format_policy()
+
+
+def test_sparse_engine_only_allocates_visited_states(make_learner):
+    q_learning = make_learner(q_engine="sparse")
+    assert len(q_learning.q_function.row_states()) == 0
+    q_learning.q_learning_episode()
+    # every step allocates at most the row of the state it updates
+    assert 0 < len(q_learning.q_function.row_states()) <= q_learning.step_count
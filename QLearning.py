@@ -8,14 +8,46 @@ policy doesn't change in one episode you get pretty bad results, therefore
 we included a convergence threshold, which is the number of episodes
 in which the policy didn't change, after which the policy will be considered
 to have converged.
+
+Q-values only change in the states the agent visited, so after an episode only the
+greedy actions of those states are re-derived and a flag records whether any of them
+changed. This makes the convergence check independent of the size of the Gridworld.
+
+The action-value function Q can either be stored in a dictionary mapping (state, action)
+tuples to values (q_engine="dict", the default) or in a contiguous NumPy array with
+one row per state and one column per action (q_engine="array", see QTable.py).
+The latter needs considerably less memory and makes greedy action selection a single
+array operation, which matters for large Gridworlds. For huge Gridworlds of which only
+a small part is ever visited, q_engine="sparse" only allocates the rows of visited states.
+In all cases q_function[s, a] and policy[s] can be used the same way.
+
+All random decisions (starting states and exploration) are drawn from the object's own
+random number stream (see RandomStream.py), so a run can be reproduced by seeding it.
+
+Learning rate and epsilon are constant unless schedules are given (see Schedules.py), which
+set them at the start of every episode, or in case of visit count learning rates for every update.
 """
 
-import random
+import numpy as np
+
+from Checkpoint import save_checkpoint
+from Convergence import PolicyUnchanged
+import DefaultConstants as Default
+from DynaModel import DynaModel
+from EligibilityTraces import EligibilityTraces
+from PrioritizedSweeping import PrioritizedSweeping
+from QTable import ArrayQTable, ArrayPolicy, SparseQTable, SparsePolicy
+from RandomStream import as_stream
+from Schedules import VisitCounts, make_schedule
+from StateIndex import as_state_index
 
 
 class QLearning:
     def __init__(self, env_perform_action, state_list, goal_fields, obstacle_fields, actions, discount_factor,
-                 learning_rate, epsilon, convergence_threshold, decimal_places=5):
+                 learning_rate, epsilon, convergence_threshold, decimal_places=5, q_engine="dict",
+                 replay_buffer=None, planning_steps=0, sweeping_budget=0, sweeping_threshold=1e-4, seed=None,
+                 learning_rate_schedule=None, epsilon_schedule=None, trajectory_log=None, trace_decay=0,
+                 trace_cutoff=Default.TRACE_CUTOFF):
         """
         Sets up a representation of the gridworld given the following parameters.
         "Field" here refers to the letters or signs with which different states are represented.
@@ -23,6 +55,8 @@ class QLearning:
         :param env_perform_action: function of the environment which gives back tuple (reward, follow-up state)
                                    given a state and an action
         :param state_list: two-dimensional list of possible states represented as specific fields
+                           or two-dimensional NumPy array of the byte values of the fields (see GridFile.py)
+                           or StateIndex of another object to share it, e.g. MDP.state_index
         :param goal_fields: list of fields which are considered terminal states
         :param obstacle_fields: list of fields which are considered obstacles
         :param actions: list of possible movements in tuple notation, i.e. (x_coordinate_offset, y_coordinate_offset)
@@ -32,25 +66,55 @@ class QLearning:
         :param convergence_threshold: number of episodes without change of the policy for which
                                       it will be considered to have converged
         :param decimal_places: optionally change number of decimal places numbers are rounded to
+        :param q_engine: optionally change how Q is stored, either "dict", "array" or "sparse"
+        :param replay_buffer: optionally ReplayBuffer, every transition is added to it and minibatches of
+                              stored transitions are replayed (experience replay, see replay), needs the
+                              array Q engine
+        :param planning_steps: optionally number of randomly chosen observed (state, action) pairs backed up with
+                               a learned model of the environment after every real step, in addition to the
+                               pair just performed (Dyna-Q, see DynaModel.py), needs the array Q engine
+        :param sweeping_budget: optionally maximum number of prioritized model based updates after every real step
+                                (prioritized sweeping, see PrioritizedSweeping.py), needs the array Q engine
+        :param sweeping_threshold: minimum expected TD error for an update to be scheduled by prioritized sweeping
+        :param seed: optionally seed or RandomStream for the random numbers of the learner
+        :param learning_rate_schedule: optionally Schedule (or its list notation, see Schedules.py) setting the
+                                       learning rate every episode or update instead of keeping it constant,
+                                       per visit learning rates only apply to real steps, replayed updates use
+                                       learning_rate until they decay on their own, planned and swept updates
+                                       don't use any
+        :param epsilon_schedule: optionally Schedule (or its list notation) setting epsilon every episode
+        :param trajectory_log: optionally TrajectoryLog every transition is written to, e.g. for training offline
+                               with other hyperparameters later on (see TrajectoryLog.py)
+        :param trace_decay: optionally lambda of Watkins's Q(lambda), every step then also updates the recently
+                            performed (state, action) pairs (see EligibilityTraces.py), needs the array Q engine
+        :param trace_cutoff: optionally change the smallest eligibility trace which is kept
         """
 
-        # list of reachable states in (x, y) coordinate tuple notation
-        # obstacles are left out as they are not reachable by an agent
-        self.states = []
-        # list of the states considered terminal states
-        self.goal_states = []
-        # filling the two above
-        for y, line in enumerate(state_list):
-            for x, field in enumerate(line):
-                if field not in obstacle_fields:
-                    self.states.append((x, y))
-                if field in goal_fields:
-                    self.goal_states.append((x, y))
-
-        # making sure goal_states is a subset of states as they are unreachable otherwise
-        if not set(self.goal_states).issubset(self.states):
+        if q_engine not in ("dict", "array", "sparse"):
+            raise ValueError("Unknown Q engine: {}".format(q_engine))
+        if replay_buffer is not None and q_engine != "array":
+            raise ValueError("Experience replay needs the array Q engine")
+        if planning_steps and q_engine != "array":
+            raise ValueError("Dyna-Q planning needs the array Q engine")
+        if sweeping_budget and q_engine != "array":
+            raise ValueError("Prioritized sweeping needs the array Q engine")
+        if trace_decay and q_engine != "array":
+            raise ValueError("Eligibility traces need the array Q engine")
+
+        # goal states are unreachable if they are obstacles as well
+        if set(goal_fields) & set(obstacle_fields):
             raise Exception("Goal states cannot be obstacles")
 
+        # reachable states in (x, y) coordinate tuple notation, mapped to dense indices
+        # obstacles are left out as they are not reachable by an agent
+        # the StateIndex behaves like a list of the states, but checking if a state is contained is O(1)
+        self.state_index = as_state_index(state_list, obstacle_fields)
+        self.states = self.state_index
+        # entry i is True if the state with index i is a terminal state
+        self.is_goal = self.state_index.field_mask(goal_fields)
+        # set of the states considered terminal states
+        self.goal_states = {self.states[i] for i in np.nonzero(self.is_goal)[0]}
+
         # save as instance variables
         self.env_perform_action = env_perform_action
         self.actions = actions
@@ -59,33 +123,140 @@ class QLearning:
         self.epsilon = epsilon
         self.convergence_threshold = convergence_threshold
         self.decimal_places = decimal_places
+        self.q_engine = q_engine
+        self.replay_buffer = replay_buffer
+        self.trajectory_log = trajectory_log
+        self.rng = as_stream(seed)
+        self.learning_rate_schedule = make_schedule(learning_rate_schedule)
+        self.epsilon_schedule = make_schedule(epsilon_schedule)
+
+        # learned model of the environment for Dyna-Q planning and prioritized sweeping
+        self.planning_steps = planning_steps
+        # the model gets a sub-stream of its own, so planning doesn't change the random numbers of the learner
+        self.model = DynaModel(len(self.states), len(actions), seed=self.rng.spawn(1)[0]) \
+            if planning_steps or sweeping_budget else None
+        self.sweeping = PrioritizedSweeping(self, self.model, sweeping_budget, sweeping_threshold) \
+            if sweeping_budget else None
+        # active eligibility traces of Q(lambda), which decay with gamma * lambda
+        self.set_trace_decay(trace_decay, trace_cutoff)
 
         # dimensions of the Gridworld for formatting in the end
-        self.dim = (len(state_list[0]), len(state_list))
+        self.dim = self.state_index.dim
         # initialize action-value function Q
         self.reset_q_function()
-        # initialize policy
+        # initialize policy, mapping every state to the greedy action according to Q
+        if q_engine == "array":
+            self.policy = ArrayPolicy(self.state_index, self.actions)
+        elif q_engine == "sparse":
+            self.policy = SparsePolicy(self.q_function)
+        else:
+            self.policy = {}
+        # states whose Q-values changed since the last policy update (state indices for the array and sparse engine)
+        self.changed_states = set()
+        # number of states whose greedy action changed in the last policy update
+        self.policy_change_count = 0
+        # True if the last policy update changed the greedy action of any state
+        self.policy_changed = False
         self.update_policy()
         # initialize current state starting with a random state
         self.reset_current_state()
 
         # for saving the number of Q-learning episodes it took for the policy to converge
         self.last_convergence_episode_count = -1
+        # number of episodes in a row without change of the policy in the current run
+        self.policy_unchanged_count = 0
+        # name of the convergence criterion which ended the last run (see Convergence.py)
+        self.convergence_criterion = None
+        # largest absolute change of a Q-value in the current episode
+        self.max_q_delta = 0
+        # number of Q-learning steps performed in total
+        self.step_count = 0
+        self.apply_schedules()
 
 
     def reset_q_function(self):
-        """(Re)sets action-value function Q to 0"""
-        self.q_function = {(s, a): 0 for s in self.states for a in self.actions}
+        """(Re)sets action-value function Q to 0, which restarts the schedules as well"""
+        if self.q_engine == "array":
+            self.q_function = ArrayQTable(self.state_index, self.actions)
+        elif self.q_engine == "sparse":
+            self.q_function = SparseQTable(self.state_index, self.actions)
+        else:
+            self.q_function = {(s, a): 0 for s in self.states for a in self.actions}
+        # number of episodes since Q was (re)set, which the schedules depend on
+        self.episode_count = 0
+        # number of updates of every (state, action) pair, only for visit count learning rates
+        self.visit_counts = None
+        # number of replayed updates of every (state, action) pair, only with experience replay
+        self.replay_counts = None
+
+
+    def apply_schedules(self):
+        """
+        Sets learning rate and epsilon to the values of their schedules for the next episode
+        and sets up the visit counts if the learning rate depends on them.
+        """
+        if self.epsilon_schedule is not None:
+            self.epsilon = self.epsilon_schedule.value(self.episode_count)
+        schedule = self.learning_rate_schedule
+        if schedule is None or not schedule.per_visit:
+            self.visit_counts = None
+            if schedule is not None:
+                self.learning_rate = schedule.value(self.episode_count)
+        elif self.visit_counts is None:
+            self.visit_counts = VisitCounts(self.q_function, len(self.states), len(self.actions), schedule)
+        else:
+            self.visit_counts.schedule = schedule
+
+
+    def set_q_function(self, q_values):
+        """
+        Sets action-value function Q to the given values, e.g. computed by the Planner, and updates the policy.
+        :param q_values: array with one row per state, in the order of states, and one column per action
+        """
+        q_values = np.round(q_values, self.decimal_places)
+        # the counts belong to the old Q-values
+        self.visit_counts = None
+        self.replay_counts = None
+        if self.q_engine == "array":
+            self.q_function.table[:] = q_values
+        elif self.q_engine == "sparse":
+            # only states with a Q-value different from the default need a row
+            self.q_function.reset()
+            states = np.flatnonzero((q_values != self.q_function.default).any(axis=1))
+            self.q_function.assign(states, q_values[states])
+        else:
+            for i, s in enumerate(self.states):
+                for j, a in enumerate(self.actions):
+                    self.q_function[s, a] = q_values.item(i, j)
+        self.update_policy()
 
 
     def reset_current_state(self):
         """Sets current state to random (starting) state"""
-        self.current_state = random.choice(self.states)
+        self.current_state = self.rng.choice(self.states)
 
 
-    def update_policy(self):
-        """Updates policy based on current action-value function Q"""
-        self.policy = {s: max(self.actions, key=lambda a: self.q_function[s, a]) for s in self.states}
+    def update_policy(self, only_changed=False):
+        """
+        Updates policy based on current action-value function Q
+        and sets policy_change_count to the number of states whose greedy action changed.
+        :param only_changed: optionally only re-derive the greedy actions of the states
+                             whose Q-values changed since the last update
+        :return: True if the policy changed
+        """
+        if self.q_engine in ("array", "sparse"):
+            self.policy_change_count = self.policy.update(self.q_function,
+                                                          self.changed_states if only_changed else None)
+        else:
+            self.policy_change_count = 0
+            for s in self.changed_states if only_changed else self.states:
+                greedy_action = max(self.actions, key=lambda a: self.q_function[s, a])
+                if self.policy.get(s) != greedy_action:
+                    self.policy[s] = greedy_action
+                    self.policy_change_count += 1
+        self.policy_changed = self.policy_change_count > 0
+        self.changed_states.clear()
+        return self.policy_changed
 
 
     def q_learning_step(self):
@@ -94,53 +265,317 @@ class QLearning:
         and the Q-values are updated according to the feedback from the environment.
         """
 
+        if self.q_engine == "array":
+            self._array_q_learning_step()
+            return
+        if self.q_engine == "sparse":
+            self._sparse_q_learning_step()
+            return
+
         s = self.current_state  # for readability
         # epsilon-soft policy: choose random action (including greedy action) with probability epsilon
-        if random.random() < self.epsilon:
-            a = random.choice(self.actions)
+        if self.rng.random() < self.epsilon:
+            a = self.rng.choice(self.actions)
         # with probability 1 - epsilon choose greedy action
         else:
             a = max(self.actions, key=lambda a_: self.q_function[s, a_])
         # perform action and observe reward and follow-up state from environment
         r, s_prime = self.env_perform_action(s, a)
+        if self.trajectory_log is not None:
+            self.trajectory_log.add(self.state_index.index(s), self.actions.index(a), r,
+                                    self.state_index.index(s_prime))
         # perform q_function update
         if s not in self.goal_states:
             greedy_q = max(self.q_function[s_prime, a_prime] for a_prime in self.actions)
         else:
             greedy_q = 0  # if current state is a goal state future reward will always be 0
-        updated_q = self.q_function[s, a] + self.learning_rate * (r + self.discount_factor * greedy_q - self.q_function[s, a])
-        self.q_function[s, a] = round(updated_q, self.decimal_places)
+        old_q = self.q_function[s, a]
+        if self.visit_counts is None:
+            alpha = self.learning_rate
+        else:
+            alpha = self.visit_counts.step_size(self.state_index.index(s), self.actions.index(a))
+        updated_q = round(old_q + alpha * (r + self.discount_factor * greedy_q - old_q), self.decimal_places)
+        self.q_function[s, a] = updated_q
+        if abs(updated_q - old_q) > self.max_q_delta:
+            self.max_q_delta = abs(updated_q - old_q)
+        self.changed_states.add(s)
+        # set new current state
+        self.current_state = s_prime
+
+
+    def _array_q_learning_step(self):
+        """
+        Same as q_learning_step, but working on the rows of the array Q-table.
+        """
+
+        s = self.current_state  # for readability
+        q = self.q_function.table
+        i = self.state_index.index(s)
+        # epsilon-soft policy: choose random action (including greedy action) with probability epsilon
+        exploratory = False
+        if self.rng.random() < self.epsilon:
+            j = self.rng.randrange(len(self.actions))
+            # the random action might be a greedy one after all
+            exploratory = self.traces is not None and q.item(i, j) < q[i].max()
+        # with probability 1 - epsilon choose greedy action, argmax breaks ties like max() does
+        else:
+            j = int(q[i].argmax())
+        # perform action and observe reward and follow-up state from environment
+        r, s_prime = self.env_perform_action(s, self.actions[j])
+        i_prime = self.state_index.index(s_prime)
+        if self.trajectory_log is not None:
+            self.trajectory_log.add(i, j, r, i_prime)
+        # perform q_function update
+        if not self.is_goal[i]:
+            greedy_q = q[i_prime].max()
+        else:
+            greedy_q = 0  # if current state is a goal state future reward will always be 0
+        old_q = q.item(i, j)
+        alpha = self.learning_rate if self.visit_counts is None else self.visit_counts.step_size(i, j)
+        if self.traces is not None:
+            # Watkins's Q(lambda): after an exploratory action the earlier pairs didn't lead here greedily
+            if exploratory:
+                self.traces.clear()
+            self.traces.visit(i, j)
+            states = self.traces.update(q, alpha * (r + self.discount_factor * greedy_q - old_q), self.decimal_places)
+            self.traces.decay_traces(self.discount_factor)
+            # the performed pair has the largest trace, so its Q-value changed the most
+            if abs(q.item(i, j) - old_q) > self.max_q_delta:
+                self.max_q_delta = abs(q.item(i, j) - old_q)
+            self.changed_states.update(states.tolist())
+        else:
+            updated_q = round(float(old_q + alpha * (r + self.discount_factor * greedy_q - old_q)),
+                              self.decimal_places)
+            q[i, j] = updated_q
+            if abs(updated_q - old_q) > self.max_q_delta:
+                self.max_q_delta = abs(updated_q - old_q)
+            self.changed_states.add(i)
+        # experience replay: store transition and replay a minibatch of stored ones
+        if self.replay_buffer is not None:
+            self.replay_buffer.add(i, j, r, i_prime)
+            if self.replay_buffer.ready():
+                self.replay()
+        # Dyna-Q: learn the model from the transition and back up the pair just performed and others with it
+        if self.model is not None:
+            self.model.observe(i, j, r, i_prime)
+            if self.planning_steps:
+                s_planned, a_planned = self.model.sample_pairs(self.planning_steps)
+                self.model_backup(np.append(s_planned, i), np.append(a_planned, j))
+        # prioritized sweeping: schedule and perform the most urgent model based updates
+        if self.sweeping is not None:
+            self.sweeping.observe(i, j, i_prime)
+            self.sweeping.sweep()
         # set new current state
         self.current_state = s_prime
 
 
+    def _sparse_q_learning_step(self):
+        """
+        Same as q_learning_step, but working on the rows of the sparse Q-table.
+        """
+
+        s = self.current_state  # for readability
+        q = self.q_function
+        i = self.state_index.index(s)
+        # epsilon-soft policy: choose random action (including greedy action) with probability epsilon
+        if self.rng.random() < self.epsilon:
+            j = self.rng.randrange(len(self.actions))
+        # with probability 1 - epsilon choose greedy action, argmax breaks ties like max() does
+        else:
+            j = int(q.row(i).argmax())
+        # perform action and observe reward and follow-up state from environment
+        r, s_prime = self.env_perform_action(s, self.actions[j])
+        i_prime = self.state_index.index(s_prime)
+        if self.trajectory_log is not None:
+            self.trajectory_log.add(i, j, r, i_prime)
+        # perform q_function update, which allocates the row of s if it has none yet
+        if not self.is_goal[i]:
+            greedy_q = q.row(i_prime).max()
+        else:
+            greedy_q = 0  # if current state is a goal state future reward will always be 0
+        row = q.allocate(i)
+        old_q = row.item(j)
+        alpha = self.learning_rate if self.visit_counts is None else self.visit_counts.step_size(i, j)
+        updated_q = round(float(old_q + alpha * (r + self.discount_factor * greedy_q - old_q)), self.decimal_places)
+        row[j] = updated_q
+        if abs(updated_q - old_q) > self.max_q_delta:
+            self.max_q_delta = abs(updated_q - old_q)
+        self.changed_states.add(i)
+        # set new current state
+        self.current_state = s_prime
+
+
+    def batch_update(self, s, a, r, s_prime, learning_rates=None):
+        """
+        Performs the Q-learning update for a batch of transitions at once (array Q engine only).
+        If a (state, action) pair occurs more than once, only one of its updates is kept.
+        :param s: array of state indices
+        :param a: array of action indices
+        :param r: array of immediate rewards
+        :param s_prime: array of follow-up state indices
+        :param learning_rates: optionally array of the learning rate of every transition, learning_rate by default
+        """
+        q = self.q_function.table
+        alpha = self.learning_rate if learning_rates is None else learning_rates
+        # if a state is a goal state future reward will always be 0
+        greedy_q = np.where(self.is_goal[s], 0, q[s_prime].max(axis=1))
+        old_q = q[s, a]
+        updated_q = np.round(old_q + alpha * (r + self.discount_factor * greedy_q - old_q), self.decimal_places)
+        q[s, a] = updated_q
+        if len(s):
+            self.max_q_delta = max(self.max_q_delta, float(np.abs(updated_q - old_q).max()))
+        self.changed_states.update(s.tolist())
+
+
+    def replay(self):
+        """
+        Replays a minibatch of stored transitions (experience replay, array Q engine only).
+        Every stored transition is replayed many times, and at a constant learning rate the Q-value of a pair
+        would keep jumping towards whichever of its sampled transitions came last, so the greedy action of states
+        whose best actions are almost equally good would never stop changing. A pair replayed n times is therefore
+        updated with the learning rate 1 / n^REPLAY_EXPONENT once that is lower, which settles its Q-value
+        at the mean target of its stored transitions.
+        """
+        s, a, r, s_prime = self.replay_buffer.sample()
+        if self.replay_counts is None:
+            self.replay_counts = np.zeros((len(self.states), len(self.actions)), dtype=np.uint32)
+        # like the update, a pair occurring more than once in the minibatch is only counted once
+        self.replay_counts[s, a] += 1
+        learning_rates = np.minimum(self.learning_rate, self.replay_counts[s, a] ** -Default.REPLAY_EXPONENT)
+        self.batch_update(s, a, r, s_prime, learning_rates)
+
+
+    def model_backup(self, s, a):
+        """
+        Sets the Q-values of the given pairs to their expected Q-learning targets according to the learned model
+        of the environment (full backups, array Q engine only). As the model averages all outcomes observed so far,
+        no learning rate is needed.
+        :param s: array of state indices
+        :param a: array of action indices
+        """
+        q = self.q_function.table
+        old_q = q[s, a]
+        updated_q = np.round(self.model.expected_targets(q, s, a, self.is_goal, self.discount_factor),
+                             self.decimal_places)
+        q[s, a] = updated_q
+        if len(s):
+            self.max_q_delta = max(self.max_q_delta, float(np.abs(updated_q - old_q).max()))
+        self.changed_states.update(s.tolist())
+
+
+    def set_trace_decay(self, trace_decay, trace_cutoff=Default.TRACE_CUTOFF):
+        """
+        Switches between one-step Q-learning and Q(lambda), discarding the current eligibility traces.
+        :param trace_decay: lambda of Watkins's Q(lambda), 0 for one-step Q-learning
+        :param trace_cutoff: optionally change the smallest eligibility trace which is kept
+        """
+        if trace_decay and self.q_engine != "array":
+            raise ValueError("Eligibility traces need the array Q engine")
+        self.trace_decay = trace_decay
+        self.trace_cutoff = trace_cutoff
+        self.traces = EligibilityTraces(trace_decay, trace_cutoff) if trace_decay else None
+
+
     def q_learning_episode(self):
         """
         Performs Q-learning steps until an action is performed in a terminal state and then updates the policy.
         """
         self.reset_current_state()
+        self.apply_schedules()
+        if self.traces is not None:
+            self.traces.clear()
+        self.max_q_delta = 0
+        steps = 1
         while self.current_state not in self.goal_states:
             self.q_learning_step()
+            steps += 1
         self.q_learning_step()  # necessary to observe reward from goal state
-        self.update_policy()
+        self.step_count += steps
+        self.episode_count += 1
+        self.update_policy(only_changed=True)
 
 
-    def q_learning_until_convergence(self):
+    def converged(self, criteria):
+        """
+        :param criteria: list of convergence criteria (see Convergence.py)
+        :return: True if any of the criteria is met, its name is saved in convergence_criterion
+        """
+        for criterion in criteria:
+            if criterion.converged(self):
+                self.convergence_criterion = criterion.name
+                return True
+        return False
+
+
+    def q_learning_until_convergence(self, resume=False, checkpoint_file=None, checkpoint_interval=1000,
+                                     criteria=None, episode_callback=None):
         """
         Performs Q-learning episodes until the policy hasn't changed
-        for a given number of episodes (i.e. it has converged)
+        for a given number of episodes (i.e. it has converged) or until any of the given criteria is met
+        :param resume: optionally continue the counts of a previous run, e.g. after loading a checkpoint
+        :param checkpoint_file: optionally save a checkpoint (see Checkpoint.py) to this file
+                                periodically and after convergence
+        :param checkpoint_interval: number of episodes between two checkpoints
+        :param criteria: optionally list of convergence criteria (see Convergence.py),
+                         PolicyUnchanged with the convergence threshold by default
+        :param episode_callback: optionally function called with the QLearning object after every episode,
+                                 e.g. to publish the policy (see PolicyServer.py)
         """
 
-        self.last_convergence_episode_count = 0
-        policy_unchanged_count = 0
-        while policy_unchanged_count < self.convergence_threshold:
-            old_policy = self.policy.copy()
+        if criteria is None:
+            criteria = [PolicyUnchanged()]
+        if not resume:
+            self.last_convergence_episode_count = 0
+            self.policy_unchanged_count = 0
+        self.convergence_criterion = None
+        for criterion in criteria:
+            criterion.start(self)
+        while not self.converged(criteria):
             self.q_learning_episode()
             self.last_convergence_episode_count += 1
-            if old_policy == self.policy:
-                policy_unchanged_count += 1
+            if not self.policy_changed:
+                self.policy_unchanged_count += 1
             else:
-                policy_unchanged_count = 0
+                self.policy_unchanged_count = 0
+            for criterion in criteria:
+                criterion.update(self)
+            if episode_callback is not None:
+                episode_callback(self)
+            if checkpoint_file is not None and self.last_convergence_episode_count % checkpoint_interval == 0:
+                save_checkpoint(self, checkpoint_file)
+        if checkpoint_file is not None:
+            save_checkpoint(self, checkpoint_file)
+
+
+    def greedy_actions(self, indices=None):
+        """
+        :param indices: optionally array of state indices, all states by default
+        :return: array of the index of the action chosen by the policy in every (given) state, in the order of states
+        """
+        if indices is not None:
+            if self.q_engine in ("array", "sparse"):
+                return self.policy.take(indices).astype(np.int64)
+            return np.array([self.actions.index(self.policy[self.states[i]]) for i in indices.tolist()],
+                            dtype=np.int64)
+        if self.q_engine == "array":
+            return self.policy.greedy
+        if self.q_engine == "sparse":
+            greedy = np.zeros(len(self.states), dtype=np.int64)
+            greedy[self.q_function.row_states()] = self.policy.greedy()
+            return greedy
+        return np.array([self.actions.index(self.policy[s]) for s in self.states], dtype=np.int64)
+
+
+    def q_values(self, indices):
+        """
+        Reads the Q-values of some states straight from the storage of the engine.
+        :param indices: array of state indices
+        :return: array with one row of Q-values per given state and one column per action
+        """
+        if self.q_engine in ("array", "sparse"):
+            return np.asarray(self.q_function.take(indices), dtype=np.float64)
+        return np.array([[self.q_function[self.states[i], a] for a in self.actions] for i in indices.tolist()],
+                        dtype=np.float64).reshape(-1, len(self.actions))
 
 
     def format_q_function(self):
@@ -45,4 +45,4 @@ print("Current state:", current_state)"""
 qlearning.q_learning_until_convergence()
 print(*qlearning.format_q_function())
 print("Nr. of iterations:", qlearning.last_convergence_episode_count)
-Gridworld.print_policy(qlearning.format_policy())
+Gridworld.print_policy(qlearning)
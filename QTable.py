@@ -0,0 +1,413 @@
+"""
+Array based storage for the action-value function Q and the policy derived from it.
+
+The ArrayQTable stores Q in a contiguous (number of states x number of actions) NumPy array,
+states and actions being mapped to dense integer indices, so greedy action selection and
+the maximum in the TD update are operations on a single array row.
+The ArrayPolicy stores the index of the greedy action for every state in a NumPy array.
+
+The SparseQTable and SparsePolicy do the same for Gridworlds too large to store a row for
+every state, of which the agent only ever visits a small part. A row is only allocated when
+a Q-value of the state is written for the first time, until then a default value stands in
+for all its Q-values. Rows are allocated in blocks of a fixed number of rows, so memory grows
+with the visited region in a few large allocations and existing rows are never copied.
+The only array with one entry per state is the one mapping states to rows (4 bytes each).
+Only the learner's memory scales with the visited states this way: the StateIndex and the transition
+table of the MDP (see StateIndex.py and MDP.py) are still built for the whole Gridworld, about 70 bytes
+per state, against about 40 bytes per state of the array Q engine which the sparse one saves.
+
+All of them behave like the dictionaries QLearning used before, i.e. q_function[s, a] and policy[s]
+still work, so code like format_q_function, format_policy and the Gridworld menu doesn't
+need to know which storage is used.
+"""
+
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+
+
+class QTable(MutableMapping):
+    """
+    Dictionary-like access to Q-values stored by state and action index, shared by the Q-tables below.
+    Subclasses provide __getitem__ and __setitem__.
+    """
+
+    def __init__(self, state_index, actions):
+        """
+        :param state_index: StateIndex of the Gridworld
+        :param actions: list of possible movements in tuple notation
+        """
+        self.state_index = state_index
+        self.actions = actions
+        self.action_index = {a: j for j, a in enumerate(actions)}
+
+
+    def _indices(self, key):
+        s, a = key
+        i = self.state_index.find(s)
+        j = self.action_index.get(a)
+        if i < 0 or j is None:
+            raise KeyError(key)
+        return i, j
+
+
+    def __delitem__(self, key):
+        raise TypeError("Entries of a Q-table cannot be deleted")
+
+
+    def __contains__(self, key):
+        try:
+            self._indices(key)
+        except (KeyError, TypeError, ValueError):
+            return False
+        return True
+
+
+    def __iter__(self):
+        return ((s, a) for s in self.state_index for a in self.actions)
+
+
+    def __len__(self):
+        return len(self.state_index) * len(self.actions)
+
+
+    def copy(self):
+        """:return: independent dictionary copy of the Q-values"""
+        return dict(self.items())
+
+
+class ArrayQTable(QTable):
+    def __init__(self, state_index, actions, dtype=np.float64):
+        """
+        Creates a Q-table with all values set to 0.
+        :param state_index: StateIndex of the Gridworld
+        :param actions: list of possible movements in tuple notation
+        :param dtype: optionally change NumPy data type of the Q-values
+        """
+        super().__init__(state_index, actions)
+        # row i contains the Q-values of state i, column j those of action j
+        self.table = np.zeros((len(state_index), len(actions)), dtype=dtype)
+
+
+    def reset(self):
+        """(Re)sets all Q-values to 0"""
+        self.table.fill(0)
+
+
+    def take(self, indices):
+        """
+        :param indices: array of state indices
+        :return: array with one row of Q-values per given state
+        """
+        return self.table[indices]
+
+
+    def __getitem__(self, key):
+        i, j = self._indices(key)
+        return float(self.table[i, j])
+
+
+    def __setitem__(self, key, value):
+        i, j = self._indices(key)
+        self.table[i, j] = value
+
+
+class SparseQTable(QTable):
+    def __init__(self, state_index, actions, default=0, block_size=1024, dtype=np.float64):
+        """
+        Creates a Q-table without any rows, i.e. with all values set to the default.
+        :param state_index: StateIndex of the Gridworld
+        :param actions: list of possible movements in tuple notation
+        :param default: optionally change the Q-value of states without row
+        :param block_size: optionally change the number of rows allocated at once
+        :param dtype: optionally change NumPy data type of the Q-values
+        """
+        super().__init__(state_index, actions)
+        self.default = default
+        self.block_size = block_size
+        self.dtype = dtype
+        # stands in for the row of every state without one, read-only so it can't be changed by accident
+        self.default_row = np.full(len(actions), default, dtype=dtype)
+        self.default_row.flags.writeable = False
+        self.reset()
+
+
+    def reset(self):
+        """(Re)sets all Q-values to the default, freeing all rows"""
+        # entry i is the number of the row of state i, -1 if it has none
+        self.row_numbers = np.full(len(self.state_index), -1, dtype=np.int32)
+        # row r is row r % block_size of block r // block_size
+        self.blocks = []
+        self.row_count = 0
+
+
+    def row(self, i):
+        """
+        :param i: index of the state
+        :return: array of the Q-values of the state, don't write to it (see allocate)
+        """
+        r = self.row_numbers.item(i)
+        if r < 0:
+            return self.default_row
+        return self.blocks[r // self.block_size][r % self.block_size]
+
+
+    def allocate(self, i):
+        """
+        :param i: index of the state
+        :return: writable array of the Q-values of the state, its row is allocated if it has none yet
+        """
+        r = self.row_numbers.item(i)
+        if r < 0:
+            r = self.row_count
+            if r == len(self.blocks) * self.block_size:
+                self.blocks.append(np.full((self.block_size, len(self.actions)), self.default, dtype=self.dtype))
+            self.row_numbers[i] = r
+            self.row_count += 1
+        return self.blocks[r // self.block_size][r % self.block_size]
+
+
+    def row_states(self):
+        """:return: array of the indices of the states with row, in the order of their rows"""
+        states = np.flatnonzero(self.row_numbers >= 0)
+        ordered_states = np.empty(self.row_count, dtype=np.int64)
+        ordered_states[self.row_numbers[states]] = states
+        return ordered_states
+
+
+    def rows(self):
+        """
+        :return: tuple of array of the indices of the states with row, in the order of their rows,
+                 and array of the Q-values of the rows
+        """
+        ordered_states = self.row_states()
+        if not self.blocks:
+            return ordered_states, np.empty((0, len(self.actions)), dtype=self.dtype)
+        return ordered_states, np.concatenate(self.blocks)[:self.row_count]
+
+
+    def assign(self, states, q_values):
+        """
+        Sets the Q-values of the given states, allocating rows in the given order.
+        :param states: array of state indices
+        :param q_values: array with one row of Q-values per state
+        """
+        for i, values in zip(states.tolist(), q_values):
+            self.allocate(i)[:] = values
+
+
+    def take(self, indices):
+        """
+        :param indices: array of state indices
+        :return: array with one row of Q-values per given state, the default for states without row
+        """
+        rows = self.row_numbers[indices]
+        q_values = np.full((len(rows), len(self.actions)), self.default, dtype=self.dtype)
+        allocated = np.flatnonzero(rows >= 0)
+        blocks, positions = np.divmod(rows[allocated], self.block_size)
+        # one gather per block, no matter how many of the given states are in it
+        for b in np.unique(blocks).tolist():
+            in_block = blocks == b
+            q_values[allocated[in_block]] = self.blocks[b][positions[in_block]]
+        return q_values
+
+
+    @property
+    def nbytes(self):
+        """:return: number of bytes used by the rows and the mapping of states to rows"""
+        return self.row_numbers.nbytes + sum(block.nbytes for block in self.blocks)
+
+
+    def __getitem__(self, key):
+        i, j = self._indices(key)
+        return float(self.row(i)[j])
+
+
+    def __setitem__(self, key, value):
+        i, j = self._indices(key)
+        self.allocate(i)[j] = value
+
+
+class ArrayPolicy(Mapping):
+    def __init__(self, state_index, actions, greedy=None):
+        """
+        Creates a policy choosing the first action in every state.
+        :param state_index: StateIndex of the Gridworld
+        :param actions: list of possible movements in tuple notation
+        :param greedy: optionally an array containing the index of the chosen action for every state
+        """
+        self.state_index = state_index
+        self.actions = actions
+        if greedy is None:
+            greedy = np.zeros(len(state_index), dtype=np.int64)
+        # entry i is the index of the action chosen in state i
+        self.greedy = greedy
+
+
+    def update(self, q_table, rows=None):
+        """
+        Sets the policy to the greedy actions of the given Q-table.
+        Ties are broken in favor of the first action, like max() does.
+        :param q_table: ArrayQTable to derive the policy from
+        :param rows: optionally collection of state indices, only their greedy actions are re-derived
+        :return: number of states whose greedy action changed
+        """
+        if rows is None:
+            greedy = q_table.table.argmax(axis=1)
+            changed = int(np.count_nonzero(greedy != self.greedy))
+            self.greedy[:] = greedy
+            return changed
+        rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        greedy = q_table.table[rows].argmax(axis=1)
+        changed = int(np.count_nonzero(greedy != self.greedy[rows]))
+        self.greedy[rows] = greedy
+        return changed
+
+
+    def take(self, indices):
+        """
+        :param indices: array of state indices
+        :return: array of the index of the chosen action for every given state
+        """
+        return self.greedy[indices]
+
+
+    def __getitem__(self, s):
+        i = self.state_index.find(s)
+        if i < 0:
+            raise KeyError(s)
+        return self.actions[self.greedy[i]]
+
+
+    def __iter__(self):
+        return iter(self.state_index)
+
+
+    def __len__(self):
+        return len(self.greedy)
+
+
+    def __eq__(self, other):
+        if isinstance(other, ArrayPolicy):
+            return self.actions == other.actions and np.array_equal(self.greedy, other.greedy)
+        return super().__eq__(other)
+
+
+    def copy(self):
+        """:return: independent copy of the policy"""
+        return ArrayPolicy(self.state_index, self.actions, self.greedy.copy())
+
+
+class SparsePolicy(Mapping):
+    def __init__(self, q_table):
+        """
+        Creates a policy choosing the first action in every state, storing the chosen action
+        only for the states with a row in the given SparseQTable.
+        :param q_table: SparseQTable the policy is derived from
+        """
+        self.q_table = q_table
+        self.state_index = q_table.state_index
+        self.actions = q_table.actions
+        # index of the action chosen in the state of row r of the Q-table, in blocks like the Q-values
+        self.blocks = []
+
+
+    def update(self, q_table, rows=None):
+        """
+        Sets the policy to the greedy actions of the given Q-table.
+        Ties are broken in favor of the first action, like max() does, which is also the action
+        chosen in states without row.
+        :param q_table: SparseQTable to derive the policy from
+        :param rows: optionally collection of state indices, only their greedy actions are re-derived
+        :return: number of states whose greedy action changed
+        """
+        changed = 0
+        if rows is None or q_table is not self.q_table:
+            # after a reset the rows belong to different states, so start over
+            if q_table is not self.q_table:
+                self.q_table = q_table
+                self.blocks = []
+            for b, q_block in enumerate(q_table.blocks):
+                greedy = q_block.argmax(axis=1).astype(np.uint8)
+                if b < len(self.blocks):
+                    changed += int(np.count_nonzero(greedy != self.blocks[b]))
+                    self.blocks[b][:] = greedy
+                else:
+                    changed += int(np.count_nonzero(greedy))
+                    self.blocks.append(greedy)
+            return changed
+
+        while len(self.blocks) < len(q_table.blocks):
+            self.blocks.append(np.zeros(q_table.block_size, dtype=np.uint8))
+        block_size = q_table.block_size
+        for i in rows:
+            r = q_table.row_numbers.item(i)
+            if r < 0:
+                continue
+            b, k = divmod(r, block_size)
+            greedy = int(q_table.blocks[b][k].argmax())
+            if greedy != self.blocks[b].item(k):
+                self.blocks[b][k] = greedy
+                changed += 1
+        return changed
+
+
+    def greedy(self):
+        """:return: array of the index of the chosen action for every row of the Q-table, in row order"""
+        row_count = self.q_table.row_count
+        greedy = np.zeros(row_count, dtype=np.uint8)
+        if self.blocks:
+            filled = np.concatenate(self.blocks)[:row_count]
+            greedy[:len(filled)] = filled
+        return greedy
+
+
+    def assign(self, q_table, greedy):
+        """
+        Sets the chosen actions of all rows of the given Q-table.
+        :param q_table: SparseQTable the policy belongs to
+        :param greedy: array of the index of the chosen action for every row of the Q-table, in row order
+        """
+        self.q_table = q_table
+        self.blocks = []
+        block_size = self.q_table.block_size
+        for start in range(0, len(self.q_table.blocks) * block_size, block_size):
+            block = np.zeros(block_size, dtype=np.uint8)
+            part = greedy[start:start + block_size]
+            block[:len(part)] = part
+            self.blocks.append(block)
+
+
+    def take(self, indices):
+        """
+        :param indices: array of state indices
+        :return: array of the index of the chosen action for every given state, 0 for states without row
+        """
+        rows = self.q_table.row_numbers[indices]
+        greedy = np.zeros(len(rows), dtype=np.uint8)
+        allocated = np.flatnonzero(rows >= 0)
+        blocks, positions = np.divmod(rows[allocated], self.q_table.block_size)
+        for b in np.unique(blocks).tolist():
+            if b < len(self.blocks):
+                in_block = blocks == b
+                greedy[allocated[in_block]] = self.blocks[b][positions[in_block]]
+        return greedy
+
+
+    def __getitem__(self, s):
+        i = self.state_index.find(s)
+        if i < 0:
+            raise KeyError(s)
+        r = self.q_table.row_numbers.item(i)
+        b = r // self.q_table.block_size
+        if r < 0 or b >= len(self.blocks):
+            return self.actions[0]
+        return self.actions[self.blocks[b].item(r % self.q_table.block_size)]
+
+
+    def __iter__(self):
+        return iter(self.state_index)
+
+
+    def __len__(self):
+        return len(self.state_index)
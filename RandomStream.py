@@ -0,0 +1,101 @@
+"""
+This RandomStream class is the source of random numbers of one learner or environment.
+
+Every QLearning and MDP object has its own stream instead of sharing Python's global random
+number generator, so runs can be reproduced by seeding them, no matter which other objects
+draw random numbers in the same process or thread.
+
+Single random numbers are needed once or twice per step. Drawing each of them from a NumPy generator
+costs about a microsecond, and handing them out of pre-drawn NumPy blocks still costs more per number than
+Python's own Mersenne Twister (about 130 ns against 80 ns per call to random()). random(), randrange()
+and choice() therefore use a random.Random of the stream, while arrays of random numbers
+(e.g. for BatchMDP) are drawn from a NumPy generator of the stream. Both are seeded from the same seed.
+
+Independent sub-streams for parallel workers or helper objects (e.g. the model of Dyna-Q)
+are derived with spawn, which uses NumPy's SeedSequence, so they don't overlap even though
+they all come from one seed:
+
+    environment_stream, learner_stream = RandomStream(seed).spawn(2)
+"""
+
+import random
+
+import numpy as np
+
+
+def as_stream(seed):
+    """
+    :param seed: RandomStream, None for a random seed, integer or numpy.random.SeedSequence
+    :return: the given RandomStream or a new one seeded with the given seed
+    """
+    return seed if isinstance(seed, RandomStream) else RandomStream(seed)
+
+
+class RandomStream:
+    def __init__(self, seed=None):
+        """
+        :param seed: optionally integer or numpy.random.SeedSequence, a random seed is used by default
+        """
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        # for arrays of random numbers
+        self.generator = np.random.Generator(np.random.PCG64(self.seed_sequence))
+        # for single random numbers, seeded with the first 624 words of the seed sequence's state
+        self.python_random = random.Random(int.from_bytes(self.seed_sequence.generate_state(624).tobytes(), "little"))
+        # random float in [0, 1), bound directly so a call doesn't go through any Python code
+        self.random = self.python_random.random
+
+
+    def randrange(self, n):
+        """
+        :param n: number of possible values
+        :return: random integer in [0, n)
+        """
+        return int(self.random() * n)
+
+
+    def choice(self, sequence):
+        """
+        :param sequence: non-empty sequence
+        :return: random element of the sequence
+        """
+        return sequence[self.randrange(len(sequence))]
+
+
+    def spawn(self, count):
+        """
+        :param count: number of sub-streams
+        :return: list of independent RandomStreams derived from this one
+        """
+        return [RandomStream(seed_sequence) for seed_sequence in self.seed_sequence.spawn(count)]
+
+
+    def getstate(self):
+        """
+        :return: JSON serializable dictionary describing the state of the stream
+        """
+        version, internal_state, gauss_next = self.python_random.getstate()
+        return {"python_state": [version, list(internal_state), gauss_next],
+                "generator_state": self.generator.bit_generator.state}
+
+
+    def setstate(self, state):
+        """
+        Restores the state of the stream.
+        :param state: dictionary returned by getstate
+        """
+        version, internal_state, gauss_next = state["python_state"]
+        self.python_random.setstate((version, tuple(internal_state), gauss_next))
+        self.generator.bit_generator.state = state["generator_state"]
+
+
+    def __getstate__(self):
+        # for pickling, e.g. when an MDP is sent to a worker process, the bound method can't be pickled
+        return {"seed_sequence": self.seed_sequence, "state": self.getstate()}
+
+
+    def __setstate__(self, state):
+        self.__init__(state["seed_sequence"])
+        self.setstate(state["state"])
@@ -0,0 +1,203 @@
+"""
+Renders the Gridworld, the Q-function and the policy as text for printing them in Gridworld.py.
+
+Every frame is built as a list of lines and joined into one string, which is then written at once
+instead of printing every field on its own. Q-values and chosen actions of all shown states are read
+at once straight from the storage of the Q-learning engine (see QLearning.q_values and
+QLearning.greedy_actions), without building nested lists of the whole Gridworld first.
+
+Gridworlds too large to be shown field by field can be shown through a viewport, i.e. a window
+(x, y, width, height) of the Gridworld, or as a downsampled summary in which every character stands
+for a square block of fields: on the left its shade shows the mean state value max_a Q(s, a) of the
+block, on the right the arrow shows the action chosen in most states of the block.
+"""
+
+import numpy as np
+
+import DefaultConstants as Default
+
+
+def fits(dim, size=Default.VIEWPORT_SIZE):
+    """
+    :param dim: dimensions of the Gridworld as (width, height)
+    :param size: (width, height) of the largest Gridworld to be shown field by field
+    :return: True if the whole Gridworld can be shown field by field
+    """
+    return dim[0] <= size[0] and dim[1] <= size[1]
+
+
+def clip_window(dim, window=None):
+    """
+    :param dim: dimensions of the Gridworld as (width, height)
+    :param window: optionally (x, y, width, height) of the part to show, the whole Gridworld by default
+    :return: (x, y, width, height) of the window, cut to the part inside the Gridworld
+    """
+    if window is None:
+        return 0, 0, dim[0], dim[1]
+    x, y, width, height = window
+    x = min(max(x, 0), dim[0])
+    y = min(max(y, 0), dim[1])
+    return x, y, max(min(width, dim[0] - x), 0), max(min(height, dim[1] - y), 0)
+
+
+def window_around(dim, state, size=Default.VIEWPORT_SIZE):
+    """
+    :param dim: dimensions of the Gridworld as (width, height)
+    :param state: state in (x, y) coordinate tuple notation the window is centered on
+    :param size: (width, height) of the window
+    :return: (x, y, width, height) of the window, moved inside the Gridworld where necessary
+    """
+    width, height = min(size[0], dim[0]), min(size[1], dim[1])
+    x = min(max(state[0] - width // 2, 0), dim[0] - width)
+    y = min(max(state[1] - height // 2, 0), dim[1] - height)
+    return x, y, width, height
+
+
+def window_indices(state_index, window):
+    """
+    :param state_index: StateIndex of the Gridworld
+    :param window: (x, y, width, height) inside the Gridworld
+    :return: two-dimensional array of the state indices of the fields in the window, -1 for obstacles
+    """
+    x, y, width, height = window
+    return state_index.index_grid[y:y + height, x:x + width]
+
+
+def render_gridworld(gridworld, window=None, field_mapping=Default.FIELD_MAPPING, boundary_char=Default.BOUNDARY_CHAR):
+    """
+    :param gridworld: nested list of characters or array of field byte values (see GridFile.py)
+    :param window: optionally (x, y, width, height) of the part to show, the whole Gridworld by default
+    :param field_mapping: dictionary mapping field characters to more distinct characters
+    :param boundary_char: character for the boundary of the Gridworld
+    :return: the Gridworld in a readable way as string
+    """
+    x, y, width, height = clip_window((len(gridworld[0]), len(gridworld)), window)
+    if isinstance(gridworld, np.ndarray):
+        # the characters of all byte values, so a line is mapped with a single call
+        characters = [field_mapping.get(chr(code), "?") + " " for code in range(256)]
+        fields = ("".join(map(characters.__getitem__, line.tolist()))
+                  for line in gridworld[y:y + height, x:x + width])
+    else:
+        fields = ("".join(field_mapping[char] + " " for char in line[x:x + width])
+                  for line in gridworld[y:y + height])
+    # 2 * because of the spaces in between, + 2 because of the side boundaries
+    lines = [boundary_char * (2 * width + 2)]
+    lines.extend(boundary_char + line + boundary_char for line in fields)
+    lines.append(boundary_char * (2 * width + 2))
+    return "\n".join(lines)
+
+
+def policy_lines(q_learning, window=None, action_mapping=Default.ACTION_MAPPING, separator=" "):
+    """
+    :param q_learning: QLearning object of any engine
+    :param window: optionally (x, y, width, height) of the part to show, the whole Gridworld by default
+    :param action_mapping: dictionary mapping actions to readable characters like arrows, (0, 0) being used for obstacles
+    :param separator: optionally change the string between the characters of a line
+    :return: list with one string per line of the window, containing the characters of the chosen actions
+    """
+    window = clip_window(q_learning.dim, window)
+    indices = window_indices(q_learning.state_index, window)
+    # the last character is the one of obstacles, chosen by the index -1
+    characters = [action_mapping[a] for a in q_learning.actions] + [action_mapping[(0, 0)]]
+    greedy = np.full(indices.shape, -1, dtype=np.int64)
+    is_state = indices >= 0
+    greedy[is_state] = q_learning.greedy_actions(indices[is_state])
+    return [separator.join(map(characters.__getitem__, line)) for line in greedy.tolist()]
+
+
+def render_policy(q_learning, window=None, action_mapping=Default.ACTION_MAPPING):
+    """
+    :param q_learning: QLearning object of any engine
+    :param window: optionally (x, y, width, height) of the part to show, the whole Gridworld by default
+    :param action_mapping: dictionary mapping actions to readable characters like arrows
+    :return: the actions according to the policy in a visual way as string
+    """
+    return "\n".join(" " + line + " " for line in policy_lines(q_learning, window, action_mapping))
+
+
+def render_q_function(q_learning, window=None, number_padding=5):
+    """
+    :param q_learning: QLearning object of any engine, with the actions up, right, down and left
+    :param window: optionally (x, y, width, height) of the part to show, the whole Gridworld by default
+    :param number_padding: optionally specify different padding between numbers
+    :return: the Q-function values with appropriate spaces and alignment as string
+    """
+    window = clip_window(q_learning.dim, window)
+    indices = window_indices(q_learning.state_index, window)
+    # obstacles are shown with Q-values of 0
+    q_values = np.zeros(indices.shape + (len(q_learning.actions),))
+    is_state = indices >= 0
+    q_values[is_state] = q_learning.q_values(indices[is_state])
+
+    if number_padding < 5:
+        number_padding = 5
+    # add maximal number of places before the decimal point to total number padding
+    if q_values.size:
+        number_padding += len(str(round(q_values.max())))
+    # width of the whole window
+    total_width = window[2] * (2 * number_padding + 4) + 1
+
+    lines = ["{:-<{w}}".format("", w=total_width)]
+    for line in q_values.tolist():
+        # up values line
+        lines.append("|" + "".join("  {:^{p}.3f} |".format(q[0], p=2 * number_padding) for q in line))
+        # left and right values line
+        lines.append("|" + "".join("{:{p}.3f} | {:<{p}.3f}|".format(q[3], q[1], p=number_padding) for q in line))
+        # down values line
+        lines.append("|" + "".join("  {:^{p}.3f} |".format(q[2], p=2 * number_padding) for q in line))
+        # separation line
+        lines.append(lines[0])
+    return "\n".join(lines)
+
+
+def render_summary(q_learning, size=Default.SUMMARY_SIZE, shades=Default.VALUE_SHADES,
+                   action_mapping=Default.ACTION_MAPPING, obstacle_char=Default.FIELD_MAPPING["O"]):
+    """
+    :param q_learning: QLearning object of any engine
+    :param size: maximum (width, height) of the summary in characters
+    :param shades: characters for increasing mean state values
+    :param action_mapping: dictionary mapping actions to readable characters like arrows
+    :param obstacle_char: character for blocks without any state
+    :return: downsampled state values and policy of the whole Gridworld side by side as string
+    """
+    width, height = q_learning.dim
+    # side length of the square block of fields every character stands for
+    block = max(1, -(-width // size[0]), -(-height // size[1]))
+    columns, rows = -(-width // block), -(-height // block)
+
+    state_counts = np.zeros((rows, columns), dtype=np.int64)
+    value_sums = np.zeros((rows, columns))
+    action_counts = np.zeros((rows, columns, len(q_learning.actions)), dtype=np.int64)
+    # one band of blocks at a time, so only a band of the Gridworld is read at once
+    for row in range(rows):
+        band = np.full((block, columns * block), -1, dtype=np.int64)
+        band_indices = q_learning.state_index.index_grid[row * block:(row + 1) * block]
+        band[:len(band_indices), :width] = band_indices
+        # column number of the block every field belongs to
+        band_columns = np.broadcast_to(np.arange(columns * block) // block, band.shape)
+        is_state = band >= 0
+        indices, block_columns = band[is_state], band_columns[is_state]
+        state_counts[row] = np.bincount(block_columns, minlength=columns)
+        value_sums[row] = np.bincount(block_columns, q_learning.q_values(indices).max(axis=1), minlength=columns)
+        greedy = q_learning.greedy_actions(indices)
+        action_count = len(q_learning.actions)
+        action_counts[row] = np.bincount(block_columns * action_count + greedy,
+                                         minlength=columns * action_count).reshape(columns, action_count)
+
+    has_states = state_counts > 0
+    mean_values = value_sums / np.maximum(state_counts, 1)
+    levels = np.zeros((rows, columns), dtype=np.int64)
+    if has_states.any():
+        low, high = mean_values[has_states].min(), mean_values[has_states].max()
+        if high > low:
+            levels = np.rint((mean_values - low) / (high - low) * (len(shades) - 1)).astype(np.int64)
+    arrows = [action_mapping[a] for a in q_learning.actions]
+    majority = action_counts.argmax(axis=2)
+
+    lines = ["Every character stands for {0}x{0} fields, shaded by mean state value from {1} (lowest) "
+             "to {2} (highest), and shows the action chosen in most of them:".format(block, shades[0], shades[-1])]
+    for row in range(rows):
+        values = "".join(shades[levels[row, c]] if has_states[row, c] else obstacle_char for c in range(columns))
+        policy = "".join(arrows[majority[row, c]] if has_states[row, c] else obstacle_char for c in range(columns))
+        lines.append(" " + values + "   " + policy)
+    return "\n".join(lines)
@@ -0,0 +1,96 @@
+"""
+This ReplayBuffer class stores the most recent transitions (s, a, r, s') of a Q-learning agent
+so they can be used for more than one Q-value update (experience replay).
+
+The transitions are stored as state and action indices in preallocated NumPy arrays used as ring buffer,
+so adding a transition doesn't create any Python objects and memory stays bounded by the capacity.
+Minibatches are sampled uniformly by default, a different sampler can be given, e.g. to prefer
+recent transitions. QLearning.replay lowers the learning rate of pairs the more often they were replayed,
+so Q settles even though every transition is replayed many times. Replaying a minibatch costs several times
+as much as a real step on small Gridworlds, replay_interval lowers that cost.
+
+Usage: QLearning(..., q_engine="array", replay_buffer=ReplayBuffer(10000, batch_size=32))
+"""
+
+import numpy as np
+
+from RandomStream import as_stream
+
+
+def recent_sampler(window):
+    """
+    :param window: number of most recent transitions to sample from
+    :return: sampler choosing uniformly among the given number of most recent transitions
+    """
+    def sampler(buffer, batch_size):
+        size = min(window, len(buffer))
+        return (buffer.position - 1 - buffer.rng.generator.integers(size, size=batch_size)) % buffer.capacity
+    return sampler
+
+
+class ReplayBuffer:
+    def __init__(self, capacity, batch_size=32, replay_interval=1, sampler=None, seed=None):
+        """
+        :param capacity: maximum number of transitions stored, older ones are overwritten
+        :param batch_size: number of transitions replayed at once
+        :param replay_interval: optionally only replay a minibatch every this many added transitions
+        :param sampler: optionally function (buffer, batch_size) returning array of positions to replay,
+                        uniform sampling among all stored transitions by default
+        :param seed: optionally seed or RandomStream for the random numbers
+        """
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.replay_interval = replay_interval
+        self.sampler = sampler
+        self.rng = as_stream(seed)
+
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.next_states = np.zeros(capacity, dtype=np.int32)
+        # position the next transition is written to and number of transitions added in total
+        self.position = 0
+        self.added_count = 0
+
+
+    def add(self, s, a, r, s_prime):
+        """
+        Stores a transition, overwriting the oldest one if the buffer is full.
+        :param s: index of the state
+        :param a: index of the action
+        :param r: immediate reward
+        :param s_prime: index of the follow-up state
+        """
+        k = self.position
+        self.states[k] = s
+        self.actions[k] = a
+        self.rewards[k] = r
+        self.next_states[k] = s_prime
+        self.position = (k + 1) % self.capacity
+        self.added_count += 1
+
+
+    def ready(self):
+        """:return: True if enough transitions are stored and a replay is due according to the replay interval"""
+        return self.added_count >= self.batch_size and self.added_count % self.replay_interval == 0
+
+
+    def sample(self):
+        """
+        :return: tuple of arrays of state indices, action indices, rewards and follow-up state indices
+        """
+        if self.sampler is not None:
+            positions = self.sampler(self, self.batch_size)
+        else:
+            positions = self.rng.generator.integers(len(self), size=self.batch_size)
+        return self.states[positions], self.actions[positions], self.rewards[positions], self.next_states[positions]
+
+
+    def clear(self):
+        """Removes all transitions."""
+        self.position = 0
+        self.added_count = 0
+
+
+    def __len__(self):
+        return min(self.added_count, self.capacity)
@@ -0,0 +1,38 @@
+"""
+Tests of experience replay with the ReplayBuffer of ReplayBuffer.py.
+"""
+
+import numpy as np
+
+from Convergence import Budget, PolicyUnchanged
+from ReplayBuffer import ReplayBuffer, recent_sampler
+
+
+def test_ring_buffer():
+    buffer = ReplayBuffer(4, batch_size=3, replay_interval=2, seed=1)
+    for k in range(6):
+        buffer.add(k, k % 4, float(k), k + 1)
+        # ready once a minibatch is stored, then every second transition
+        assert buffer.ready() == (k in (3, 5))
+    assert len(buffer) == 4
+    # the two oldest transitions were overwritten
+    assert sorted(buffer.states.tolist()) == [2, 3, 4, 5]
+    s, a, r, s_prime = buffer.sample()
+    assert len(s) == 3
+    assert set(s.tolist()) <= {2, 3, 4, 5}
+    assert np.array_equal(s_prime, s + 1)
+    assert np.array_equal(r, s.astype(np.float64))
+
+    buffer.sampler = recent_sampler(1)
+    assert buffer.sample()[0].tolist() == [5, 5, 5]
+    buffer.clear()
+    assert len(buffer) == 0
+
+
+def test_replay_converges(make_learner):
+    q_learning = make_learner(q_engine="array", convergence_threshold=100,
+                              replay_buffer=ReplayBuffer(10000, batch_size=32, seed=101))
+    q_learning.q_learning_until_convergence(criteria=[PolicyUnchanged(), Budget(episodes=5000)])
+    assert q_learning.convergence_criterion == PolicyUnchanged.name
+    # every replayed pair was counted
+    assert q_learning.replay_counts.sum() > q_learning.step_count
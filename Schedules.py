@@ -0,0 +1,250 @@
+"""
+Schedules for the learning rate alpha and the exploration rate epsilon of QLearning.
+
+With a constant epsilon the agent keeps exploring at the same rate forever, and with a constant
+alpha the Q-values keep following every noisy reward, so the policy settles late. A schedule lowers
+them while learning progresses. n is the number of episodes since Q was (re)set (QLearning.episode_count):
+* ExponentialDecay: start * rate^n, but at least a minimum
+* LinearDecay: from start to end within a number of episodes, then end
+* GLIE: start * scale / (scale + n), i.e. decaying with 1/n. As epsilon every action is still tried
+  infinitely often while the policy becomes greedy in the limit (GLIE), as alpha the step sizes
+  fulfill the conditions under which Q-learning converges.
+For the learning rate there is also
+* VisitCount: 1 / n(s, a)^exponent, n(s, a) being the number of updates of the (state, action) pair so far,
+  so rarely visited pairs still learn quickly while often visited ones settle. The counts are kept
+  in a table of unsigned 32 bit integers (see VisitCounts), which only has rows for the states with
+  a row in the Q-table when using the sparse Q engine.
+
+Schedules can also be written as lists of their name and parameters, e.g. ["exponential", 0.5, 0.999, 0.05],
+which is how they are given in DefaultConstants.py and on the command line and saved in checkpoints.
+
+Example:
+    QLearning(..., learning_rate_schedule=VisitCount(0.8), epsilon_schedule=GLIE(0.5, 100))
+"""
+
+import numpy as np
+
+from QTable import SparseQTable
+
+
+class Schedule:
+    """
+    Base class of the schedules. value returns the value for the given number of episodes
+    (or visits of a (state, action) pair if per_visit is True).
+    """
+
+    name = None
+    per_visit = False
+
+
+    def value(self, n):
+        """
+        :param n: number of episodes since Q was (re)set, or number of visits for per visit schedules
+        :return: learning rate or epsilon
+        """
+        raise NotImplementedError
+
+
+    def parameters(self):
+        """:return: list of the parameters, in the order of the constructor"""
+        raise NotImplementedError
+
+
+    def spec(self):
+        """:return: list of the name and the parameters, which make_schedule turns back into the schedule"""
+        return [self.name] + self.parameters()
+
+
+class ExponentialDecay(Schedule):
+    name = "exponential"
+
+
+    def __init__(self, start, rate, minimum=0.0):
+        """
+        :param start: value in the first episode
+        :param rate: factor the value is multiplied with after every episode
+        :param minimum: optionally value it never falls below
+        """
+        self.start = start
+        self.rate = rate
+        self.minimum = minimum
+
+
+    def value(self, n):
+        return max(self.minimum, self.start * self.rate ** n)
+
+
+    def parameters(self):
+        return [self.start, self.rate, self.minimum]
+
+
+class LinearDecay(Schedule):
+    name = "linear"
+
+
+    def __init__(self, start, end, episodes):
+        """
+        :param start: value in the first episode
+        :param end: value after the given number of episodes and from then on
+        :param episodes: number of episodes until the end value is reached
+        """
+        self.start = start
+        self.end = end
+        self.episodes = episodes
+
+
+    def value(self, n):
+        if n >= self.episodes:
+            return self.end
+        return self.start + (self.end - self.start) * n / self.episodes
+
+
+    def parameters(self):
+        return [self.start, self.end, self.episodes]
+
+
+class GLIE(Schedule):
+    name = "glie"
+
+
+    def __init__(self, start=1.0, scale=1.0):
+        """
+        :param start: value in the first episode
+        :param scale: optionally number of episodes after which the value is halved, the larger the slower it decays
+        """
+        self.start = start
+        self.scale = scale
+
+
+    def value(self, n):
+        return self.start * self.scale / (self.scale + n)
+
+
+    def parameters(self):
+        return [self.start, self.scale]
+
+
+class VisitCount(Schedule):
+    name = "visit_count"
+    per_visit = True
+
+
+    def __init__(self, exponent=0.8, minimum=0.0):
+        """
+        Learning rate 1 / n(s, a)^exponent, only for the learning rate.
+        :param exponent: optionally change the exponent, between 0.5 and 1 Q-learning still converges,
+                         the smaller the slower the learning rate decays
+        :param minimum: optionally learning rate it never falls below
+        """
+        self.exponent = exponent
+        self.minimum = minimum
+
+
+    def value(self, n):
+        return max(self.minimum, n ** -self.exponent)
+
+
+    def parameters(self):
+        return [self.exponent, self.minimum]
+
+
+SCHEDULES = {schedule.name: schedule for schedule in [ExponentialDecay, LinearDecay, GLIE, VisitCount]}
+
+
+def make_schedule(spec):
+    """
+    :param spec: Schedule, None or list of the name and the parameters of a schedule, e.g. ["glie", 0.5, 100]
+    :return: the given Schedule or None or a new schedule as described by the list
+    """
+    if spec is None or isinstance(spec, Schedule):
+        return spec
+    name, parameters = spec[0], spec[1:]
+    if name not in SCHEDULES:
+        raise ValueError("Unknown schedule: {}".format(name))
+    return SCHEDULES[name](*(float(p) for p in parameters))
+
+
+def describe(schedule):
+    """
+    :param schedule: Schedule or None
+    :return: short readable description, e.g. for the menu
+    """
+    if schedule is None:
+        return "constant"
+    return "{}({})".format(schedule.name, ", ".join("{:g}".format(p) for p in schedule.parameters()))
+
+
+class VisitCounts:
+    def __init__(self, q_function, state_count, action_count, schedule):
+        """
+        Number of updates of every (state, action) pair, for per visit learning rates.
+        With a SparseQTable only states with a row have counts, stored in blocks next to the rows,
+        otherwise there is a row of counts for every state.
+        :param q_function: Q-table (or dictionary) of the QLearning object
+        :param state_count: number of states
+        :param action_count: number of actions
+        :param schedule: per visit Schedule turning counts into learning rates
+        """
+        self.schedule = schedule
+        self.action_count = action_count
+        if isinstance(q_function, SparseQTable):
+            self.q_table = q_function
+            # counts of row r of the Q-table are row r % block_size of block r // block_size
+            self.blocks = []
+            self.counts = None
+        else:
+            self.q_table = None
+            # row i contains the counts of state i, column j those of action j
+            self.counts = np.zeros((state_count, action_count), dtype=np.uint32)
+
+
+    def _row(self, i):
+        """
+        :param i: index of a state with row in the sparse Q-table
+        :return: array of the counts of the state
+        """
+        b, k = divmod(self.q_table.row_numbers.item(i), self.q_table.block_size)
+        while len(self.blocks) <= b:
+            self.blocks.append(np.zeros((self.q_table.block_size, self.action_count), dtype=np.uint32))
+        return self.blocks[b][k]
+
+
+    def step_size(self, i, j):
+        """
+        Counts an update of the (state, action) pair.
+        :param i: index of the state, it needs a row in the sparse Q-table already
+        :param j: index of the action
+        :return: learning rate for the update
+        """
+        counts = self.counts[i] if self.q_table is None else self._row(i)
+        count = counts.item(j) + 1
+        counts[j] = count
+        return self.schedule.value(count)
+
+
+    def take(self, indices):
+        """
+        :param indices: array of state indices
+        :return: array with one row of counts per given state
+        """
+        if self.q_table is None:
+            return self.counts[indices]
+        counts = np.zeros((len(indices), self.action_count), dtype=np.uint32)
+        for k, i in enumerate(indices.tolist()):
+            if self.q_table.row_numbers.item(i) >= 0:
+                counts[k] = self._row(i)
+        return counts
+
+
+    def assign(self, states, counts):
+        """
+        Sets the counts of the given states, allocating their rows in the sparse Q-table if necessary.
+        :param states: array of state indices
+        :param counts: array with one row of counts per state
+        """
+        if self.q_table is None:
+            self.counts[states] = counts
+            return
+        for i, row in zip(states.tolist(), counts):
+            self.q_table.allocate(i)
+            self._row(i)[:] = row
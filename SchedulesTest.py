@@ -0,0 +1,75 @@
+"""
+Tests of the learning rate and epsilon schedules of Schedules.py.
+"""
+
+import numpy as np
+import pytest
+
+from Schedules import GLIE, ExponentialDecay, LinearDecay, VisitCount, describe, make_schedule
+
+
+def test_schedule_values():
+    assert ExponentialDecay(0.5, 0.5).value(2) == 0.125
+    assert ExponentialDecay(0.5, 0.5, 0.2).value(2) == 0.2
+    assert LinearDecay(1.0, 0.0, 10).value(5) == 0.5
+    assert LinearDecay(1.0, 0.1, 10).value(20) == 0.1
+    assert GLIE(0.5, 100).value(0) == 0.5
+    assert GLIE(0.5, 100).value(100) == 0.25
+    assert VisitCount(1.0).value(4) == 0.25
+    assert VisitCount(0.5, 0.4).value(100) == 0.4
+
+
+@pytest.mark.parametrize("schedule", [ExponentialDecay(0.5, 0.999, 0.05), LinearDecay(0.5, 0.1, 100),
+                                      GLIE(0.5, 100), VisitCount(0.8)])
+def test_spec_round_trip(schedule):
+    made = make_schedule(schedule.spec())
+    assert type(made) is type(schedule)
+    assert made.parameters() == schedule.parameters()
+    assert describe(made) == describe(schedule)
+
+
+def test_make_schedule():
+    assert make_schedule(None) is None
+    schedule = GLIE()
+    assert make_schedule(schedule) is schedule
+    assert make_schedule(["exponential", "0.5", "0.9"]).parameters() == [0.5, 0.9, 0.0]
+    with pytest.raises(ValueError):
+        make_schedule(["unknown", 1])
+    assert describe(None) == "constant"
+
+
+def test_schedules_follow_the_episodes(make_learner):
+    q_learning = make_learner(learning_rate_schedule=ExponentialDecay(0.5, 0.9), epsilon_schedule=GLIE(0.5, 10))
+    for _ in range(10):
+        q_learning.q_learning_episode()
+    assert q_learning.episode_count == 10
+    q_learning.apply_schedules()
+    assert q_learning.learning_rate == pytest.approx(0.5 * 0.9 ** 10)
+    assert q_learning.epsilon == pytest.approx(0.25)
+    # resetting Q restarts the schedules
+    q_learning.reset_q_function()
+    q_learning.apply_schedules()
+    assert q_learning.learning_rate == 0.5
+    assert q_learning.epsilon == 0.5
+
+
+@pytest.mark.parametrize("q_engine", ["dict", "array", "sparse"])
+def test_visit_counts(make_learner, q_engine):
+    q_learning = make_learner(q_engine=q_engine, learning_rate_schedule=VisitCount(0.8))
+    q_learning.q_learning_episode()
+    counts = q_learning.visit_counts.take(np.arange(len(q_learning.states)))
+    # every step updates at most one pair
+    assert 0 < counts.sum() <= q_learning.step_count
+    q_learning.q_learning_until_convergence(resume=True)
+    assert q_learning.visit_counts.take(np.arange(len(q_learning.states))).sum() > counts.sum()
+
+
+def test_visit_count_learning_rates_are_the_same_for_all_engines(make_learner):
+    runs = []
+    for q_engine in ["dict", "array", "sparse"]:
+        q_learning = make_learner(q_engine=q_engine, learning_rate_schedule=VisitCount(0.8))
+        q_learning.q_learning_until_convergence()
+        runs.append((q_learning.last_convergence_episode_count, q_learning.step_count,
+                     q_learning.q_values(np.arange(len(q_learning.states))).tolist()))
+    assert runs[1] == runs[0]
+    assert runs[2] == runs[0]
@@ -0,0 +1,218 @@
+"""
+On-disk cache of solved Gridworlds, so a Gridworld which was already trained with the same
+parameters doesn't have to be trained again.
+
+Entries are content addressed: the key is a SHA-256 hash of the Gridworld itself (the field of every cell,
+all obstacles counting as the same), the field rewards, transition probabilities, actions and goal fields,
+i.e. everything defining the environment, together with the hyperparameters of the learner and its seed
+(if any). Renaming a Gridworld file doesn't matter, while changing a single field or parameter does.
+Every entry consists of
+* <key>.ckpt: checkpoint of the converged Q-function and policy (see Checkpoint.py), which is memory mapped
+  when loading it into the array Q engine, so a hit is available almost instantly
+* <key>.json: hash of the environment, hyperparameters and statistics of the run
+Only runs whose policy converged are stored, not ones stopped by a budget or another criterion, and only
+runs from scratch, as the episodes and steps of a warm started run depend on the entry it started from.
+
+The cache is bounded in size: whenever an entry is stored, the least recently used entries are removed
+until all of them together fit into the given number of bytes. An entry counts as used when it's stored
+or loaded, which is recorded in the modification time of its checkpoint, so several processes can share
+one cache directory.
+
+Entries of the same environment but with other hyperparameters are near matches, whose Q-function
+can be used as starting point instead of training from zero (see SolutionCache.warm_start).
+
+Example:
+    cache = SolutionCache("cache")
+    environment = environment_key(q_learning.state_index, FIELD_REWARDS, TRANSITION_PROBABILITIES, ACTIONS, GOAL_FIELDS)
+    parameters = learner_parameters(q_learning, seed)
+    key = solution_key(environment, parameters)
+    if cache.load(q_learning, key) is None:
+        q_learning.q_learning_until_convergence()
+        cache.store(q_learning, key, environment, parameters, statistics)
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+import Checkpoint
+import DefaultConstants as Default
+
+
+def environment_key(state_index, field_rewards, transition_probabilities, actions, goal_fields):
+    """
+    :param state_index: StateIndex of the Gridworld
+    :param field_rewards: dictionary which maps fields to a reward value
+    :param transition_probabilities: dictionary of transition probabilities
+    :param actions: list of possible movements in tuple notation
+    :param goal_fields: list of fields which are considered terminal states
+    :return: hexadecimal hash of the Gridworld and everything else defining the environment
+    """
+    # field byte value of every cell, 0 for obstacles
+    fields = np.zeros(state_index.index_grid.shape, dtype=np.uint8)
+    is_state = state_index.index_grid >= 0
+    fields[is_state] = state_index.state_fields[state_index.index_grid[is_state]]
+    description = {"dim": list(state_index.dim),
+                   "field_rewards": field_rewards,
+                   "transition_probabilities": transition_probabilities,
+                   "actions": [list(a) for a in actions],
+                   "goal_fields": sorted(goal_fields)}
+    hash_ = hashlib.sha256(json.dumps(description, sort_keys=True).encode())
+    hash_.update(fields.tobytes())
+    return hash_.hexdigest()
+
+
+def learner_parameters(q_learning, seed=None):
+    """
+    :param q_learning: QLearning object before training
+    :param seed: optionally seed the random number streams of the run were derived from
+    :return: dictionary of the hyperparameters the learned Q-function depends on
+    """
+    learning_rate_schedule = q_learning.learning_rate_schedule
+    epsilon_schedule = q_learning.epsilon_schedule
+    return {"learner": type(q_learning).__name__,
+            "discount_factor": q_learning.discount_factor,
+            "learning_rate": q_learning.learning_rate,
+            "epsilon": q_learning.epsilon,
+            "learning_rate_schedule": learning_rate_schedule.spec() if learning_rate_schedule is not None else None,
+            "epsilon_schedule": epsilon_schedule.spec() if epsilon_schedule is not None else None,
+            "trace_decay": q_learning.trace_decay,
+            "convergence_threshold": q_learning.convergence_threshold,
+            "decimal_places": q_learning.decimal_places,
+            "seed": seed}
+
+
+def solution_key(environment, parameters):
+    """
+    :param environment: hash of the environment as returned by environment_key
+    :param parameters: dictionary of hyperparameters as returned by learner_parameters
+    :return: hexadecimal key of the cache entry
+    """
+    return hashlib.sha256((environment + json.dumps(parameters, sort_keys=True)).encode()).hexdigest()
+
+
+class SolutionCache:
+    def __init__(self, directory=Default.CACHE_DIR, max_bytes=Default.CACHE_SIZE):
+        """
+        :param directory: directory of the cache, created if necessary
+        :param max_bytes: optionally change the maximum size of all entries together
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # in case the cache was used with a larger maximum size before
+        self.evict()
+
+
+    def path(self, key, extension):
+        """:return: name of the file of the entry with the given key and extension"""
+        return os.path.join(self.directory, key + extension)
+
+
+    def load(self, q_learning, key):
+        """
+        Restores the converged Q-function, policy and parameters of a cached run into the QLearning object.
+        The random number streams of the object are left untouched.
+        :param q_learning: QLearning object set up with the same Gridworld and actions
+        :param key: key of the entry as returned by solution_key
+        :return: dictionary of the statistics of the cached run or None if there is no such entry
+        """
+        checkpoint_file = self.path(key, ".ckpt")
+        # the entry might be removed by another process at any time, which is just a miss
+        try:
+            with open(self.path(key, ".json")) as f:
+                entry = json.load(f)
+            Checkpoint.load_checkpoint(q_learning, checkpoint_file, restore_random_state=False)
+            os.utime(checkpoint_file)
+        except FileNotFoundError:
+            return None
+        return entry["statistics"]
+
+
+    def store(self, q_learning, key, environment, parameters, statistics):
+        """
+        Adds the run to the cache and removes the least recently used entries if the cache got too large.
+        :param q_learning: QLearning object after training
+        :param key: key of the entry as returned by solution_key
+        :param environment: hash of the environment as returned by environment_key
+        :param parameters: dictionary of hyperparameters the key was derived from
+        :param statistics: dictionary of statistics of the run, returned by load later on
+        """
+        Checkpoint.save_checkpoint(q_learning, self.path(key, ".ckpt"))
+        entry_file = self.path(key, ".json")
+        with open(entry_file + ".tmp", "w") as f:
+            json.dump({"environment": environment, "parameters": parameters, "statistics": statistics}, f)
+        os.replace(entry_file + ".tmp", entry_file)
+        self.evict(keep=key)
+
+
+    def entries(self):
+        """:return: list of tuples of last use, key and size in bytes of every entry, least recently used first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".ckpt"):
+                continue
+            key = name[:-len(".ckpt")]
+            try:
+                status = os.stat(self.path(key, ".ckpt"))
+                size = status.st_size + os.path.getsize(self.path(key, ".json"))
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime, key, size))
+        return sorted(entries)
+
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used entries until all entries together fit into the maximum size.
+        :param keep: optionally key of an entry never to remove, e.g. the one just stored
+        """
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        for _, key, size in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+            total -= size
+
+
+    def remove(self, key):
+        """Removes the entry with the given key if it exists"""
+        for extension in (".ckpt", ".json"):
+            try:
+                os.remove(self.path(key, extension))
+            except FileNotFoundError:
+                pass
+
+
+    def warm_start(self, q_learning, environment):
+        """
+        Sets Q of the QLearning object to the Q-values of the most recently used entry of the same environment,
+        whatever its hyperparameters. Everything else, e.g. the schedules, starts from scratch.
+        :param q_learning: QLearning object set up with the same Gridworld and actions
+        :param environment: hash of the environment as returned by environment_key
+        :return: dictionary of the hyperparameters of the entry used or None if there is none
+        """
+        for _, key, _ in reversed(self.entries()):
+            try:
+                with open(self.path(key, ".json")) as f:
+                    entry = json.load(f)
+                if entry["environment"] != environment:
+                    continue
+                _, arrays = Checkpoint.read_checkpoint(self.path(key, ".ckpt"), mmap=False)
+                os.utime(self.path(key, ".ckpt"))
+            except FileNotFoundError:
+                continue
+            q_values = np.zeros((len(q_learning.states), len(q_learning.actions)))
+            # checkpoints of the sparse Q engine only contain the rows of some states
+            if "states" in arrays:
+                q_values[arrays["states"]] = arrays["q_values"]
+            else:
+                q_values[:] = arrays["q_values"]
+            q_learning.set_q_function(q_values)
+            return entry["parameters"]
+        return None
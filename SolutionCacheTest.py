@@ -0,0 +1,131 @@
+"""
+Tests of the cache of solved Gridworlds of SolutionCache.py.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from CoarseToFine import CoarseToFineQLearning
+from conftest import GRIDWORLD
+from Convergence import Budget
+import DefaultConstants as Default
+import GridFile
+import Gridworld
+from QLearning import QLearning
+from SolutionCache import SolutionCache, environment_key, learner_parameters, solution_key
+
+
+def key_of(q_learning, seed=1):
+    environment = environment_key(q_learning.state_index, Default.FIELD_REWARDS, Default.TRANSITION_PROBABILITIES,
+                                  q_learning.actions, Default.GOAL_FIELDS)
+    parameters = learner_parameters(q_learning, seed)
+    return environment, parameters, solution_key(environment, parameters)
+
+
+def solve(make_learner, cache, **kwargs):
+    q_learning = make_learner(q_engine="array", **kwargs)
+    environment, parameters, key = key_of(q_learning)
+    q_learning.q_learning_until_convergence()
+    cache.store(q_learning, key, environment, parameters, {"episodes": q_learning.last_convergence_episode_count})
+    return q_learning, key
+
+
+def test_keys():
+    other_gridworld = [line[:] for line in GRIDWORLD]
+    other_gridworld[2][0] = "O"
+    environments = []
+    for gridworld in [GRIDWORLD, GridFile.to_array(GRIDWORLD), other_gridworld]:
+        q_learning = QLearning(None, gridworld, Default.GOAL_FIELDS, Default.OBSTACLE_FIELDS, Default.ACTIONS,
+                               1.0, 0.1, 0.5, 20)
+        environments.append(key_of(q_learning)[0])
+    # the key depends on the content of the Gridworld, not on how it was read
+    assert environments[0] == environments[1]
+    assert environments[0] != environments[2]
+
+
+def test_hit_and_miss(make_learner, tmp_path):
+    cache = SolutionCache(str(tmp_path))
+    q_learning, key = solve(make_learner, cache)
+
+    loaded = make_learner(q_engine="array")
+    assert key_of(loaded)[2] == key
+    assert cache.load(loaded, key) == {"episodes": q_learning.last_convergence_episode_count}
+    indices = np.arange(len(q_learning.states))
+    assert np.array_equal(loaded.q_values(indices), q_learning.q_values(indices))
+    assert np.array_equal(loaded.greedy_actions(), q_learning.greedy_actions())
+
+    # other hyperparameters are another entry
+    other = make_learner(q_engine="array", learning_rate=0.2)
+    assert key_of(other)[2] != key
+    assert cache.load(other, key_of(other)[2]) is None
+
+
+def test_least_recently_used_entries_are_evicted(make_learner, tmp_path):
+    cache = SolutionCache(str(tmp_path))
+    _, first = solve(make_learner, cache, learning_rate=0.1)
+    _, second = solve(make_learner, cache, learning_rate=0.2)
+    entry_size = max(size for _, _, size in cache.entries())
+    # make the first entry the most recently used one, independently of the resolution of modification times
+    os.utime(cache.path(second, ".ckpt"), (0, 0))
+    assert cache.load(make_learner(q_engine="array", learning_rate=0.1), first) is not None
+
+    cache.max_bytes = 2 * entry_size
+    _, third = solve(make_learner, cache, learning_rate=0.3)
+    keys = [key for _, key, _ in cache.entries()]
+    assert second not in keys
+    assert first in keys and third in keys
+
+
+def test_warm_start(make_learner, tmp_path):
+    cache = SolutionCache(str(tmp_path))
+    solved, _ = solve(make_learner, cache)
+    environment = key_of(solved)[0]
+
+    q_learning = make_learner(q_engine="array", learning_rate=0.2)
+    assert cache.warm_start(q_learning, environment)["learning_rate"] == 0.1
+    indices = np.arange(len(q_learning.states))
+    assert np.array_equal(q_learning.q_values(indices), solved.q_values(indices))
+    assert cache.warm_start(q_learning, "0" * 64) is None
+
+
+def test_warm_start_replaces_coarse_levels(make_learner, tmp_path):
+    gridworld = GridFile.generate_random_gridworld(8, 8, seed=1)
+    kwargs = {"gridworld": gridworld, "learner": CoarseToFineQLearning, "q_engine": "array", "coarsest_size": 4,
+              "field_rewards": Default.FIELD_REWARDS,
+              "transition_probabilities": Default.TRANSITION_PROBABILITIES}
+    q_learning = make_learner(**kwargs)
+    q_learning.q_learning_until_convergence()
+    assert len(q_learning.levels) == 1
+
+    cache = SolutionCache(str(tmp_path))
+    environment, parameters, key = key_of(q_learning)
+    cache.store(q_learning, key, environment, parameters, {})
+    warm_started = make_learner(learning_rate=0.2, **kwargs)
+    cache.warm_start(warm_started, environment)
+    warm_started.q_learning_until_convergence(criteria=[Budget(episodes=0)])
+    assert warm_started.levels == []
+    indices = np.arange(len(q_learning.states))
+    assert np.array_equal(warm_started.q_values(indices), q_learning.q_values(indices))
+
+
+def test_batch_mode_caches_runs_from_scratch_only(tmp_path):
+    gridworld_file = str(tmp_path / "small.grid")
+    GridFile.write_text_grid(GRIDWORLD, gridworld_file)
+    cache_dir, output_dir = str(tmp_path / "cache"), str(tmp_path / "results")
+
+    def run(learning_rate):
+        Gridworld.run_batch([gridworld_file], output_dir, q_engine="array", learning_rate=learning_rate,
+                            convergence_threshold=20, seed=1, cache_dir=cache_dir, cache_warm_start=True)
+        with open(os.path.join(output_dir, "small.json")) as f:
+            return json.load(f)
+
+    first = run(0.1)
+    assert not first["cached"] and not first["warm_start"]
+    assert run(0.1)["cached"]
+    second = run(0.2)
+    assert not second["cached"] and second["warm_start"]
+    # its episodes depend on the entry it started from, so it isn't stored
+    assert not run(0.2)["cached"]
+    assert len(SolutionCache(cache_dir).entries()) == 1
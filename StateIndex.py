@@ -0,0 +1,198 @@
+"""
+This StateIndex class maps the reachable states of a Gridworld, i.e. (x, y) coordinate tuples,
+to dense integer indices 0 to n-1 and back.
+
+Array based code (like the array Q-table) can then store one row per state in a
+contiguous NumPy array instead of hashing nested tuples in a dictionary.
+The index itself is a two-dimensional array with the dimensions of the Gridworld,
+containing the index of every reachable state and -1 for obstacles, so a lookup
+is a single array access no matter how large the Gridworld is. Together with the coordinates and fields
+of all states it takes about 17 bytes per cell, whether the cell is ever visited or not.
+
+MDP and QLearning accept an existing StateIndex in place of the Gridworld, so both can share
+one index, e.g. QLearning(state_list=environment.state_index, ...), instead of building their own.
+"""
+
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+
+def field_codes(fields):
+    """
+    :param fields: list of fields, i.e. single characters
+    :return: array of the byte values of the fields, as used in Gridworld arrays
+    """
+    return np.array([ord(field) for field in fields], dtype=np.uint8)
+
+
+def as_state_index(state_list, obstacle_fields):
+    """
+    :param state_list: StateIndex, two-dimensional list of fields or array of their byte values
+    :param obstacle_fields: list of fields which are considered obstacles, not used for a StateIndex
+    :return: the given StateIndex or a new one for the given Gridworld
+    """
+    if isinstance(state_list, StateIndex):
+        return state_list
+    return StateIndex(state_list, obstacle_fields)
+
+
+class StateIndex(Sequence):
+    def __init__(self, state_list, obstacle_fields):
+        """
+        Builds the index for the given Gridworld.
+        The index behaves like the list of reachable states in (x, y) coordinate tuple notation,
+        ordered row by row, which is the same order the MDP and QLearning classes use.
+
+        :param state_list: two-dimensional list of possible states represented as specific fields
+                           or two-dimensional NumPy array of the byte values of the fields (see GridFile.py)
+        :param obstacle_fields: list of fields which are considered obstacles
+        """
+
+        # dimensions of the Gridworld as (width, height)
+        self.dim = (len(state_list[0]), len(state_list))
+
+        if isinstance(state_list, np.ndarray):
+            # everything at once without creating Python objects for single cells
+            reachable = ~np.isin(state_list, field_codes(obstacle_fields))
+            # -1 marks states which are not reachable, i.e. obstacles
+            self.index_grid = np.full(state_list.shape, -1, dtype=np.int32)
+            self.index_grid[reachable] = np.arange(np.count_nonzero(reachable), dtype=np.int32)
+            y, x = np.nonzero(reachable)
+            # (x, y) coordinates of every state, row i belonging to the state with index i
+            self.coordinates = np.stack([x, y], axis=1).astype(np.int32)
+            # byte value of the field of every state
+            self.state_fields = np.asarray(state_list[reachable], dtype=np.uint8)
+            return
+
+        # -1 marks states which are not reachable, i.e. obstacles or cells missing in short lines
+        self.index_grid = np.full((self.dim[1], self.dim[0]), -1, dtype=np.int32)
+        coordinates = []
+        state_fields = []
+        for y, line in enumerate(state_list):
+            for x, field in enumerate(line):
+                if field not in obstacle_fields:
+                    self.index_grid[y, x] = len(coordinates)
+                    coordinates.append((x, y))
+                    state_fields.append(ord(field))
+        # (x, y) coordinates of every state, row i belonging to the state with index i
+        self.coordinates = np.array(coordinates, dtype=np.int32).reshape(-1, 2)
+        # byte value of the field of every state
+        self.state_fields = np.array(state_fields, dtype=np.uint8)
+
+
+    def field_mask(self, fields):
+        """
+        :param fields: list of fields
+        :return: boolean array which is True at position i if state i is one of the given fields
+        """
+        return np.isin(self.state_fields, field_codes(fields))
+
+
+    def field_values(self, field_values):
+        """
+        :param field_values: dictionary mapping fields to a value, e.g. the field rewards
+        :return: array containing at position i the value of the field of state i
+        """
+        lookup = np.full(256, np.nan)
+        for field, value in field_values.items():
+            lookup[ord(field)] = value
+        values = lookup[self.state_fields]
+        if np.isnan(values).any():
+            missing = chr(self.state_fields[np.isnan(values)][0])
+            raise KeyError(missing)
+        return values
+
+
+    def index(self, s, *args):
+        """
+        :param s: state in (x, y) coordinate tuple notation
+        :return: index of the given state
+        """
+        i = self.find(s)
+        if i < 0:
+            raise ValueError("{} is not a valid state".format(s))
+        return i
+
+
+    def find(self, s):
+        """
+        Like index(), but returns -1 instead of raising an exception if the state is not reachable.
+        :param s: state in (x, y) coordinate tuple notation
+        :return: index of the given state or -1
+        """
+        x, y = s
+        # explicit bounds check as negative numbers would otherwise wrap around
+        if 0 <= x < self.dim[0] and 0 <= y < self.dim[1]:
+            return self.index_grid.item(y, x)
+        return -1
+
+
+    def move(self, offset):
+        """
+        Computes for every state the state reached by moving with the given offset.
+        Moving into an obstacle or out of the Gridworld means staying in the current state.
+        :param offset: movement in tuple notation, i.e. (x_coordinate_offset, y_coordinate_offset)
+        :return: array containing at position i the index of the state reached from state i
+        """
+        x = self.coordinates[:, 0] + offset[0]
+        y = self.coordinates[:, 1] + offset[1]
+        inside = (x >= 0) & (x < self.dim[0]) & (y >= 0) & (y < self.dim[1])
+        target = np.full(len(self), -1, dtype=np.int32)
+        target[inside] = self.index_grid[y[inside], x[inside]]
+        # blocked movements lead back to the current state
+        blocked = np.nonzero(target < 0)[0]
+        target[blocked] = blocked
+        return target
+
+
+    def __contains__(self, s):
+        try:
+            return self.find(s) >= 0
+        except (TypeError, ValueError):
+            return False
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.coordinates.item(i, 0), self.coordinates.item(i, 1)
+
+
+    def __iter__(self):
+        return zip(self.coordinates[:, 0].tolist(), self.coordinates[:, 1].tolist())
+
+
+    def __len__(self):
+        return len(self.coordinates)
+
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class StateValues(Mapping):
+    def __init__(self, state_index, values):
+        """
+        Read-only dictionary-like view mapping every state to one entry of an array,
+        e.g. the rewards of the MDP, without a Python object per state.
+        :param state_index: StateIndex of the Gridworld
+        :param values: array containing the value of state i at position i
+        """
+        self.state_index = state_index
+        self.values_array = values
+
+
+    def __getitem__(self, s):
+        i = self.state_index.find(s)
+        if i < 0:
+            raise KeyError(s)
+        return self.values_array.item(i)
+
+
+    def __iter__(self):
+        return iter(self.state_index)
+
+
+    def __len__(self):
+        return len(self.state_index)
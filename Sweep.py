@@ -0,0 +1,190 @@
+"""
+Runs Q-learning until convergence for every combination of the given hyperparameters
+and random seeds on one Gridworld and collects the results in a single table.
+
+The runs are independent of each other, so they are distributed over a pool of worker
+processes, by default one per CPU core. With --agents every run uses many agents in lockstep
+(see BatchQLearning.py) instead of a single one.
+
+Example:
+    python Sweep.py 3by4.grid --learning-rates 0.1 0.3 --epsilons 0.2 0.5 --seeds 0 1 2 --output results.json
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from BatchMDP import BatchMDP
+from BatchQLearning import BatchQLearning
+from MDP import MDP
+from QLearning import QLearning
+from RandomStream import RandomStream
+import Gridworld
+import Render
+import DefaultConstants as Default
+
+# hyperparameters which can be swept, in the order they show up in the result table
+PARAMETERS = ["learning_rate", "epsilon", "discount_factor", "convergence_threshold"]
+
+
+def make_configurations(parameter_grid, seeds):
+    """
+    :param parameter_grid: dictionary mapping hyperparameter names to lists of values to try
+    :param seeds: list of random seeds, every combination of hyperparameters is run once per seed
+    :return: list of dictionaries, each containing one value for every hyperparameter and a seed
+    """
+    names = [name for name in PARAMETERS if name in parameter_grid]
+    configurations = []
+    for values in itertools.product(*(parameter_grid[name] for name in names)):
+        for seed in seeds:
+            configuration = dict(zip(names, values))
+            configuration["seed"] = seed
+            configurations.append(configuration)
+    return configurations
+
+
+def run_configuration(gridworld_file, configuration, q_engine=Default.Q_ENGINE, agents=None):
+    """
+    Performs Q-learning until convergence on the given Gridworld with one configuration.
+    Hyperparameters missing from the configuration are taken from DefaultConstants.
+    :param gridworld_file: name of the Gridworld file
+    :param configuration: dictionary of hyperparameters and the seed
+    :param q_engine: how Q is stored, either "dict", "array" or "sparse", ignored with agents
+    :param agents: optionally number of agents moving in lockstep (see BatchQLearning.py),
+                   which always use the array Q engine
+    :return: dictionary of the configuration, number of episodes, wall time and the final policy
+    """
+    # independent streams for environment and learner, the same for every configuration with the same seed
+    environment_stream, learner_stream = RandomStream(configuration.get("seed")).spawn(2)
+    gridworld = Gridworld.make_list_from_file(gridworld_file)
+    parameters = {
+        "discount_factor": configuration.get("discount_factor", Default.DISCOUNT_FACTOR),
+        "learning_rate": configuration.get("learning_rate", Default.LEARNING_RATE),
+        "epsilon": configuration.get("epsilon", Default.EPSILON),
+        "convergence_threshold": configuration.get("convergence_threshold", Default.CONVERGENCE_THRESHOLD),
+        "seed": learner_stream
+    }
+
+    if agents is not None:
+        environment = BatchMDP(state_list=gridworld,
+                               field_rewards=Default.FIELD_REWARDS,
+                               obstacle_fields=Default.OBSTACLE_FIELDS,
+                               goal_fields=Default.GOAL_FIELDS,
+                               actions=Default.ACTIONS,
+                               transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                               seed=environment_stream)
+        q_learning = BatchQLearning(env_perform_actions=environment.perform_actions,
+                                    state_list=environment.state_index,
+                                    goal_fields=Default.GOAL_FIELDS,
+                                    obstacle_fields=Default.OBSTACLE_FIELDS,
+                                    actions=Default.ACTIONS,
+                                    num_agents=agents,
+                                    **parameters)
+    else:
+        environment = MDP(state_list=gridworld,
+                          field_rewards=Default.FIELD_REWARDS,
+                          obstacle_fields=Default.OBSTACLE_FIELDS,
+                          actions=Default.ACTIONS,
+                          transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                          seed=environment_stream)
+        q_learning = QLearning(env_perform_action=environment.perform_action,
+                               state_list=environment.state_index,
+                               goal_fields=Default.GOAL_FIELDS,
+                               obstacle_fields=Default.OBSTACLE_FIELDS,
+                               actions=Default.ACTIONS,
+                               q_engine=q_engine,
+                               **parameters)
+
+    start = time.perf_counter()
+    q_learning.q_learning_until_convergence()
+    wall_time = time.perf_counter() - start
+
+    result = dict(configuration)
+    result["episodes"] = q_learning.last_convergence_episode_count
+    result["converged_after"] = q_learning.last_convergence_episode_count - q_learning.convergence_threshold
+    result["wall_time"] = wall_time
+    # policy as one string of arrows per line of the Gridworld
+    result["policy"] = Render.policy_lines(q_learning, separator="")
+    return result
+
+
+def sweep(gridworld_file, parameter_grid, seeds, workers=None, q_engine=Default.Q_ENGINE, agents=None):
+    """
+    Runs every configuration of the parameter grid and seeds in a pool of worker processes.
+    :param gridworld_file: name of the Gridworld file
+    :param parameter_grid: dictionary mapping hyperparameter names to lists of values to try
+    :param seeds: list of random seeds
+    :param workers: optionally number of worker processes, defaults to the number of CPU cores
+    :param q_engine: how Q is stored, either "dict", "array" or "sparse", ignored with agents
+    :param agents: optionally number of agents moving in lockstep in every run (see BatchQLearning.py)
+    :return: list of result dictionaries in the same order as make_configurations returns the configurations
+    """
+    configurations = make_configurations(parameter_grid, seeds)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        return list(executor.map(run_configuration, itertools.repeat(gridworld_file), configurations,
+                                 itertools.repeat(q_engine), itertools.repeat(agents)))
+
+
+def write_results(results, file):
+    """
+    Writes the results to a JSON file or, if the filename ends with .csv, to a CSV file.
+    :param results: list of result dictionaries
+    :param file: name of the output file
+    """
+    if file.endswith(".csv"):
+        with open(file, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            for result in results:
+                writer.writerow(dict(result, policy="/".join(result["policy"])))
+    else:
+        with open(file, "w") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def print_results(results):
+    """
+    Prints the results as table, without the policies.
+    :param results: list of result dictionaries
+    """
+    columns = [column for column in results[0] if column != "policy"]
+    widths = [max(len(column), 10) for column in columns]
+    print(" ".join("{:>{w}}".format(column, w=width) for column, width in zip(columns, widths)))
+    for result in results:
+        cells = ["{:.3f}".format(result[column]) if isinstance(result[column], float) else str(result[column])
+                 for column in columns]
+        print(" ".join("{:>{w}}".format(cell, w=width) for cell, width in zip(cells, widths)))
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep of Q-learning until convergence.")
+    parser.add_argument("gridworld_file", help="Gridworld file to learn on")
+    parser.add_argument("--learning-rates", type=float, nargs="+", default=[Default.LEARNING_RATE])
+    parser.add_argument("--epsilons", type=float, nargs="+", default=[Default.EPSILON])
+    parser.add_argument("--discount-factors", type=float, nargs="+", default=[Default.DISCOUNT_FACTOR])
+    parser.add_argument("--convergence-thresholds", type=int, nargs="+", default=[Default.CONVERGENCE_THRESHOLD])
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--workers", type=int, help="number of worker processes (default: number of CPU cores)")
+    parser.add_argument("--q-engine", choices=["dict", "array", "sparse"], default=Default.Q_ENGINE)
+    parser.add_argument("--agents", type=int,
+                        help="number of agents moving in lockstep in every run (see BatchQLearning.py)")
+    parser.add_argument("--output", help="write results to this .json or .csv file")
+    return parser.parse_args()
+
+
+# only run if not imported from other file
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    grid = {"learning_rate": arguments.learning_rates,
+            "epsilon": arguments.epsilons,
+            "discount_factor": arguments.discount_factors,
+            "convergence_threshold": arguments.convergence_thresholds}
+    sweep_results = sweep(arguments.gridworld_file, grid, arguments.seeds, arguments.workers, arguments.q_engine,
+                          arguments.agents)
+    print_results(sweep_results)
+    if arguments.output:
+        write_results(sweep_results, arguments.output)
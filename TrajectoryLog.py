@@ -0,0 +1,246 @@
+"""
+Recording the transitions (s, a, r, s') of Q-learning to a file and training from such files
+afterwards without any environment (offline Q-learning), so experience collected once can be used
+to train with different hyperparameters as often as needed.
+
+A trajectory log consists of a 24 byte header (the magic bytes b"QTRJ", a format version byte,
+three padding bytes and width and height of the Gridworld, number of states and number of actions
+as little-endian unsigned 32 bit integers) followed by one 17 byte record per transition: index of the
+state (int32), index of the action (uint8), immediate reward (float64) and index of the follow-up state
+(int32), all little-endian and in the order of QLearning.states and QLearning.actions.
+
+Logs are append-only: TrajectoryLog collects records in a preallocated buffer and writes it with a single
+call whenever it's full, and opening an existing log appends to it. Records cut off by a crash are
+dropped when appending or reading. For training, a log is memory mapped and read in chunks,
+so logs larger than the memory can be used.
+
+Examples:
+    python TrajectoryLog.py record 3by4.grid experience.qtrj --episodes 10000 --epsilon 1 --seed 1
+    python TrajectoryLog.py train 3by4.grid experience.qtrj --learning-rate 0.1 --epochs 5
+"""
+
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+import DefaultConstants as Default
+from Convergence import Budget
+import Gridworld
+from MDP import MDP
+from QLearning import QLearning
+from RandomStream import RandomStream
+import Render
+
+MAGIC = b"QTRJ"
+VERSION = 1
+HEADER = struct.Struct("<4sB3xIIII")
+# packed, so a record has no padding bytes
+RECORD = np.dtype([("s", "<i4"), ("a", "u1"), ("r", "<f8"), ("s_prime", "<i4")])
+
+
+def log_header(q_learning):
+    """
+    :param q_learning: QLearning object
+    :return: header of trajectory logs of the Gridworld and actions of the QLearning object as bytes
+    """
+    return HEADER.pack(MAGIC, VERSION, q_learning.dim[0], q_learning.dim[1], len(q_learning.states),
+                       len(q_learning.actions))
+
+
+class TrajectoryLog:
+    def __init__(self, file, q_learning, buffer_size=Default.LOG_BUFFER_SIZE):
+        """
+        Opens a trajectory log for appending, creating it if necessary.
+        Usage: QLearning(..., trajectory_log=TrajectoryLog(file, q_learning)), or set q_learning.trajectory_log
+        :param file: name of the log file
+        :param q_learning: QLearning object whose transitions are logged, for the dimensions of the log
+        :param buffer_size: optionally change the number of records written at once
+        """
+        header = log_header(q_learning)
+        if os.path.isfile(file) and os.path.getsize(file) > 0:
+            with open(file, "r+b") as f:
+                if f.read(HEADER.size) != header:
+                    raise ValueError("{} is not a trajectory log of this Gridworld".format(file))
+                # drop a record cut off by a crash, so the new records are aligned
+                f.truncate(HEADER.size + (os.path.getsize(file) - HEADER.size) // RECORD.itemsize * RECORD.itemsize)
+            self.file = open(file, "ab")
+        else:
+            self.file = open(file, "wb")
+            self.file.write(header)
+        self.buffer = np.zeros(buffer_size, dtype=RECORD)
+        # number of records in the buffer
+        self.size = 0
+
+
+    def add(self, s, a, r, s_prime):
+        """
+        Adds a transition to the log, which is written once the buffer is full.
+        :param s: index of the state
+        :param a: index of the action
+        :param r: immediate reward
+        :param s_prime: index of the follow-up state
+        """
+        self.buffer[self.size] = (s, a, r, s_prime)
+        self.size += 1
+        if self.size == len(self.buffer):
+            self.flush()
+
+
+    def flush(self):
+        """Writes all buffered records to the file"""
+        self.file.write(self.buffer[:self.size].tobytes())
+        self.file.flush()
+        self.size = 0
+
+
+    def close(self):
+        """Writes all buffered records and closes the file"""
+        self.flush()
+        self.file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_trajectory_log(file):
+    """
+    Memory maps a trajectory log.
+    :param file: name of the log file
+    :return: tuple of (width, height), number of states, number of actions, read-only array of the records
+    """
+    with open(file, "rb") as f:
+        magic, version, width, height, state_count, action_count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a trajectory log".format(file))
+    # a record cut off by a crash is left out
+    count = (os.path.getsize(file) - HEADER.size) // RECORD.itemsize
+    if count == 0:
+        records = np.zeros(0, dtype=RECORD)
+    else:
+        records = np.memmap(file, dtype=RECORD, mode="r", offset=HEADER.size, shape=(count,))
+    return (width, height), state_count, action_count, records
+
+
+def train_offline(q_learning, log_files, epochs=1, chunk_size=Default.LOG_CHUNK_SIZE, batch_size=32):
+    """
+    Performs Q-learning updates for all recorded transitions of the logs without an environment
+    (array Q engine only). The records are read in chunks and updated in batches with QLearning.batch_update,
+    in which only one update of a (state, action) pair is kept. Every transition from a goal state
+    ends an episode, so schedules of the learning rate work like when training online.
+    :param q_learning: QLearning object set up with the Gridworld and actions the logs were recorded with
+    :param log_files: list of trajectory log files
+    :param epochs: optionally number of times all logs are used
+    :param chunk_size: optionally change the number of records read at once
+    :param batch_size: optionally change the number of transitions updated at once
+    """
+    if q_learning.q_engine != "array":
+        raise ValueError("Offline Q-learning needs the array Q engine")
+    schedule = q_learning.learning_rate_schedule
+    if schedule is not None and schedule.per_visit:
+        raise ValueError("Per visit learning rates are not supported offline")
+    logs = [read_trajectory_log(file) for file in log_files]
+    for file, (dim, state_count, action_count, _) in zip(log_files, logs):
+        if (dim, state_count, action_count) != (tuple(q_learning.dim), len(q_learning.states), len(q_learning.actions)):
+            raise ValueError("{} was recorded on a different Gridworld".format(file))
+
+    for _ in range(epochs):
+        for _, _, _, records in logs:
+            for start in range(0, len(records), chunk_size):
+                # copies the chunk out of the memory map, one field at a time
+                chunk = records[start:start + chunk_size]
+                s, a = chunk["s"].astype(np.int64), chunk["a"].astype(np.int64)
+                r, s_prime = np.array(chunk["r"]), chunk["s_prime"].astype(np.int64)
+                for k in range(0, len(chunk), batch_size):
+                    batch = slice(k, k + batch_size)
+                    q_learning.batch_update(s[batch], a[batch], r[batch], s_prime[batch])
+                    q_learning.step_count += len(s[batch])
+                    q_learning.episode_count += int(np.count_nonzero(q_learning.is_goal[s[batch]]))
+                    q_learning.apply_schedules()
+        q_learning.update_policy(only_changed=True)
+
+
+def make_learner(gridworld, arguments):
+    """
+    :param gridworld: nested list of characters or array of field byte values
+    :param arguments: parsed command line arguments
+    :return: QLearning object with the array Q engine for the Gridworld, with an MDP as environment
+    """
+    environment_stream, learner_stream = RandomStream(arguments.seed).spawn(2)
+    environment = MDP(state_list=gridworld,
+                      field_rewards=Default.FIELD_REWARDS,
+                      obstacle_fields=Default.OBSTACLE_FIELDS,
+                      actions=Default.ACTIONS,
+                      transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                      seed=environment_stream)
+    return QLearning(env_perform_action=environment.perform_action,
+                     state_list=environment.state_index,
+                     goal_fields=Default.GOAL_FIELDS,
+                     obstacle_fields=Default.OBSTACLE_FIELDS,
+                     actions=Default.ACTIONS,
+                     discount_factor=arguments.discount_factor,
+                     learning_rate=arguments.learning_rate,
+                     epsilon=arguments.epsilon,
+                     convergence_threshold=Default.CONVERGENCE_THRESHOLD,
+                     q_engine="array",
+                     seed=learner_stream,
+                     learning_rate_schedule=arguments.learning_rate_schedule)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Records trajectory logs and trains Q-learning from them.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record = subparsers.add_parser("record", help="run Q-learning episodes and append their transitions to a log")
+    record.add_argument("gridworld_file")
+    record.add_argument("log_file")
+    record.add_argument("--episodes", type=int, default=1000)
+    train = subparsers.add_parser("train", help="train Q-learning from logs and print the results as JSON")
+    train.add_argument("gridworld_file")
+    train.add_argument("log_files", nargs="+")
+    train.add_argument("--epochs", type=int, default=1)
+    train.add_argument("--batch-size", type=int, default=32)
+    train.add_argument("--output", help="also write Q-values and policy to this JSON file")
+    for subparser in (record, train):
+        subparser.add_argument("--learning-rate", type=float, default=Default.LEARNING_RATE)
+        subparser.add_argument("--epsilon", type=float, default=Default.EPSILON)
+        subparser.add_argument("--discount-factor", type=float, default=Default.DISCOUNT_FACTOR)
+        subparser.add_argument("--learning-rate-schedule", nargs="+", metavar=("NAME", "PARAMETER"),
+                               default=Default.LEARNING_RATE_SCHEDULE)
+        subparser.add_argument("--seed", type=int)
+    return parser.parse_args()
+
+
+# only run if not imported from other file
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    gridworld = Gridworld.make_list_from_file(arguments.gridworld_file)
+    q_learning = make_learner(gridworld, arguments)
+    if arguments.command == "record":
+        with TrajectoryLog(arguments.log_file, q_learning) as log:
+            q_learning.trajectory_log = log
+            q_learning.q_learning_until_convergence(criteria=[Budget(episodes=arguments.episodes)])
+        print(json.dumps({"log": arguments.log_file, "episodes": q_learning.episode_count,
+                          "transitions": q_learning.step_count}))
+    else:
+        train_offline(q_learning, arguments.log_files, arguments.epochs, batch_size=arguments.batch_size)
+        statistics = {"logs": arguments.log_files,
+                      "epochs": arguments.epochs,
+                      "transitions": q_learning.step_count,
+                      "episodes": q_learning.episode_count,
+                      "learning_rate": arguments.learning_rate,
+                      "learning_rate_schedule": q_learning.learning_rate_schedule.spec()
+                      if q_learning.learning_rate_schedule is not None else None,
+                      "discount_factor": arguments.discount_factor}
+        print(json.dumps(statistics))
+        print("\n".join(Render.policy_lines(q_learning)))
+        if arguments.output is not None:
+            with open(arguments.output, "w") as f:
+                json.dump(dict(statistics, q_values=q_learning.q_function.table.tolist(),
+                               policy=Render.policy_lines(q_learning, separator="")), f, ensure_ascii=False)
@@ -0,0 +1,84 @@
+"""
+Tests of recording trajectory logs and training offline from them with TrajectoryLog.py.
+"""
+
+import numpy as np
+import pytest
+
+from Convergence import Budget
+import DefaultConstants as Default
+from Planner import Planner
+from TrajectoryLog import RECORD, TrajectoryLog, read_trajectory_log, train_offline
+
+
+def record(make_learner, file, episodes, q_engine="array", buffer_size=Default.LOG_BUFFER_SIZE, **kwargs):
+    q_learning = make_learner(q_engine=q_engine, **kwargs)
+    with TrajectoryLog(file, q_learning, buffer_size) as log:
+        q_learning.trajectory_log = log
+        q_learning.q_learning_until_convergence(criteria=[Budget(episodes=episodes)])
+    q_learning.trajectory_log = None
+    return q_learning
+
+
+def test_record_and_read(make_learner, tmp_path):
+    file = str(tmp_path / "experience.qtrj")
+    # a small buffer, so the records are written in several parts
+    q_learning = record(make_learner, file, 50, buffer_size=64)
+    dim, state_count, action_count, records = read_trajectory_log(file)
+    assert dim == tuple(q_learning.dim)
+    assert (state_count, action_count) == (len(q_learning.states), len(q_learning.actions))
+    assert len(records) == q_learning.step_count
+    assert records["s"].max() < state_count and records["s_prime"].max() < state_count
+    assert records["a"].max() < action_count
+    # every episode ends with the action performed in a goal state
+    assert np.count_nonzero(q_learning.is_goal[records["s"]]) == 50
+
+
+def test_all_engines_record_the_same(make_learner, tmp_path):
+    logs = []
+    for q_engine in ["dict", "array", "sparse"]:
+        file = str(tmp_path / (q_engine + ".qtrj"))
+        record(make_learner, file, 20, q_engine=q_engine)
+        logs.append(np.array(read_trajectory_log(file)[3]))
+    assert np.array_equal(logs[1], logs[0])
+    assert np.array_equal(logs[2], logs[0])
+
+
+def test_cut_off_record_is_dropped(make_learner, tmp_path):
+    file = str(tmp_path / "experience.qtrj")
+    record(make_learner, file, 10)
+    count = len(read_trajectory_log(file)[3])
+    # as if a crash interrupted writing a record
+    with open(file, "ab") as f:
+        f.write(b"\1" * (RECORD.itemsize // 2))
+    assert len(read_trajectory_log(file)[3]) == count
+
+    # appending continues after the last complete record
+    record(make_learner, file, 10, seed=2)
+    records = read_trajectory_log(file)[3]
+    assert len(records) > count
+    assert np.count_nonzero(make_learner().is_goal[records["s"]]) == 20
+
+
+def test_log_of_other_gridworld_is_rejected(make_learner, tmp_path):
+    file = str(tmp_path / "experience.qtrj")
+    record(make_learner, file, 1)
+    with pytest.raises(ValueError):
+        TrajectoryLog(file, make_learner(gridworld=[["F", "F", "E"], ["F", "F", "P"]]))
+
+
+def test_train_offline(make_learner, tmp_path):
+    file = str(tmp_path / "experience.qtrj")
+    recorded = record(make_learner, file, 1000, epsilon=1.0)
+
+    q_learning = make_learner(q_engine="array", learning_rate=0.05)
+    train_offline(q_learning, [file], epochs=3)
+    assert q_learning.step_count == 3 * recorded.step_count
+    assert q_learning.episode_count == 3 * 1000
+    planner = Planner(q_learning.env_perform_action.__self__, Default.GOAL_FIELDS, q_learning.discount_factor)
+    optimal_values = planner.value_iteration().max(axis=1)
+    values = q_learning.q_values(np.arange(len(q_learning.states))).max(axis=1)
+    assert np.abs(values - optimal_values).max() < 0.2
+
+    with pytest.raises(ValueError):
+        train_offline(make_learner(q_engine="dict"), [file])
@@ -0,0 +1,44 @@
+"""
+Fixtures shared by the test modules (*Test.py, run with python -m pytest).
+"""
+
+import pytest
+
+import DefaultConstants as Default
+from MDP import MDP
+from QLearning import QLearning
+from RandomStream import RandomStream
+
+# the example Gridworld of the README
+GRIDWORLD = [["F", "F", "F", "E"],
+             ["F", "O", "F", "P"],
+             ["F", "F", "F", "F"]]
+
+
+@pytest.fixture
+def make_learner():
+    """
+    :return: function returning a QLearning object on its own MDP, both seeded by the given seed, which takes
+             the gridworld, seed, learner class, environment and Q-learning parameters as keyword arguments
+    """
+    def make(gridworld=GRIDWORLD, seed=1, learner=QLearning, discount_factor=Default.DISCOUNT_FACTOR,
+             learning_rate=0.1, epsilon=0.5, convergence_threshold=20, **kwargs):
+        environment_stream, learner_stream = RandomStream(seed).spawn(2)
+        environment = MDP(state_list=gridworld,
+                          field_rewards=Default.FIELD_REWARDS,
+                          obstacle_fields=Default.OBSTACLE_FIELDS,
+                          actions=Default.ACTIONS,
+                          transition_probabilities=Default.TRANSITION_PROBABILITIES,
+                          seed=environment_stream)
+        return learner(env_perform_action=environment.perform_action,
+                       state_list=environment.state_index,
+                       goal_fields=Default.GOAL_FIELDS,
+                       obstacle_fields=Default.OBSTACLE_FIELDS,
+                       actions=Default.ACTIONS,
+                       discount_factor=discount_factor,
+                       learning_rate=learning_rate,
+                       epsilon=epsilon,
+                       convergence_threshold=convergence_threshold,
+                       seed=learner_stream,
+                       **kwargs)
+    return make